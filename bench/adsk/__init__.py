@@ -0,0 +1,34 @@
+"""Stand-in hors ligne des modules adsk.core / adsk.fusion de Fusion 360.
+
+Reproduit la partie de l'API utilisée par l'add-in, avec une géométrie
+simplifiée (boîtes englobantes), compte chaque appel d'API et peut simuler
+une latence par appel pour les mesures de performance.
+"""
+import collections
+import time
+
+# Nombre d'appels par point d'entrée de l'API, remis à zéro par reset_api_stats()
+api_calls = collections.Counter()
+# Latence simulée par appel d'API, en secondes
+api_latency = 0.0
+
+def _api(name):
+    api_calls[name] += 1
+    if api_latency > 0:
+        deadline = time.perf_counter() + api_latency
+        while time.perf_counter() < deadline:
+            pass
+
+def set_api_latency(seconds):
+    global api_latency
+    api_latency = seconds
+
+def reset_api_stats():
+    api_calls.clear()
+
+def doEvents():
+    _api('doEvents')
+    if core.Application._instance is not None:
+        core.Application._instance._run_commands()
+
+from . import core, fusion  # noqa: E402
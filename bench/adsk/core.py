@@ -0,0 +1,533 @@
+"""Stand-in de adsk.core : géométrie de base, collections, application et interface."""
+import math
+import queue
+
+from . import _api
+
+
+class Base:
+    """Objet d'API : identifiant de type et validité"""
+    isValid = True
+
+    @classmethod
+    def classType(cls):
+        return f"adsk::{cls.__module__.rsplit('.', 1)[-1]}::{cls.__name__}"
+
+    @property
+    def objectType(self):
+        return type(self).classType()
+
+    @classmethod
+    def cast(cls, obj):
+        return obj if isinstance(obj, cls) else None
+
+
+# --- Géométrie ---
+
+class Point3D(Base):
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x, self.y, self.z = float(x), float(y), float(z)
+
+    @staticmethod
+    def create(x=0.0, y=0.0, z=0.0):
+        _api('Point3D.create')
+        return Point3D(x, y, z)
+
+    def copy(self):
+        return Point3D(self.x, self.y, self.z)
+
+    def asArray(self):
+        return [self.x, self.y, self.z]
+
+    def distanceTo(self, other):
+        return math.dist(self.asArray(), other.asArray())
+
+    def transformBy(self, matrix):
+        self.x, self.y, self.z = matrix._apply(self.x, self.y, self.z, 1.0)
+        return True
+
+    def translateBy(self, vector):
+        self.x += vector.x
+        self.y += vector.y
+        self.z += vector.z
+        return True
+
+    def vectorTo(self, other):
+        return Vector3D(other.x - self.x, other.y - self.y, other.z - self.z)
+
+    def asVector(self):
+        return Vector3D(self.x, self.y, self.z)
+
+    def __repr__(self):
+        return f"Point3D({self.x:g}, {self.y:g}, {self.z:g})"
+
+
+class Vector3D(Base):
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x, self.y, self.z = float(x), float(y), float(z)
+
+    @staticmethod
+    def create(x=0.0, y=0.0, z=0.0):
+        _api('Vector3D.create')
+        return Vector3D(x, y, z)
+
+    def copy(self):
+        return Vector3D(self.x, self.y, self.z)
+
+    def asArray(self):
+        return [self.x, self.y, self.z]
+
+    @property
+    def length(self):
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    def normalize(self):
+        length = self.length
+        if length:
+            self.x, self.y, self.z = self.x / length, self.y / length, self.z / length
+        return True
+
+    def scaleBy(self, scale):
+        self.x, self.y, self.z = self.x * scale, self.y * scale, self.z * scale
+        return True
+
+    def add(self, other):
+        self.x, self.y, self.z = self.x + other.x, self.y + other.y, self.z + other.z
+        return True
+
+    def dotProduct(self, other):
+        return self.x * other.x + self.y * other.y + self.z * other.z
+
+    def crossProduct(self, other):
+        return Vector3D(self.y * other.z - self.z * other.y,
+                        self.z * other.x - self.x * other.z,
+                        self.x * other.y - self.y * other.x)
+
+    def angleTo(self, other):
+        denominator = self.length * other.length
+        if not denominator:
+            return 0.0
+        return math.acos(max(-1.0, min(1.0, self.dotProduct(other) / denominator)))
+
+    def isParallelTo(self, other):
+        return abs(math.sin(self.angleTo(other))) < 1e-9
+
+    def transformBy(self, matrix):
+        self.x, self.y, self.z = matrix._apply(self.x, self.y, self.z, 0.0)
+        return True
+
+    def asPoint(self):
+        return Point3D(self.x, self.y, self.z)
+
+
+class Matrix3D(Base):
+    """Matrice 4x4 homogène, ligne par ligne"""
+
+    def __init__(self, rows=None):
+        self._m = rows or [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+
+    @staticmethod
+    def create():
+        _api('Matrix3D.create')
+        return Matrix3D()
+
+    def copy(self):
+        return Matrix3D([row[:] for row in self._m])
+
+    def asArray(self):
+        return [v for row in self._m for v in row]
+
+    def setWithArray(self, values):
+        values = list(values)
+        self._m = [values[i * 4:(i + 1) * 4] for i in range(4)]
+        return True
+
+    @property
+    def translation(self):
+        return Vector3D(self._m[0][3], self._m[1][3], self._m[2][3])
+
+    @translation.setter
+    def translation(self, vector):
+        self._m[0][3], self._m[1][3], self._m[2][3] = vector.x, vector.y, vector.z
+
+    def setToIdentity(self):
+        self._m = Matrix3D()._m
+        return True
+
+    def setToRotation(self, angle, axis, origin):
+        axis = axis.copy()
+        axis.normalize()
+        x, y, z = axis.x, axis.y, axis.z
+        c, s, t = math.cos(angle), math.sin(angle), 1 - math.cos(angle)
+        r = [[t * x * x + c, t * x * y - s * z, t * x * z + s * y],
+             [t * x * y + s * z, t * y * y + c, t * y * z - s * x],
+             [t * x * z - s * y, t * y * z + s * x, t * z * z + c]]
+        o = (origin.x, origin.y, origin.z)
+        self._m = [r[i] + [o[i] - sum(r[i][j] * o[j] for j in range(3))] for i in range(3)] + [[0.0, 0.0, 0.0, 1.0]]
+        return True
+
+    def transformBy(self, matrix):
+        # self = matrix * self : self appliqué d'abord, puis matrix
+        a, b = matrix._m, self._m
+        self._m = [[sum(a[i][k] * b[k][j] for k in range(4)) for j in range(4)] for i in range(4)]
+        return True
+
+    def invert(self):
+        r = [row[:3] for row in self._m[:3]]
+        t = [self._m[i][3] for i in range(3)]
+        det = (r[0][0] * (r[1][1] * r[2][2] - r[1][2] * r[2][1])
+               - r[0][1] * (r[1][0] * r[2][2] - r[1][2] * r[2][0])
+               + r[0][2] * (r[1][0] * r[2][1] - r[1][1] * r[2][0]))
+        if abs(det) < 1e-12:
+            return False
+        inv = [[(r[(j + 1) % 3][(i + 1) % 3] * r[(j + 2) % 3][(i + 2) % 3]
+                 - r[(j + 1) % 3][(i + 2) % 3] * r[(j + 2) % 3][(i + 1) % 3]) / det for j in range(3)] for i in range(3)]
+        self._m = [inv[i] + [-sum(inv[i][j] * t[j] for j in range(3))] for i in range(3)] + [[0.0, 0.0, 0.0, 1.0]]
+        return True
+
+    def isEqualTo(self, other):
+        return all(abs(a - b) < 1e-9 for a, b in zip(self.asArray(), other.asArray()))
+
+    def _apply(self, x, y, z, w):
+        m = self._m
+        return (m[0][0] * x + m[0][1] * y + m[0][2] * z + m[0][3] * w,
+                m[1][0] * x + m[1][1] * y + m[1][2] * z + m[1][3] * w,
+                m[2][0] * x + m[2][1] * y + m[2][2] * z + m[2][3] * w)
+
+
+class BoundingBox3D(Base):
+    def __init__(self, minPoint, maxPoint):
+        self.minPoint, self.maxPoint = minPoint, maxPoint
+
+    @staticmethod
+    def create(minPoint, maxPoint):
+        return BoundingBox3D(minPoint.copy(), maxPoint.copy())
+
+    def intersects(self, other):
+        return all(self.minPoint.asArray()[i] <= other.maxPoint.asArray()[i]
+                   and other.minPoint.asArray()[i] <= self.maxPoint.asArray()[i] for i in range(3))
+
+    def contains(self, point):
+        return all(self.minPoint.asArray()[i] <= point.asArray()[i] <= self.maxPoint.asArray()[i] for i in range(3))
+
+    def copy(self):
+        return BoundingBox3D(self.minPoint.copy(), self.maxPoint.copy())
+
+
+class OrientedBoundingBox3D(Base):
+    def __init__(self, centerPoint, lengthDirection, widthDirection, length, width, height):
+        self.centerPoint = centerPoint
+        self.lengthDirection = lengthDirection
+        self.widthDirection = widthDirection
+        self.heightDirection = lengthDirection.crossProduct(widthDirection)
+        self.length, self.width, self.height = length, width, height
+
+    @staticmethod
+    def create(centerPoint, lengthDirection, widthDirection, length, width, height):
+        _api('OrientedBoundingBox3D.create')
+        return OrientedBoundingBox3D(centerPoint, lengthDirection, widthDirection, length, width, height)
+
+
+class Plane(Base):
+    surfaceType = 0
+
+    def __init__(self, origin, normal, uDirection, vDirection):
+        self.origin, self.normal = origin, normal
+        self.uDirection, self.vDirection = uDirection, vDirection
+
+
+class Cylinder(Base):
+    surfaceType = 1
+
+    def __init__(self, origin, axis, radius):
+        self.origin, self.axis, self.radius = origin, axis, radius
+
+
+class Material(Base):
+    def __init__(self, name):
+        self.name = name
+
+
+class Curve3DTypes:
+    Line3DCurveType = 0
+    Arc3DCurveType = 1
+    Circle3DCurveType = 2
+    Ellipse3DCurveType = 3
+    EllipticalArc3DCurveType = 4
+    InfiniteLine3DCurveType = 5
+    NurbsCurve3DCurveType = 6
+
+
+class SurfaceTypes:
+    PlaneSurfaceType = 0
+    CylinderSurfaceType = 1
+    ConeSurfaceType = 2
+    SphereSurfaceType = 3
+    TorusSurfaceType = 4
+    EllipticalCylinderSurfaceType = 5
+    EllipticalConeSurfaceType = 6
+    NurbsSurfaceType = 7
+
+
+class ValueInput(Base):
+    def __init__(self, value):
+        self.realValue = value
+        self.valueType = 0
+
+    @staticmethod
+    def createByReal(value):
+        _api('ValueInput.createByReal')
+        return ValueInput(float(value))
+
+    @staticmethod
+    def createByString(text):
+        _api('ValueInput.createByString')
+        return ValueInput(text)
+
+
+class ObjectCollection(Base):
+    def __init__(self):
+        self._items = []
+
+    @staticmethod
+    def create():
+        _api('ObjectCollection.create')
+        return ObjectCollection()
+
+    def add(self, item):
+        _api('ObjectCollection.add')
+        if item in self._items:
+            return False
+        self._items.append(item)
+        return True
+
+    def item(self, index):
+        return self._items[index]
+
+    def clear(self):
+        self._items.clear()
+        return True
+
+    def removeByIndex(self, index):
+        del self._items[index]
+        return True
+
+    @property
+    def count(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+
+# --- Application, événements et interface ---
+
+class CustomEventHandler:
+    def __init__(self):
+        pass
+
+
+class CustomEventArgs:
+    def __init__(self, additionalInfo):
+        self.additionalInfo = additionalInfo
+
+
+class CustomEvent(Base):
+    def __init__(self, event_id):
+        self.eventId = event_id
+        self.handlers = []
+
+    def add(self, handler):
+        self.handlers.append(handler)
+        return True
+
+    def remove(self, handler):
+        if handler in self.handlers:
+            self.handlers.remove(handler)
+        return True
+
+
+class ApplicationCommandEventHandler:
+    def __init__(self):
+        pass
+
+
+class CommandTerminationReason:
+    UnknownTerminationReason = 0
+    CompletedTerminationReason = 1
+    CancelledTerminationReason = 2
+    AbortedTerminationReason = 3
+
+
+class ApplicationCommandEventArgs:
+    def __init__(self, command_id, reason):
+        self.commandId = command_id
+        self.terminationReason = reason
+
+
+class ApplicationCommandEvent(Base):
+    def __init__(self):
+        self.handlers = []
+
+    def add(self, handler):
+        self.handlers.append(handler)
+        return True
+
+    def remove(self, handler):
+        if handler in self.handlers:
+            self.handlers.remove(handler)
+        return True
+
+    def _fire(self, command_id, reason):
+        for handler in list(self.handlers):
+            handler.notify(ApplicationCommandEventArgs(command_id, reason))
+
+
+class Selection(Base):
+    def __init__(self, entity):
+        self.entity = entity
+
+
+class Selections(Base):
+    def __init__(self):
+        self._items = []
+
+    def add(self, entity):
+        _api('Selections.add')
+        self._items.append(Selection(entity))
+        return True
+
+    def clear(self):
+        _api('Selections.clear')
+        self._items.clear()
+        return True
+
+    @property
+    def count(self):
+        return len(self._items)
+
+    def item(self, index):
+        return self._items[index]
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+
+class ControlDefinition(Base):
+    def __init__(self, enabled):
+        self._enabled = enabled
+
+    @property
+    def isEnabled(self):
+        _api('ControlDefinition.isEnabled')
+        return self._enabled()
+
+
+class CommandDefinition(Base):
+    def __init__(self, command_id, action, enabled):
+        self.id = command_id
+        self._action = action
+        self.controlDefinition = ControlDefinition(enabled)
+
+    def execute(self, input=None):
+        """Comme dans Fusion, la commande est seulement mise en file : elle s'exécute au prochain doEvents()"""
+        _api(f'CommandDefinition.execute:{self.id}')
+        Application.get()._commands.append((self.id, self._action))
+        return True
+
+
+class CommandDefinitions(Base):
+    def __init__(self, app):
+        self._app = app
+
+    def itemById(self, command_id):
+        timeline = lambda: self._app.activeProduct._timeline
+        actions = {'UndoCommand': (self._app._undo, lambda: bool(timeline()._items)),
+                   'RedoCommand': (self._app._redo, lambda: bool(timeline()._undone))}
+        if command_id in actions:
+            return CommandDefinition(command_id, *actions[command_id])
+        return None
+
+
+class UserInterface(Base):
+    def __init__(self, app):
+        self.activeSelections = Selections()
+        self.commandDefinitions = CommandDefinitions(app)
+        self.commandTerminated = ApplicationCommandEvent()
+        self.messages = []
+
+    def messageBox(self, text, title='', buttons=0, icon=0):
+        _api('UserInterface.messageBox')
+        self.messages.append(text)
+        return 0
+
+
+class Application(Base):
+    _instance = None
+
+    def __init__(self):
+        from . import fusion
+        self.userInterface = UserInterface(self)
+        self.activeProduct = fusion.Design()
+        self._events = {}
+        # Événements tirés par les threads de l'add-in, traités par pump() sur le thread « principal »
+        self.fired = queue.Queue()
+        # Commandes lancées par CommandDefinition.execute(), exécutées par doEvents() ou pump()
+        self._commands = []
+
+    @staticmethod
+    def get():
+        if Application._instance is None:
+            Application._instance = Application()
+        return Application._instance
+
+    def newDesign(self):
+        """Remplace le document actif par un design vide (utilitaire du stand-in)"""
+        from . import fusion
+        self.activeProduct = fusion.Design()
+        self.userInterface.activeSelections.clear()
+        return self.activeProduct
+
+    def registerCustomEvent(self, event_id):
+        event = self._events.setdefault(event_id, CustomEvent(event_id))
+        return event
+
+    def unregisterCustomEvent(self, event_id):
+        self._events.pop(event_id, None)
+        return True
+
+    def fireCustomEvent(self, event_id, additionalInfo=''):
+        _api('Application.fireCustomEvent')
+        self.fired.put((event_id, additionalInfo))
+        return True
+
+    def pump(self, timeout=None, max_events=None):
+        """Distribue les événements en attente aux gestionnaires ; retourne le nombre traité"""
+        self._run_commands()
+        handled = 0
+        while max_events is None or handled < max_events:
+            try:
+                event_id, info = self.fired.get(timeout=timeout) if handled == 0 and timeout else self.fired.get_nowait()
+            except queue.Empty:
+                break
+            event = self._events.get(event_id)
+            if event:
+                for handler in list(event.handlers):
+                    handler.notify(CustomEventArgs(info))
+            handled += 1
+        return handled
+
+    def _run_commands(self):
+        commands, self._commands = self._commands, []
+        for command_id, action in commands:
+            action()
+            self.userInterface.commandTerminated._fire(command_id, CommandTerminationReason.CompletedTerminationReason)
+
+    def _undo(self):
+        self.activeProduct._timeline._undo()
+
+    def _redo(self):
+        self.activeProduct._timeline._redo()
@@ -0,0 +1,1308 @@
+"""Stand-in de adsk.fusion : design, timeline, esquisses, features et corps.
+
+Chaque corps est réduit à sa boîte englobante alignée sur les axes et à une
+liste d'arêtes typées ; c'est suffisant pour la sélection, les combinaisons,
+les déplacements et les mesures de coût d'appels.
+"""
+import itertools
+import math
+
+from . import _api
+from . import core
+
+
+class DesignTypes:
+    DirectDesignType = 0
+    ParametricDesignType = 1
+
+
+class FeatureOperations:
+    JoinFeatureOperation = 0
+    CutFeatureOperation = 1
+    IntersectFeatureOperation = 2
+    NewBodyFeatureOperation = 3
+    NewComponentFeatureOperation = 4
+
+
+class PatternDistanceType:
+    ExtentPatternDistanceType = 0
+    SpacingPatternDistanceType = 1
+
+
+class TriangleMeshQualityOptions:
+    LowQualityTriangleMesh = 8
+    NormalQualityTriangleMesh = 11
+    HighQualityTriangleMesh = 13
+    VeryHighQualityTriangleMesh = 15
+
+
+# --- Géométrie simplifiée ---
+
+def _corners(lo, hi):
+    return [(x, y, z) for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])]
+
+
+def _bounds(points):
+    xs, ys, zs = zip(*points)
+    return [min(xs), min(ys), min(zs)], [max(xs), max(ys), max(zs)]
+
+
+def _apply(matrix, point):
+    return matrix._apply(point[0], point[1], point[2], 1.0)
+
+
+class Line3D(core.Base):
+    curveType = core.Curve3DTypes.Line3DCurveType
+
+    def __init__(self, start, end):
+        self.startPoint, self.endPoint = core.Point3D(*start), core.Point3D(*end)
+
+
+class Circle3D(core.Base):
+    curveType = core.Curve3DTypes.Circle3DCurveType
+
+    def __init__(self, center, normal, radius):
+        self.center, self.normal, self.radius = core.Point3D(*center), core.Vector3D(*normal), radius
+
+
+class BRepFace(core.Base):
+    isParamReversed = False
+
+    def __init__(self, geometry, lo, hi):
+        self.geometry = geometry
+        self._lo, self._hi = lo, hi
+        self.tempId = next(BRepEdge._serial)
+
+    @property
+    def boundingBox(self):
+        _api('BRepFace.boundingBox')
+        return core.BoundingBox3D(core.Point3D(*self._lo), core.Point3D(*self._hi))
+
+
+class BRepFaces(core.Base):
+    def __init__(self, faces):
+        self._faces = faces
+
+    @property
+    def count(self):
+        return len(self._faces)
+
+    def item(self, index):
+        return self._faces[index]
+
+    def __iter__(self):
+        _api('BRepFaces.iter')
+        return iter(self._faces)
+
+
+class BRepEdge(core.Base):
+    _serial = itertools.count(1)
+
+    def __init__(self, body, geometry):
+        self.body = body
+        self._geometry = geometry
+        self._concave = False
+        self.tempId = next(BRepEdge._serial)
+
+    @property
+    def geometry(self):
+        _api('BRepEdge.geometry')
+        return self._geometry
+
+    @property
+    def length(self):
+        _api('BRepEdge.length')
+        g = self._geometry
+        if g.curveType == core.Curve3DTypes.Circle3DCurveType:
+            return 2 * math.pi * g.radius
+        return math.dist(g.startPoint.asArray(), g.endPoint.asArray())
+
+    @property
+    def boundingBox(self):
+        _api('BRepEdge.boundingBox')
+        g = self._geometry
+        if g.curveType == core.Curve3DTypes.Circle3DCurveType:
+            c, n = g.center.asArray(), g.normal.asArray()
+            extent = [g.radius * math.sqrt(max(0.0, 1 - a * a)) for a in n]
+            lo, hi = [a - e for a, e in zip(c, extent)], [a + e for a, e in zip(c, extent)]
+        else:
+            lo, hi = _bounds([g.startPoint.asArray(), g.endPoint.asArray()])
+        return core.BoundingBox3D(core.Point3D(*lo), core.Point3D(*hi))
+
+    @property
+    def faces(self):
+        """Faces adjacentes déduites de la position de l'arête dans la boîte du corps"""
+        _api('BRepEdge.faces')
+        g = self._geometry
+        center = [(l + h) / 2 for l, h in zip(self.body._lo, self.body._hi)]
+        faces = []
+        if g.curveType == core.Curve3DTypes.Circle3DCurveType:
+            n, c = g.normal.asArray(), g.center.asArray()
+            side = 1 if sum((a - b) * d for a, b, d in zip(c, center, n)) >= 0 else -1
+            normal = core.Vector3D(*[side * a for a in n])
+            box = self.boundingBox
+            lo, hi = box.minPoint.asArray(), box.maxPoint.asArray()
+            faces.append(BRepFace(core.Plane(g.center.copy(), normal, None, None), lo, hi))
+            faces.append(BRepFace(core.Cylinder(g.center.copy(), g.normal.copy(), g.radius), lo, hi))
+        else:
+            start, end = g.startPoint.asArray(), g.endPoint.asArray()
+            for j in range(3):
+                if abs(end[j] - start[j]) > 1e-9:
+                    continue
+                axis = [0.0, 0.0, 0.0]
+                axis[j] = 1.0 if start[j] >= center[j] else -1.0
+                # Face plane : la boîte du corps aplatie sur le plan de l'arête
+                lo, hi = list(self.body._lo), list(self.body._hi)
+                lo[j] = hi[j] = start[j]
+                faces.append(BRepFace(core.Plane(core.Point3D(*start), core.Vector3D(*axis), None, None), lo, hi))
+        return BRepFaces(faces[:2])
+
+    @property
+    def pointOnEdge(self):
+        g = self._geometry
+        if g.curveType == core.Curve3DTypes.Circle3DCurveType:
+            return g.center.copy()
+        return core.Point3D(*[(a + b) / 2 for a, b in zip(g.startPoint.asArray(), g.endPoint.asArray())])
+
+    def _transform(self, matrix):
+        g = self._geometry
+        for point in [p for p in (getattr(g, 'startPoint', None), getattr(g, 'endPoint', None), getattr(g, 'center', None)) if p]:
+            point.transformBy(matrix)
+        if hasattr(g, 'normal'):
+            g.normal.transformBy(matrix)
+
+
+class BRepEdges(core.Base):
+    def __init__(self, edges):
+        self._edges = edges
+
+    @property
+    def count(self):
+        _api('BRepEdges.count')
+        return len(self._edges)
+
+    def item(self, index):
+        _api('BRepEdges.item')
+        return self._edges[index]
+
+    def __iter__(self):
+        _api('BRepEdges.iter')
+        return iter(list(self._edges))
+
+
+def _box_edges(body, lo, hi):
+    corners = _corners(lo, hi)
+    edges = []
+    for a, b in itertools.combinations(corners, 2):
+        if sum(1 for i in range(3) if a[i] != b[i]) == 1:
+            edges.append(BRepEdge(body, Line3D(a, b)))
+    return edges
+
+
+def _round_edges(body, bottom, top, normal, bottom_radius, top_radius):
+    edges = []
+    if bottom_radius > 0:
+        edges.append(BRepEdge(body, Circle3D(bottom, normal, bottom_radius)))
+    if top_radius > 0:
+        edges.append(BRepEdge(body, Circle3D(top, normal, top_radius)))
+    return edges
+
+
+def _revolved_bounds(start, end, bottom_radius, top_radius):
+    axis = [e - s for s, e in zip(start, end)]
+    length = math.sqrt(sum(a * a for a in axis)) or 1.0
+    axis = [a / length for a in axis]
+    extent = [math.sqrt(max(0.0, 1 - a * a)) for a in axis]
+    points = []
+    for center, radius in ((start, bottom_radius), (end, top_radius)):
+        points.append([c - radius * e for c, e in zip(center, extent)])
+        points.append([c + radius * e for c, e in zip(center, extent)])
+    return _bounds(points)
+
+
+# --- Corps ---
+
+_DEFAULT_MATERIAL = core.Material('Steel')
+
+# Subdivisions par côté de chaque face selon la qualité demandée
+_MESH_DIVISIONS = {8: 1, 11: 4, 13: 16, 15: 64}
+
+
+class TriangleMesh(core.Base):
+    """Maillage de la boîte englobante : chaque face découpée en k x k carrés, sommets dupliqués par face"""
+
+    def __init__(self, lo, hi, k):
+        coordinates, normals, indices = [], [], []
+        for axis in range(3):
+            u, v = (axis + 1) % 3, (axis + 2) % 3
+            for side, level in ((-1.0, lo[axis]), (1.0, hi[axis])):
+                base = len(coordinates) // 3
+                for i in range(k + 1):
+                    for j in range(k + 1):
+                        point = [0.0, 0.0, 0.0]
+                        point[axis] = level
+                        point[u] = lo[u] + (hi[u] - lo[u]) * i / k
+                        point[v] = lo[v] + (hi[v] - lo[v]) * j / k
+                        coordinates.extend(point)
+                        normal = [0.0, 0.0, 0.0]
+                        normal[axis] = side
+                        normals.extend(normal)
+                for i in range(k):
+                    for j in range(k):
+                        a = base + i * (k + 1) + j
+                        b, c, d = a + k + 1, a + 1, a + k + 2
+                        if side > 0:
+                            indices.extend((a, b, d, a, d, c))
+                        else:
+                            indices.extend((a, c, d, a, d, b))
+        self._coordinates, self._normals, self._indices = coordinates, normals, indices
+
+    @property
+    def nodeCount(self):
+        _api('TriangleMesh.nodeCount')
+        return len(self._coordinates) // 3
+
+    @property
+    def triangleCount(self):
+        _api('TriangleMesh.triangleCount')
+        return len(self._indices) // 3
+
+    @property
+    def nodeCoordinatesAsFloat(self):
+        _api('TriangleMesh.nodeCoordinatesAsFloat')
+        return list(self._coordinates)
+
+    @property
+    def normalVectorsAsFloat(self):
+        _api('TriangleMesh.normalVectorsAsFloat')
+        return list(self._normals)
+
+    @property
+    def nodeIndices(self):
+        _api('TriangleMesh.nodeIndices')
+        return list(self._indices)
+
+
+class TriangleMeshCalculator(core.Base):
+    def __init__(self, body):
+        self._body = body
+        self._quality = TriangleMeshQualityOptions.NormalQualityTriangleMesh
+        self.surfaceTolerance = 0.0
+
+    def setQuality(self, quality):
+        _api('TriangleMeshCalculator.setQuality')
+        self._quality = quality
+        return True
+
+    def calculate(self):
+        _api('TriangleMeshCalculator.calculate')
+        lo, hi = self._body._lo, self._body._hi
+        if self.surfaceTolerance > 0:
+            size = max(h - l for l, h in zip(lo, hi))
+            k = min(256, max(1, math.ceil(math.sqrt(size / self.surfaceTolerance))))
+        else:
+            k = _MESH_DIVISIONS[self._quality]
+        return TriangleMesh(lo, hi, k)
+
+
+class MeshManager(core.Base):
+    def __init__(self, body):
+        self._body = body
+
+    def createMeshCalculator(self):
+        _api('MeshManager.createMeshCalculator')
+        return TriangleMeshCalculator(self._body)
+
+
+class BRepBody(core.Base):
+    _serial = itertools.count(1)
+
+    def __init__(self, component, lo, hi, edges_factory=None, kind='box'):
+        self.parentComponent = component
+        self._name = None
+        self._lo, self._hi = list(lo), list(hi)
+        self._kind = kind
+        self._edges = edges_factory(self) if edges_factory else _box_edges(self, lo, hi)
+        self.isValid = True
+        self.isVisible = True
+        self.entityToken = f"body-{next(BRepBody._serial)}"
+
+    @property
+    def name(self):
+        _api('BRepBody.name')
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        _api('BRepBody.name=')
+        self._touch(rename=True)
+        self._name = self.parentComponent.bRepBodies._unique_name(value, self)
+
+    @property
+    def edges(self):
+        _api('BRepBody.edges')
+        return BRepEdges(self._edges)
+
+    @property
+    def convexEdges(self):
+        _api('BRepBody.convexEdges')
+        return BRepEdges([e for e in self._edges if not e._concave])
+
+    @property
+    def concaveEdges(self):
+        _api('BRepBody.concaveEdges')
+        return BRepEdges([e for e in self._edges if e._concave])
+
+    @property
+    def boundingBox(self):
+        _api('BRepBody.boundingBox')
+        return core.BoundingBox3D(core.Point3D(*self._lo), core.Point3D(*self._hi))
+
+    @property
+    def volume(self):
+        _api('BRepBody.volume')
+        return math.prod(h - l for l, h in zip(self._lo, self._hi))
+
+    @property
+    def faces(self):
+        """Faces comptées d'après la forme : une par cercle d'arête plus la latérale, six pour une boîte"""
+        _api('BRepBody.faces')
+        circles = sum(1 for e in self._edges if e._geometry.curveType == core.Curve3DTypes.Circle3DCurveType)
+        if self._kind == 'sphere' or (self._kind == 'revolve' and not self._edges):
+            count = 1
+        elif circles:
+            count = circles + 1
+        else:
+            count = 6
+        return BRepFaces([None] * count)
+
+    @property
+    def material(self):
+        _api('BRepBody.material')
+        return _DEFAULT_MATERIAL
+
+    @property
+    def meshManager(self):
+        _api('BRepBody.meshManager')
+        return MeshManager(self)
+
+    def deleteMe(self):
+        _api('BRepBody.deleteMe')
+        self.parentComponent.bRepBodies._remove(self)
+        return True
+
+    def _touch(self, rename=False):
+        self.parentComponent._design._touch(self, rename)
+
+    def _transform(self, matrix):
+        self._touch()
+        self._lo, self._hi = _bounds([_apply(matrix, c) for c in _corners(self._lo, self._hi)])
+        for edge in self._edges:
+            edge._transform(matrix)
+
+    def _state(self):
+        return (self._name, self._lo[:], self._hi[:], self.isValid)
+
+    def _restore(self, state):
+        self._name, self._lo, self._hi, self.isValid = state[0], state[1][:], state[2][:], state[3]
+
+
+class BRepBodies(core.Base):
+    def __init__(self, component):
+        self._component = component
+        self._bodies = []
+
+    @property
+    def count(self):
+        _api('BRepBodies.count')
+        return len(self._bodies)
+
+    def item(self, index):
+        _api('BRepBodies.item')
+        return self._bodies[index]
+
+    def itemByName(self, name):
+        _api('BRepBodies.itemByName')
+        return next((b for b in self._bodies if b._name == name), None)
+
+    def __iter__(self):
+        _api('BRepBodies.iter')
+        return iter(list(self._bodies))
+
+    def __len__(self):
+        return len(self._bodies)
+
+    def add(self, temp_body, baseFeature=None):
+        _api('BRepBodies.add')
+        design = self._component._design
+        if baseFeature is None and design.designType == DesignTypes.ParametricDesignType:
+            raise RuntimeError("3 : InternalValidationError : une base feature est requise dans un design paramétrique")
+        if baseFeature is not None and not baseFeature._editing:
+            raise RuntimeError("3 : InternalValidationError : la base feature n'est pas en édition")
+        if baseFeature is None:
+            design._record('BRepBodies.add')
+        body = self._new(temp_body._lo, temp_body._hi, temp_body._edges_factory, temp_body._kind)
+        if baseFeature is not None:
+            baseFeature.bodies._items.append(body)
+        return body
+
+    def _new(self, lo, hi, edges_factory=None, kind='box'):
+        body = BRepBody(self._component, lo, hi, edges_factory, kind)
+        body._name = self._unique_name('Body', body, numbered=True)
+        self._bodies.append(body)
+        return body
+
+    def _unique_name(self, base, body, numbered=False):
+        taken = {b._name for b in self._bodies if b is not body}
+        if numbered:
+            return next(f"{base}{i}" for i in itertools.count(1) if f"{base}{i}" not in taken)
+        if base not in taken:
+            return base
+        return next(f"{base} ({i})" for i in itertools.count(1) if f"{base} ({i})" not in taken)
+
+    def _remove(self, body):
+        body._touch()
+        if body in self._bodies:
+            self._bodies.remove(body)
+        body.isValid = False
+
+
+class TemporaryBRepBody(core.Base):
+    def __init__(self, lo, hi, edges_factory, kind):
+        self._lo, self._hi, self._edges_factory, self._kind = lo, hi, edges_factory, kind
+
+
+class TemporaryBRepManager(core.Base):
+    _instance = None
+
+    @staticmethod
+    def get():
+        if TemporaryBRepManager._instance is None:
+            TemporaryBRepManager._instance = TemporaryBRepManager()
+        return TemporaryBRepManager._instance
+
+    def createBox(self, box):
+        _api('TemporaryBRepManager.createBox')
+        c = box.centerPoint
+        half = [box.length / 2, box.width / 2, box.height / 2]
+        dirs = [box.lengthDirection, box.widthDirection, box.heightDirection]
+        points = []
+        for signs in itertools.product((-1, 1), repeat=3):
+            points.append([c.asArray()[i] + sum(s * h * d.asArray()[i] for s, h, d in zip(signs, half, dirs)) for i in range(3)])
+        lo, hi = _bounds(points)
+        return TemporaryBRepBody(lo, hi, lambda body: _box_edges(body, lo, hi), 'box')
+
+    def createCylinderOrCone(self, pointOne, pointOneRadius, pointTwo, pointTwoRadius):
+        _api('TemporaryBRepManager.createCylinderOrCone')
+        start, end = pointOne.asArray(), pointTwo.asArray()
+        lo, hi = _revolved_bounds(start, end, pointOneRadius, pointTwoRadius)
+        normal = [e - s for s, e in zip(start, end)]
+        return TemporaryBRepBody(lo, hi, lambda body: _round_edges(body, start, end, normal, pointOneRadius, pointTwoRadius), 'revolve')
+
+    def createSphere(self, center, radius):
+        _api('TemporaryBRepManager.createSphere')
+        c = center.asArray()
+        return TemporaryBRepBody([v - radius for v in c], [v + radius for v in c], lambda body: [], 'sphere')
+
+
+# --- Esquisses ---
+
+class SketchPoint(core.Base):
+    def __init__(self, sketch, point):
+        self.parentSketch = sketch
+        self.geometry = core.Point3D(*point)
+
+
+class SketchLine(core.Base):
+    def __init__(self, sketch, start, end):
+        self.parentSketch = sketch
+        self.startSketchPoint = SketchPoint(sketch, start)
+        self.endSketchPoint = SketchPoint(sketch, end)
+
+
+class SketchArc(SketchLine):
+    pass
+
+
+def _xyz(point):
+    return (point.geometry if isinstance(point, SketchPoint) else point).asArray()
+
+
+class SketchLines(core.Base):
+    def __init__(self, sketch):
+        self._sketch = sketch
+
+    def addTwoPointRectangle(self, pointOne, pointTwo):
+        _api('SketchLines.addTwoPointRectangle')
+        a, b = _xyz(pointOne), _xyz(pointTwo)
+        self._sketch._add(('rect', a, b))
+        return [SketchLine(self._sketch, a, b) for _ in range(4)]
+
+    def addByTwoPoints(self, startPoint, endPoint):
+        _api('SketchLines.addByTwoPoints')
+        a, b = _xyz(startPoint), _xyz(endPoint)
+        self._sketch._add(('line', a, b), a, b)
+        return SketchLine(self._sketch, a, b)
+
+
+class SketchCircles(core.Base):
+    def __init__(self, sketch):
+        self._sketch = sketch
+
+    def addByCenterRadius(self, centerPoint, radius):
+        _api('SketchCircles.addByCenterRadius')
+        self._sketch._add(('circle', _xyz(centerPoint), radius))
+        return core.Base()
+
+
+class SketchArcs(core.Base):
+    def __init__(self, sketch):
+        self._sketch = sketch
+
+    def addByCenterStartEnd(self, centerPoint, startPoint, endPoint):
+        _api('SketchArcs.addByCenterStartEnd')
+        c, a, b = _xyz(centerPoint), _xyz(startPoint), _xyz(endPoint)
+        self._sketch._add(('arc', c, math.dist(c, a)), a, b)
+        return SketchArc(self._sketch, a, b)
+
+
+class SketchCurves(core.Base):
+    def __init__(self, sketch):
+        self.sketchLines = SketchLines(sketch)
+        self.sketchCircles = SketchCircles(sketch)
+        self.sketchArcs = SketchArcs(sketch)
+
+
+class SketchPoints(core.Base):
+    def __init__(self, sketch):
+        self._sketch = sketch
+
+    def add(self, point):
+        _api('SketchPoints.add')
+        return SketchPoint(self._sketch, _xyz(point))
+
+
+class Profile(core.Base):
+    """Boucle fermée d'une esquisse"""
+
+    def __init__(self, sketch, shapes):
+        self.parentSketch = sketch
+        self._shapes = shapes
+
+    @property
+    def boundingBox(self):
+        _api('Profile.boundingBox')
+        lo, hi = _bounds(self._sketch_points())
+        return core.BoundingBox3D(core.Point3D(*lo), core.Point3D(*hi))
+
+    def _sketch_points(self):
+        points = []
+        for shape in self._shapes:
+            if shape[0] in ('rect', 'line'):
+                points.extend([shape[1], shape[2]])
+            else:
+                c, r = shape[1], shape[2]
+                points.extend([[c[0] - r, c[1] - r, c[2]], [c[0] + r, c[1] + r, c[2]]])
+        return points
+
+    def _is_round(self):
+        return any(shape[0] == 'circle' for shape in self._shapes)
+
+
+class Profiles(core.Base):
+    def __init__(self, sketch):
+        self._sketch = sketch
+
+    @property
+    def count(self):
+        return len(self._sketch._loops)
+
+    def item(self, index):
+        _api('Profiles.item')
+        if not 0 <= index < len(self._sketch._loops):
+            raise RuntimeError("3 : InternalValidationError : aucun profil")
+        return Profile(self._sketch, self._sketch._loops[index])
+
+
+class Sketch(core.Base):
+    def __init__(self, plane):
+        geometry = plane.geometry
+        self.referencePlane = plane
+        self._matrix = core.Matrix3D([
+            [geometry.uDirection.x, geometry.vDirection.x, geometry.normal.x, geometry.origin.x],
+            [geometry.uDirection.y, geometry.vDirection.y, geometry.normal.y, geometry.origin.y],
+            [geometry.uDirection.z, geometry.vDirection.z, geometry.normal.z, geometry.origin.z],
+            [0.0, 0.0, 0.0, 1.0]])
+        self._shapes = []
+        # Boucles fermées (un profil chacune) ; segments de la boucle en cours et degré de leurs extrémités
+        self._loops = []
+        self._open, self._ends = [], {}
+        self.sketchCurves = SketchCurves(self)
+        self.sketchPoints = SketchPoints(self)
+        self.profiles = Profiles(self)
+        self.isVisible = True
+
+    @property
+    def transform(self):
+        _api('Sketch.transform')
+        return self._matrix.copy()
+
+    def _to_model(self, point):
+        return _apply(self._matrix, point)
+
+    def _add(self, shape, start=None, end=None):
+        """Ajoute une courbe ; une courbe fermée forme un profil, des segments le forment une fois leur chaîne bouclée"""
+        self._shapes.append(shape)
+        if start is None:
+            self._loops.append([shape])
+            return
+        self._open.append(shape)
+        for point in (start, end):
+            key = tuple(round(v, 9) for v in point)
+            self._ends[key] = self._ends.get(key, 0) + 1
+        if all(n % 2 == 0 for n in self._ends.values()):
+            self._loops.append(self._open)
+            self._open, self._ends = [], {}
+
+    def _normal(self):
+        m = self._matrix._m
+        return [m[0][2], m[1][2], m[2][2]]
+
+
+class Sketches(core.Base):
+    def __init__(self, component):
+        self._component = component
+        self._items = []
+
+    def add(self, plane):
+        _api('Sketches.add')
+        sketch = Sketch(plane)
+        self._items.append(sketch)
+        self._component._design._record('Sketches.add')
+        return sketch
+
+    @property
+    def count(self):
+        return len(self._items)
+
+    def item(self, index):
+        return self._items[index]
+
+
+# --- Plans et axes de construction ---
+
+class ConstructionPlane(core.Base):
+    def __init__(self, origin, normal, u, v):
+        self.geometry = core.Plane(core.Point3D(*origin), core.Vector3D(*normal), core.Vector3D(*u), core.Vector3D(*v))
+
+
+class ConstructionAxis(core.Base):
+    def __init__(self, direction):
+        self.geometry = direction
+
+
+class ConstructionPlaneInput(core.Base):
+    def setByOffset(self, planarEntity, offset):
+        self._plane, self._offset = planarEntity, offset.realValue
+        return True
+
+
+class ConstructionPlanes(core.Base):
+    def __init__(self, component):
+        self._component = component
+        self._items = []
+
+    def createInput(self, occurrenceForCreation=None):
+        return ConstructionPlaneInput()
+
+    def add(self, input):
+        _api('ConstructionPlanes.add')
+        g = input._plane.geometry
+        origin = [o + n * input._offset for o, n in zip(g.origin.asArray(), g.normal.asArray())]
+        plane = ConstructionPlane(origin, g.normal.asArray(), g.uDirection.asArray(), g.vDirection.asArray())
+        self._items.append(plane)
+        self._component._design._record('ConstructionPlanes.add')
+        return plane
+
+    @property
+    def count(self):
+        return len(self._items)
+
+
+# --- Features ---
+
+class FeatureBodies(core.Base):
+    def __init__(self, bodies=None):
+        self._items = list(bodies or [])
+
+    @property
+    def count(self):
+        return len(self._items)
+
+    def item(self, index):
+        _api('Feature.bodies.item')
+        return self._items[index]
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+
+class Feature(core.Base):
+    def __init__(self, bodies=None):
+        self.bodies = FeatureBodies(bodies)
+
+
+class _FeatureCollection(core.Base):
+    def __init__(self, component):
+        self._component = component
+        self._items = []
+
+    @property
+    def _bodies(self):
+        return self._component.bRepBodies
+
+    def _commit(self, label, feature):
+        self._items.append(feature)
+        self._component._design._record(label)
+        return feature
+
+    @property
+    def count(self):
+        return len(self._items)
+
+
+class ExtrudeFeatureInput(core.Base):
+    def __init__(self, profile, operation):
+        self.profile, self.operation = profile, operation
+        self._distance = None
+
+    def setDistanceExtent(self, isSymmetric, distance):
+        self._distance = distance.realValue
+        return True
+
+
+class ExtrudeFeatures(_FeatureCollection):
+    def createInput(self, profile, operation):
+        _api('ExtrudeFeatures.createInput')
+        return ExtrudeFeatureInput(profile, operation)
+
+    def add(self, input):
+        _api('ExtrudeFeatures.add')
+        sketch = input.profile.parentSketch
+        points = input.profile._sketch_points()
+        lo, hi = _bounds(points)
+        d = input._distance
+        model = [sketch._to_model(p) for p in _corners(lo, [hi[0], hi[1], hi[2] + d])]
+        body_lo, body_hi = _bounds(model)
+        if input.profile._is_round():
+            c = [(l + h) / 2 for l, h in zip(lo, hi)]
+            r = (hi[0] - lo[0]) / 2
+            bottom, top = sketch._to_model(c), sketch._to_model([c[0], c[1], c[2] + d])
+            factory = lambda body: _round_edges(body, bottom, top, sketch._normal(), r, r) + [BRepEdge(body, Line3D(bottom, top))]
+        else:
+            factory = lambda body: _box_edges(body, body_lo, body_hi)
+        body = self._bodies._new(body_lo, body_hi, factory, 'extrude')
+        return self._commit('ExtrudeFeatures.add', Feature([body]))
+
+
+class RevolveFeatureInput(core.Base):
+    def __init__(self, profile, axis, operation):
+        self.profile, self.axis, self.operation = profile, axis, operation
+
+    def setAngleExtent(self, isSymmetric, angle):
+        self._angle = angle.realValue
+        return True
+
+
+class RevolveFeatures(_FeatureCollection):
+    def createInput(self, profile, axis, operation):
+        _api('RevolveFeatures.createInput')
+        return RevolveFeatureInput(profile, axis, operation)
+
+    def add(self, input):
+        _api('RevolveFeatures.add')
+        sketch = input.profile.parentSketch
+        if isinstance(input.axis, SketchLine):
+            start = sketch._to_model(_xyz(input.axis.startSketchPoint))
+            end = sketch._to_model(_xyz(input.axis.endSketchPoint))
+            points = [sketch._to_model(p) for p in input.profile._sketch_points()]
+            axis = [e - s for s, e in zip(start, end)]
+            length = math.sqrt(sum(a * a for a in axis)) or 1.0
+            radius = max(math.dist(p, [s + a * sum((p[i] - start[i]) * axis[i] for i in range(3)) / length ** 2
+                                       for s, a in zip(start, axis)]) for p in points)
+            lo, hi = _revolved_bounds(start, end, radius, radius)
+            factory = lambda body: _round_edges(body, start, end, axis, radius, 0)
+        else:
+            arc = next(s for s in input.profile._shapes if s[0] == 'arc')
+            center, radius = sketch._to_model(arc[1]), arc[2]
+            lo, hi = [c - radius for c in center], [c + radius for c in center]
+            factory = lambda body: []
+        body = self._bodies._new(lo, hi, factory, 'revolve')
+        return self._commit('RevolveFeatures.add', Feature([body]))
+
+
+class LoftSections(core.Base):
+    def __init__(self):
+        self._items = []
+
+    def add(self, entity):
+        self._items.append(entity)
+        return core.Base()
+
+
+class LoftFeatureInput(core.Base):
+    def __init__(self, operation):
+        self.operation = operation
+        self.loftSections = LoftSections()
+
+
+class LoftFeatures(_FeatureCollection):
+    def createInput(self, operation):
+        _api('LoftFeatures.createInput')
+        return LoftFeatureInput(operation)
+
+    def add(self, input):
+        _api('LoftFeatures.add')
+        points = []
+        for section in input.loftSections._items:
+            if isinstance(section, Profile):
+                sketch = section.parentSketch
+                points.extend(sketch._to_model(p) for p in section._sketch_points())
+            else:
+                points.append(section.parentSketch._to_model(section.geometry.asArray()))
+        lo, hi = _bounds(points)
+        body = self._bodies._new(lo, hi, None, 'loft')
+        return self._commit('LoftFeatures.add', Feature([body]))
+
+
+class MoveFeatureInput(core.Base):
+    def __init__(self, entities, transform):
+        self.inputEntities, self.transform = entities, transform
+
+    def defineAsFreeMove(self, transform):
+        self.transform = transform
+        return True
+
+
+class MoveFeature(Feature):
+    def __init__(self, component, bodies, transform):
+        super().__init__(bodies)
+        self._component, self._bodies, self.transform = component, bodies, transform.copy()
+        self.isValid = True
+
+    def defineAsFreeMove(self, transform):
+        """Redéfinit la feature : annule l'ancienne transformation puis applique la nouvelle"""
+        _api('MoveFeature.defineAsFreeMove')
+        delta = self.transform.copy()
+        delta.invert()
+        delta.transformBy(transform)
+        design = self._component._design
+        for body in self._bodies:
+            body._transform(delta)
+            # L'état d'avant est déjà porté par l'entrée de timeline de la feature
+            design._touched.pop(body, None)
+        self.transform = transform.copy()
+        if design._compute_deferred:
+            design.pending_compute += 1
+        else:
+            _api('Design.compute')
+        return True
+
+
+class MoveFeatures(_FeatureCollection):
+    def createInput(self, inputEntities, transform=None):
+        _api('MoveFeatures.createInput')
+        return MoveFeatureInput(inputEntities, transform)
+
+    def createInput2(self, inputEntities):
+        _api('MoveFeatures.createInput2')
+        return MoveFeatureInput(inputEntities, None)
+
+    def add(self, input):
+        _api('MoveFeatures.add')
+        bodies = list(input.inputEntities)
+        for body in bodies:
+            if not body.isValid:
+                raise RuntimeError("3 : InternalValidationError : corps invalide")
+            body._transform(input.transform)
+        return self._commit('MoveFeatures.add', MoveFeature(self._component, bodies, input.transform))
+
+
+class CombineFeatureInput(core.Base):
+    def __init__(self, targetBody, toolBodies):
+        self.targetBody, self.toolBodies = targetBody, toolBodies
+        self.operation = FeatureOperations.JoinFeatureOperation
+        self.isKeepToolBodies = False
+        self.isNewComponent = False
+
+
+class CombineFeatures(_FeatureCollection):
+    def createInput(self, targetBody, toolBodies):
+        _api('CombineFeatures.createInput')
+        return CombineFeatureInput(targetBody, toolBodies)
+
+    def add(self, input):
+        _api('CombineFeatures.add')
+        target = input.targetBody
+        tools = list(input.toolBodies)
+        if not target.isValid or any(not t.isValid for t in tools):
+            raise RuntimeError("3 : InternalValidationError : corps invalide")
+        target._touch()
+        if input.operation == FeatureOperations.JoinFeatureOperation:
+            # Les arêtes d'outil à l'intérieur de la boîte de la cible deviennent des coins rentrants
+            (lx, ly, lz), (hx, hy, hz) = target._lo, target._hi
+            for tool in tools:
+                if not (lx < tool._hi[0] and tool._lo[0] < hx and ly < tool._hi[1] and tool._lo[1] < hy
+                        and lz < tool._hi[2] and tool._lo[2] < hz):
+                    target._edges.extend(tool._edges)
+                    continue
+                for edge in tool._edges:
+                    x, y, z = edge.pointOnEdge.asArray()
+                    edge._concave = lx < x < hx and ly < y < hy and lz < z < hz
+                    target._edges.append(edge)
+            for edge in (e for t in tools for e in t._edges):
+                edge.body = target
+            target._lo, target._hi = _bounds(_corners(target._lo, target._hi)
+                                             + [c for t in tools for c in _corners(t._lo, t._hi)])
+        elif input.operation == FeatureOperations.IntersectFeatureOperation:
+            for tool in tools:
+                target._lo = [max(a, b) for a, b in zip(target._lo, tool._lo)]
+                target._hi = [min(a, b) for a, b in zip(target._hi, tool._hi)]
+                if any(l > h for l, h in zip(target._lo, target._hi)):
+                    raise RuntimeError("5 : ASM_INTERSECT : l'intersection est vide")
+        if not input.isKeepToolBodies:
+            for tool in tools:
+                self._bodies._remove(tool)
+        return self._commit('CombineFeatures.add', Feature([target]))
+
+
+class FilletFeatureInput(core.Base):
+    def __init__(self):
+        self._edge_sets = []
+        self.isRollingBallCorner = True
+
+    def addConstantRadiusEdgeSet(self, edges, radius, isTangentChain):
+        self._edge_sets.append((edges, radius))
+        return True
+
+
+class FilletFeatures(_FeatureCollection):
+    def createInput(self):
+        _api('FilletFeatures.createInput')
+        return FilletFeatureInput()
+
+    def add(self, input):
+        _api('FilletFeatures.add')
+        bodies = {edge.body for edges, _ in input._edge_sets for edge in edges}
+        return self._commit('FilletFeatures.add', Feature(list(bodies)))
+
+
+class RectangularPatternFeatureInput(core.Base):
+    def __init__(self, entities, direction, quantity, distance, distanceType):
+        self.inputEntities = entities
+        self._directions = [(direction, quantity.realValue, distance.realValue)]
+        self.patternDistanceType = distanceType
+
+    def setDirectionTwo(self, directionTwoEntity, quantityTwo, distanceTwo):
+        self._directions.append((directionTwoEntity, quantityTwo.realValue, distanceTwo.realValue))
+        return True
+
+
+class CircularPatternFeatureInput(core.Base):
+    def __init__(self, entities, axis):
+        self.inputEntities, self.axis = entities, axis
+        self.quantity = core.ValueInput(1.0)
+        self.totalAngle = core.ValueInput(2 * math.pi)
+        self.isSymmetric = False
+
+
+def _copy_body(bodies, body, matrix):
+    """Copie d'un corps transformée par matrix (occurrence d'un réseau)"""
+    def edges(copy):
+        result = []
+        for edge in body._edges:
+            g = edge._geometry
+            if g.curveType == core.Curve3DTypes.Circle3DCurveType:
+                geometry = Circle3D(g.center.asArray(), g.normal.asArray(), g.radius)
+            else:
+                geometry = Line3D(g.startPoint.asArray(), g.endPoint.asArray())
+            copied = BRepEdge(copy, geometry)
+            copied._transform(matrix)
+            result.append(copied)
+        return result
+    lo, hi = _bounds([_apply(matrix, c) for c in _corners(body._lo, body._hi)])
+    return bodies._new(lo, hi, edges, body._kind)
+
+
+class RectangularPatternFeatures(_FeatureCollection):
+    def createInput(self, inputEntities, directionOneEntity, quantityOne, distanceOne, patternDistanceType):
+        _api('RectangularPatternFeatures.createInput')
+        return RectangularPatternFeatureInput(inputEntities, directionOneEntity, quantityOne, distanceOne, patternDistanceType)
+
+    def add(self, input):
+        _api('RectangularPatternFeatures.add')
+        (axis1, n1, d1), (axis2, n2, d2) = (input._directions + [(input._directions[0][0], 1, 0.0)])[:2]
+        copies = []
+        for body in input.inputEntities:
+            for i, j in itertools.product(range(int(n1)), range(int(n2))):
+                if i == 0 and j == 0:
+                    continue
+                offset = [a * i * d1 + b * j * d2 for a, b in zip(axis1.geometry.asArray(), axis2.geometry.asArray())]
+                matrix = core.Matrix3D()
+                matrix.translation = core.Vector3D(*offset)
+                copies.append(_copy_body(self._bodies, body, matrix))
+        return self._commit('RectangularPatternFeatures.add', Feature(copies))
+
+
+class CircularPatternFeatures(_FeatureCollection):
+    def createInput(self, inputEntities, axis):
+        _api('CircularPatternFeatures.createInput')
+        return CircularPatternFeatureInput(inputEntities, axis)
+
+    def add(self, input):
+        _api('CircularPatternFeatures.add')
+        count = int(input.quantity.realValue)
+        total = input.totalAngle.realValue
+        # Sur un tour complet, la dernière occurrence rejoindrait la source
+        step = total / count if abs(total - 2 * math.pi) < 1e-9 else total / max(1, count - 1)
+        copies = []
+        for body in input.inputEntities:
+            for k in range(1, count):
+                matrix = core.Matrix3D()
+                matrix.setToRotation(step * k, input.axis.geometry, core.Point3D())
+                copies.append(_copy_body(self._bodies, body, matrix))
+        return self._commit('CircularPatternFeatures.add', Feature(copies))
+
+
+class BaseFeature(Feature):
+    def __init__(self, collection):
+        super().__init__()
+        self._collection = collection
+        self._editing = False
+
+    def startEdit(self):
+        _api('BaseFeature.startEdit')
+        self._editing = True
+        return True
+
+    def finishEdit(self):
+        _api('BaseFeature.finishEdit')
+        self._editing = False
+        return True
+
+
+class BaseFeatures(_FeatureCollection):
+    def add(self):
+        _api('BaseFeatures.add')
+        return self._commit('BaseFeatures.add', BaseFeature(self))
+
+
+class Features(core.Base):
+    def __init__(self, component):
+        self.extrudeFeatures = ExtrudeFeatures(component)
+        self.revolveFeatures = RevolveFeatures(component)
+        self.loftFeatures = LoftFeatures(component)
+        self.moveFeatures = MoveFeatures(component)
+        self.combineFeatures = CombineFeatures(component)
+        self.filletFeatures = FilletFeatures(component)
+        self.rectangularPatternFeatures = RectangularPatternFeatures(component)
+        self.circularPatternFeatures = CircularPatternFeatures(component)
+        self.baseFeatures = BaseFeatures(component)
+
+
+class Component(core.Base):
+    def __init__(self, design):
+        self._design = design
+        self.name = 'Root'
+        self.bRepBodies = BRepBodies(self)
+        self.sketches = Sketches(self)
+        self.constructionPlanes = ConstructionPlanes(self)
+        self.features = Features(self)
+        self.xYConstructionPlane = ConstructionPlane((0, 0, 0), (0, 0, 1), (1, 0, 0), (0, 1, 0))
+        self.xZConstructionPlane = ConstructionPlane((0, 0, 0), (0, 1, 0), (1, 0, 0), (0, 0, -1))
+        self.yZConstructionPlane = ConstructionPlane((0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1))
+        self.xConstructionAxis = ConstructionAxis(core.Vector3D(1, 0, 0))
+        self.yConstructionAxis = ConstructionAxis(core.Vector3D(0, 1, 0))
+        self.zConstructionAxis = ConstructionAxis(core.Vector3D(0, 0, 1))
+
+
+# --- Timeline et design ---
+
+class TimelineObject(core.Base):
+    def __init__(self, timeline, label, state):
+        self._timeline = timeline
+        self.name = label
+        self._state = state
+        self.isGroup = False
+
+    @property
+    def index(self):
+        return self._timeline._items.index(self)
+
+
+class TimelineGroup(TimelineObject):
+    def __init__(self, timeline, start, end):
+        super().__init__(timeline, 'Group', None)
+        self.isGroup = True
+        self.startIndex, self.endIndex = start, end
+
+
+class TimelineGroups(core.Base):
+    def __init__(self, timeline):
+        self._timeline = timeline
+        self._items = []
+
+    def add(self, startIndex, endIndex):
+        _api('TimelineGroups.add')
+        if not 0 <= startIndex <= endIndex < self._timeline.count:
+            raise RuntimeError("3 : InternalValidationError : indices de groupe invalides")
+        group = TimelineGroup(self._timeline, startIndex, endIndex)
+        self._items.append(group)
+        return group
+
+    @property
+    def count(self):
+        return len(self._items)
+
+
+class Timeline(core.Base):
+    """Entrées avant le marqueur dans _items, entrées reculées derrière lui dans _rolled.
+    Simplification : une nouvelle opération supprime les entrées reculées au lieu de s'insérer devant elles"""
+
+    def __init__(self, design):
+        self._design = design
+        self._items = []
+        self._rolled = []
+        self._undone = []
+        self.timelineGroups = TimelineGroups(self)
+
+    @property
+    def count(self):
+        _api('Timeline.count')
+        return len(self._items) + len(self._rolled)
+
+    @property
+    def markerPosition(self):
+        _api('Timeline.markerPosition')
+        return len(self._items)
+
+    @markerPosition.setter
+    def markerPosition(self, position):
+        _api('Timeline.markerPosition=')
+        if not 0 <= position <= len(self._items) + len(self._rolled):
+            raise RuntimeError("3 : InternalValidationError : position de marqueur invalide")
+        while len(self._items) > position:
+            item = self._items.pop()
+            self._rolled.insert(0, (item, self._design._restore(item._state)))
+        while len(self._items) < position:
+            item, state = self._rolled.pop(0)
+            self._items.append(item)
+            self._design._restore(state)
+
+    def deleteAllAfterMarker(self):
+        _api('Timeline.deleteAllAfterMarker')
+        self._rolled.clear()
+        return True
+
+    def item(self, index):
+        return (self._items + [item for item, _ in self._rolled])[index]
+
+    def _undo(self):
+        if self._items:
+            item = self._items.pop()
+            self._undone.append((item, self._design._restore(item._state)))
+
+    def _redo(self):
+        if self._undone:
+            item, state = self._undone.pop()
+            self._items.append(item)
+            self._design._restore(state)
+
+
+class Design(core.Base):
+    def __init__(self):
+        self._design_type = DesignTypes.ParametricDesignType
+        self._timeline = Timeline(self)
+        self.rootComponent = Component(self)
+        self._compute_deferred = False
+        self.pending_compute = 0
+        self._touched = {}
+        self._alive_before = []
+
+    @property
+    def designType(self):
+        return self._design_type
+
+    @designType.setter
+    def designType(self, value):
+        self._design_type = value
+        if value == DesignTypes.DirectDesignType:
+            self._timeline._items.clear()
+            self._timeline._rolled.clear()
+
+    @property
+    def timeline(self):
+        if self._design_type != DesignTypes.ParametricDesignType:
+            raise RuntimeError("2 : InternalValidationError : pas de timeline en modélisation directe")
+        return self._timeline
+
+    @property
+    def isComputeDeferred(self):
+        return self._compute_deferred
+
+    @isComputeDeferred.setter
+    def isComputeDeferred(self, value):
+        _api('Design.isComputeDeferred=')
+        self._compute_deferred = bool(value)
+        if not value and self.pending_compute:
+            self.computeAll()
+
+    def computeAll(self):
+        _api('Design.compute')
+        self.pending_compute = 0
+        return True
+
+    # Annulation journalisée : chaque entrée de timeline garde la liste des corps d'avant
+    # et l'état antérieur des seuls corps modifiés, pour un coût indépendant de la taille du design
+    def _touch(self, body, rename=False):
+        touched = self._touched
+        # Un renommage suit la feature qui a créé le corps : il s'annule avec elle
+        if rename and self._design_type == DesignTypes.ParametricDesignType and self._timeline._items:
+            touched = self._timeline._items[-1]._state[1]
+        if body not in touched:
+            touched[body] = body._state()
+
+    def _restore(self, state):
+        """Rétablit un état (corps présents, états modifiés) et retourne l'état inverse"""
+        bodies = self.rootComponent.bRepBodies
+        alive, states = state
+        inverse = (list(bodies._bodies), {body: body._state() for body in states})
+        kept = set(alive)
+        for body in bodies._bodies:
+            if body not in kept:
+                body.isValid = False
+        bodies._bodies = list(alive)
+        for body, body_state in states.items():
+            body._restore(body_state)
+        for body in alive:
+            body.isValid = True
+        self._alive_before = list(bodies._bodies)
+        self._touched = {}
+        return inverse
+
+    def _record(self, label):
+        """Enregistre une opération modélisante : entrée de timeline et recalcul"""
+        if self._design_type == DesignTypes.ParametricDesignType:
+            self._timeline._items.append(TimelineObject(self._timeline, label, (self._alive_before, self._touched)))
+            self._timeline._undone.clear()
+            self._timeline._rolled.clear()
+        self._touched = {}
+        self._alive_before = list(self.rootComponent.bRepBodies._bodies)
+        if self._compute_deferred:
+            self.pending_compute += 1
+        else:
+            _api('Design.compute')
+
+    @staticmethod
+    def cast(obj):
+        return obj if isinstance(obj, Design) else None
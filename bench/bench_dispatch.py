@@ -0,0 +1,609 @@
+"""Banc de mesure hors ligne du chemin dispatch / IPC de l'add-in Fusion MCP.
+
+Charge fusion_mcp_server.py avec le stand-in adsk de ce dossier, démarre
+l'add-in comme Fusion le ferait (run), puis mesure :
+  - les commandes unitaires via _submit_request -> fireCustomEvent -> notify ;
+  - une rafale de requêtes soumises depuis un autre thread, avec ou sans lectures intercalées ;
+  - un gros lot (batch) ;
+  - des sélections et déplacements enchaînés sur une connexion au socket, dont l'ordre doit être tenu ;
+  - le spool surveillé par file_watcher ;
+  - le trajet complet Claude -> server.js -> socket -> add-in (si node est présent).
+
+Exemples :
+  python bench/bench_dispatch.py --output bench/baselines/linux-x86_64.json
+  python bench/bench_dispatch.py --compare bench/baselines/linux-x86_64.json
+  python bench/bench_dispatch.py --api-latency-us 50 --quick
+  python bench/bench_dispatch.py --quick --skip-node --journal session.jsonl --pacing original
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+ADDIN_DIR = os.path.join(REPO_DIR, 'fusion_script', 'fusion_mcp_server')
+SERVER_JS = os.path.join(REPO_DIR, 'server', 'server.js')
+
+# Le add-in lit son environnement à l'import : dossier personnel isolé, mode silencieux, port libre
+_HOME = tempfile.mkdtemp(prefix='fusion_mcp_bench_')
+os.makedirs(os.path.join(_HOME, 'Documents'))
+os.environ['HOME'] = os.environ['USERPROFILE'] = _HOME
+os.environ['FUSION_MCP_OUTPUT'] = 'quiet'
+os.environ['FUSION_MCP_METRICS_INTERVAL'] = '3600'
+with socket.socket() as _probe:
+    _probe.bind(('127.0.0.1', 0))
+    os.environ['FUSION_MCP_PORT'] = str(_probe.getsockname()[1])
+
+sys.path[:0] = [BENCH_DIR, ADDIN_DIR]
+import adsk  # noqa: E402  (stand-in de ce dossier)
+import adsk.core  # noqa: E402
+import fusion_mcp_server as addin  # noqa: E402
+
+_app = adsk.core.Application.get()
+
+
+def _percentiles(values_ms):
+    if not values_ms:
+        return {'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0}
+    ordered = sorted(values_ms)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+    return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99)}
+
+
+def _reset(creation_mode='parametric'):
+    """Nouveau design, compteurs et métriques à zéro"""
+    _app.newDesign()
+    # Les scènes précédentes (cycles parent/enfant) sont libérées ici plutôt que pendant la mesure suivante
+    gc.collect()
+    addin._creation_mode = creation_mode
+    addin._metrics.clear()
+    adsk.reset_api_stats()
+
+
+def _pump_until(done, timeout=120.0):
+    """Traite les événements sur le thread courant (le « thread principal ») jusqu'à done()"""
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("le banc n'a pas terminé dans le temps imparti")
+        _app.pump(timeout=0.01)
+
+
+def _submit_and_wait(request):
+    """Une commande par le chemin de l'événement personnalisé ; retourne son résultat"""
+    box = []
+    addin._submit_request(f"bench-{time.perf_counter_ns()}", request, box.append)
+    _pump_until(lambda: box)
+    return box[0]
+
+
+def _run_prepared(commands):
+    for request in commands:
+        _submit_and_wait(request)
+
+
+def _api_calls():
+    return sum(adsk.api_calls.values())
+
+
+def _stage(name, stage):
+    entry = addin._metrics_snapshot(name)['commands'].get(name)
+    return entry['stages'].get(stage, {}) if entry else {}
+
+
+_WARMUP = 5
+
+# Grille de 50 x 40 cubes de 10 mm espacés de 20 mm, pour les requêtes spatiales
+_GRID_SCENE = {'command': 'place_primitives', 'arguments': {
+    'shape': 'cube', 'positions': [[x * 20, y * 20, 0] for x in range(50) for y in range(40)], 'dimensions': [10], 'prefix': 'G'}}
+
+# Commande unitaire : (préparation hors mesure, requête n° i, mode de création)
+_SINGLE_CASES = {
+    'create_box': ([], lambda i: f"create_box 10 20 30 B{i} xy {i} 0 0", 'parametric'),
+    'create_box_direct': ([], lambda i: f"create_box 10 20 30 B{i} xy {i} 0 0", 'direct'),
+    'create_cylinder': ([], lambda i: f"create_cylinder 5 20 C{i} xy {i} 0 0", 'parametric'),
+    'create_sphere': ([], lambda i: f"create_sphere 5 S{i} xy {i} 0 0", 'parametric'),
+    'select_body': (['batch ' + json.dumps([f"create_box 1 1 1 B{i}" for i in range(500)])],
+                    lambda i: f"select_body B{(i * 7) % 500}", 'parametric'),
+    'select_edges': (['batch ' + json.dumps([f"create_box 1 1 1 B{i}" for i in range(500)])],
+                     lambda i: f"select_edges B{(i * 7) % 500} all", 'parametric'),
+    'select_edges_query': (['batch ' + json.dumps([f"create_box 10 10 30 B{i}" for i in range(20)])],
+                           lambda i: {'command': 'select_edges', 'arguments': {
+                               'bodyName': f"B{(i * 7) % 20}", 'edgeType': 'line', 'axis': 'z', 'minLength': 20}}, 'parametric'),
+    'select_in_region': ([_GRID_SCENE], lambda i: {'command': 'select_in_region', 'arguments': {
+                             'region': [(i % 40) * 20, 0, -10, (i % 40) * 20 + 60, 60, 20]}}, 'parametric'),
+    'select_nearest': ([_GRID_SCENE], lambda i: f"select_nearest {(i * 37) % 1000} {(i * 53) % 1000} 0 3", 'parametric'),
+    'move_selection': (['create_box 10 10 10 M', 'select_body M'], lambda i: "move_selection 1 0 0", 'parametric'),
+    # Relevé différentiel d'une grande scène sans changement depuis le relevé précédent
+    'get_scene_poll': ([_GRID_SCENE, 'get_scene'], lambda i: {'command': 'get_scene', 'arguments': {'since': addin._scene_revision}},
+                       'parametric'),
+    # Export STL d'un corps finement maillé (~49 000 triangles), écrit par tranches
+    'export_mesh': (['create_box 10 20 30 E'], lambda i: {'command': 'export_mesh', 'arguments': {
+                        'bodies': ['E'], 'path': os.path.join(_HOME, 'mesh.stl'), 'refinement': 'very_high'}}, 'parametric'),
+    'combine_by_name': (['batch ' + json.dumps([f"create_box 1 1 1 T{i}" for i in range(1001)])],
+                        lambda i: f"combine_by_name T0 T{i + 1} join", 'parametric'),
+}
+
+
+def bench_single(count):
+    results = {}
+    for case, (setup, make_request, mode) in _SINGLE_CASES.items():
+        _reset(mode)
+        _run_prepared(setup)
+        # Échauffement hors mesure (caches, premières allocations)
+        _run_prepared(make_request(count + k) for k in range(_WARMUP))
+        adsk.reset_api_stats()
+        latencies = []
+        failures = 0
+        started = time.perf_counter()
+        for i in range(count):
+            t0 = time.perf_counter()
+            result = _submit_and_wait(make_request(i))
+            latencies.append((time.perf_counter() - t0) * 1000)
+            failures += not result['ok']
+        elapsed = time.perf_counter() - started
+        results[f"single_{case}"] = {
+            'ops': count,
+            'failures': failures,
+            'ops_per_sec': round(count / elapsed, 1),
+            **_percentiles(latencies),
+            'api_calls_per_op': round(_api_calls() / count, 2),
+        }
+    return results
+
+
+def bench_burst(count):
+    """count requêtes soumises d'un coup depuis un autre thread, comme le ferait le socket"""
+    _reset()
+    done = []
+    producer = threading.Thread(target=lambda: [
+        addin._submit_request(f"burst-{i}", f"create_box 1 1 1 R{i}", done.append) for i in range(count)])
+    started = time.perf_counter()
+    producer.start()
+    _pump_until(lambda: len(done) == count)
+    elapsed = time.perf_counter() - started
+    producer.join()
+    queue = _stage('create_box', 'queue')
+    return {'burst': {
+        'ops': count,
+        'failures': sum(not r['ok'] for r in done),
+        'ops_per_sec': round(count / elapsed, 1),
+        'queue_p50_ms': queue.get('p50_ms', 0.0),
+        'queue_p95_ms': queue.get('p95_ms', 0.0),
+        'api_calls_per_op': round(_api_calls() / count, 2),
+    }}
+
+
+def bench_burst_priority(count):
+    """Rafale de créations avec des lectures de scène intercalées : les lectures doublent la file"""
+    _reset()
+    done, queries = [], []
+    queries_every = 10
+
+    def produce():
+        for i in range(count):
+            addin._submit_request(f"mixed-{i}", f"create_box 1 1 1 R{i} xy {i} 0 0", done.append)
+            if i % queries_every == 0:
+                addin._submit_request(f"mixed-query-{i}", 'get_scene', queries.append)
+
+    producer = threading.Thread(target=produce)
+    ticks = addin._scheduler_stats['ticks']
+    started = time.perf_counter()
+    producer.start()
+    expected = (count + queries_every - 1) // queries_every
+    _pump_until(lambda: len(done) == count and len(queries) == expected)
+    elapsed = time.perf_counter() - started
+    producer.join()
+    return {'burst_priority': {
+        'ops': count + expected,
+        'failures': sum(not r['ok'] for r in done + queries),
+        'ops_per_sec': round((count + expected) / elapsed, 1),
+        **{f"query_{name}": value for name, value in _percentiles([r['queue_ms'] for r in queries]).items()},
+        **{f"create_{name}": value for name, value in _percentiles([r['queue_ms'] for r in done]).items()},
+        'ticks': addin._scheduler_stats['ticks'] - ticks,
+    }}
+
+
+def bench_batch(count):
+    results = {}
+    for mode in ('parametric', 'direct'):
+        _reset(mode)
+        operations = [f"create_box 1 1 1 L{i} xy {i} 0 0" for i in range(count)]
+        started = time.perf_counter()
+        result = _submit_and_wait({'command': 'batch', 'arguments': {'operations': operations}})
+        elapsed = time.perf_counter() - started
+        results[f"batch_{mode}"] = {
+            'ops': count,
+            'failures': sum(not r['ok'] for r in result.get('results', [])),
+            'ops_per_sec': round(count / elapsed, 1),
+            'total_ms': round(elapsed * 1000, 3),
+            'api_calls_per_op': round(_api_calls() / count, 2),
+            'recomputes': adsk.api_calls['Design.compute'],
+        }
+    # Primitives espacées sur un même plan, profils dessinés dans une esquisse partagée
+    _reset('shared')
+    operations = [f"create_box 1 1 1 L{i} xy {2 * i} 0 0" for i in range(count)]
+    started = time.perf_counter()
+    result = _submit_and_wait({'command': 'batch', 'arguments': {'operations': operations}})
+    elapsed = time.perf_counter() - started
+    results['batch_shared'] = {
+        'ops': count,
+        'failures': sum(not r['ok'] for r in result.get('results', [])),
+        'ops_per_sec': round(count / elapsed, 1),
+        'total_ms': round(elapsed * 1000, 3),
+        'api_calls_per_op': round(_api_calls() / count, 2),
+        'sketches': adsk.api_calls['Sketches.add'],
+    }
+    # Même scène en une seule requête à positions empaquetées
+    _reset()
+    request = {'command': 'place_primitives', 'arguments': {
+        'shape': 'box', 'positions': [v for i in range(count) for v in (i, 0, 0)], 'dimensions': [1, 1, 1], 'prefix': 'L'}}
+    started = time.perf_counter()
+    result = _submit_and_wait(request)
+    elapsed = time.perf_counter() - started
+    results['place_primitives'] = {
+        'ops': count,
+        'failures': len(result.get('failed', [])) if result['ok'] else count,
+        'ops_per_sec': round(count / elapsed, 1),
+        'total_ms': round(elapsed * 1000, 3),
+        'api_calls_per_op': round(_api_calls() / count, 2),
+        'recomputes': adsk.api_calls['Design.compute'],
+    }
+    # Fusion de toute la scène dans une cible en une requête
+    _run_prepared(['create_box 1 1 1 Target'])
+    adsk.reset_api_stats()
+    started = time.perf_counter()
+    result = _submit_and_wait('combine_many Target none join L_*')
+    elapsed = time.perf_counter() - started
+    results['combine_many'] = {
+        'ops': count,
+        'failures': 0 if result['ok'] else count,
+        'total_ms': round(elapsed * 1000, 3),
+        'api_calls_per_op': round(_api_calls() / count, 2),
+    }
+    # Déplacements et rotations successifs d'un corps, repliés dans une seule feature
+    _reset()
+    _run_prepared(['create_box 10 10 10 M', 'select_body M'])
+    adsk.reset_api_stats()
+    operations = [f"move_selection {i % 7} 1 0" if i % 2 else "rotate_selection z 15 0 0 0" for i in range(count)]
+    started = time.perf_counter()
+    result = _submit_and_wait({'command': 'batch', 'arguments': {'operations': operations}})
+    elapsed = time.perf_counter() - started
+    results['batch_moves'] = {
+        'ops': count,
+        'failures': sum(not r['ok'] for r in result.get('results', [])),
+        'ops_per_sec': round(count / elapsed, 1),
+        'total_ms': round(elapsed * 1000, 3),
+        'api_calls_per_op': round(_api_calls() / count, 2),
+        'move_features': adsk.api_calls['MoveFeatures.add'],
+    }
+    # Lot dont la dernière opération échoue : tout ce qu'il a créé est retiré en un seul retour arrière
+    _reset()
+    operations = [f"create_box 1 1 1 L{i} xy {i} 0 0" for i in range(count)] + ['combine_by_name L0 Missing join']
+    started = time.perf_counter()
+    result = _submit_and_wait({'command': 'batch', 'arguments': {'operations': operations, 'rollback_on_error': True}})
+    elapsed = time.perf_counter() - started
+    results['batch_rollback'] = {
+        'ops': count,
+        'rolled_back': int(result.get('rolled_back', False)),
+        'total_ms': round(elapsed * 1000, 3),
+        'api_calls_per_op': round(_api_calls() / count, 2),
+        'bodies_left': _app.activeProduct.rootComponent.bRepBodies.count,
+    }
+    return results
+
+
+def bench_pipelined_selection(rounds):
+    """select_body A ; move_selection ; select_body B ; move_selection écrits d'un bloc sur une connexion au socket,
+    puis get_scene : chaque déplacement doit porter sur le corps sélectionné juste avant lui, et la lecture
+    finale doit voir tous les déplacements"""
+    _reset()
+    _run_prepared(['batch ' + json.dumps([command for i in range(rounds) for command in (
+        f"create_box 10 10 10 A{i} xy {30 * i} 0 0", f"create_box 10 10 10 B{i} xy {30 * i} 50 0")])])
+    root = _app.activeProduct.rootComponent
+    names = [name for i in range(rounds) for name in (f"A{i}", f"B{i}")]
+    before = {name: addin._body_box(addin._find_body(root, name)) for name in names}
+    adsk.reset_api_stats()
+    lines = []
+    for i in range(rounds):
+        lines += [f"select_body A{i}", "move_selection 0 0 100", f"select_body B{i}", "move_selection 0 100 0"]
+    lines.append('get_scene')
+    replies = []
+
+    def client():
+        with open(os.path.join(_HOME, 'Documents', 'fusion_mcp_token'), encoding='utf-8') as f:
+            token = f.read().strip()
+        with socket.create_connection(('127.0.0.1', int(os.environ['FUSION_MCP_PORT']))) as connection:
+            # Première trame : le jeton de session, comme server.js
+            connection.sendall((json.dumps({'token': token}) + '\n').encode('utf-8'))
+            connection.sendall(b''.join((json.dumps({'id': index, 'command': line}) + '\n').encode('utf-8')
+                                        for index, line in enumerate(lines)))
+            reader = connection.makefile('rb')
+            for _ in lines:
+                replies.append(json.loads(reader.readline()))
+
+    thread = threading.Thread(target=client, daemon=True)
+    started = time.perf_counter()
+    thread.start()
+    _pump_until(lambda: not thread.is_alive())
+    elapsed = time.perf_counter() - started
+    # A monte de 100 mm en z, B avance de 100 mm en y (unités internes : cm)
+    expected = {'A': (0.0, 0.0, 10.0), 'B': (0.0, 10.0, 0.0)}
+    misplaced = 0
+    for name in names:
+        (low, _), (moved, _) = before[name], addin._body_box(addin._find_body(root, name))
+        misplaced += any(abs(b - a - d) > 1e-6 for a, b, d in zip(low, moved, expected[name[0]]))
+    # La scène lue en dernier, en mm, doit déjà montrer chaque corps à sa place finale
+    scene = {entry['name']: entry['box'][:3] for entry in replies[-1].get('bodies', [])} if len(replies) == len(lines) else {}
+    for name in names:
+        (low, _), shift = before[name], expected[name[0]]
+        seen = scene.get(name)
+        misplaced += seen is None or any(abs(v - 10 * (a + d)) > 1e-6 for v, a, d in zip(seen, low, shift))
+    return {'pipelined_selection': {
+        'ops': len(lines),
+        'failures': sum(not r['ok'] for r in replies) + len(lines) - len(replies) + misplaced,
+        'ops_per_sec': round(len(lines) / elapsed, 1),
+        'move_features': adsk.api_calls['MoveFeatures.add'],
+    }}
+
+
+def _spool_write(index, command):
+    """Écrit une entrée comme server.js : fichier .tmp puis renommage atomique en .cmd"""
+    name = f"{time.time_ns() // 1_000_000:015d}-{os.getpid():07d}-{index:09d}"
+    tmp_path = os.path.join(addin._spool_dir, name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(command)
+    os.replace(tmp_path, os.path.join(addin._spool_dir, name + addin._SPOOL_SUFFIX))
+
+
+def bench_spool(count):
+    """Entrées déposées une à une dans le spool, prises en charge par file_watcher"""
+    _reset()
+    pending = lambda: any(n.endswith(addin._SPOOL_SUFFIX) for n in os.listdir(addin._spool_dir))
+    started = time.perf_counter()
+    for i in range(count):
+        _spool_write(i, f"create_box 1 1 1 F{i}")
+        _pump_until(lambda: not pending())
+    elapsed = time.perf_counter() - started
+    pickup = _stage('create_box', 'pickup')
+    return {'spool': {
+        'ops': count,
+        'ops_per_sec': round(count / elapsed, 1),
+        'pickup_p50_ms': pickup.get('p50_ms', 0.0),
+        'pickup_p95_ms': pickup.get('p95_ms', 0.0),
+        'watcher': addin._watcher_stats['backend'],
+        'api_calls_per_op': round(_api_calls() / count, 2),
+    }}
+
+
+def bench_server_js(count):
+    """Trajet complet : JSON-RPC sur stdin de server.js -> socket -> add-in -> réponse"""
+    node = shutil.which('node')
+    if not node:
+        return {}
+    _reset()
+    # Copie de server.js : son journal s'écrit à côté du script, pas dans le dépôt
+    server_dir = os.path.join(_HOME, 'server')
+    os.makedirs(server_dir, exist_ok=True)
+    for source in (SERVER_JS, os.path.join(os.path.dirname(SERVER_JS), 'tools.json')):
+        shutil.copy(source, server_dir)
+    process = subprocess.Popen([node, os.path.join(server_dir, 'server.js')], stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=os.environ.copy())
+    latencies = []
+    replies = []
+    pipelined = []
+    timings = {}
+
+    def client():
+        # Échauffement : démarrage de node et connexion au socket de l'add-in
+        process.stdin.write(b'{"jsonrpc":"2.0","id":0,"method":"tools/list"}\n')
+        process.stdin.flush()
+        process.stdout.readline()
+        warm.set()
+        for i in range(count):
+            request = {'jsonrpc': '2.0', 'id': i + 1, 'method': 'tools/call',
+                       'params': {'name': 'create_box', 'arguments': {'width': 1, 'depth': 1, 'height': 1, 'name': f"N{i}"}}}
+            t0 = time.perf_counter()
+            process.stdin.write((json.dumps(request) + '\n').encode('utf-8'))
+            process.stdin.flush()
+            replies.append(json.loads(process.stdout.readline()))
+            latencies.append((time.perf_counter() - t0) * 1000)
+        timings['sequential'] = time.perf_counter() - started_at[0]
+        # Les mêmes requêtes écrites d'un bloc, sans attendre les réponses
+        t0 = time.perf_counter()
+        process.stdin.write(b''.join((json.dumps({
+            'jsonrpc': '2.0', 'id': count + i + 1, 'method': 'tools/call',
+            'params': {'name': 'create_box', 'arguments': {'width': 1, 'depth': 1, 'height': 1, 'name': f"P{i}"}}}) + '\n').encode('utf-8')
+            for i in range(count)))
+        process.stdin.flush()
+        for _ in range(count):
+            pipelined.append(json.loads(process.stdout.readline()))
+        timings['pipelined'] = time.perf_counter() - t0
+
+    warm = threading.Event()
+    thread = threading.Thread(target=client, daemon=True)
+    thread.start()
+    started_at = []
+    _pump_until(warm.is_set)
+    started_at.append(time.perf_counter())
+    try:
+        _pump_until(lambda: not thread.is_alive())
+    finally:
+        process.stdin.close()
+        process.terminate()
+        process.wait()
+    failed = lambda reply: 'error' in reply or reply['result'].get('isError')
+    return {'server_js': {
+        'ops': count,
+        'failures': sum(1 for r in replies if failed(r)),
+        'ops_per_sec': round(count / timings['sequential'], 1),
+        **_percentiles(latencies),
+        'api_calls_per_op': round(_api_calls() / (2 * count), 2),
+    }, 'server_js_pipelined': {
+        'ops': count,
+        'failures': sum(1 for r in pipelined if failed(r)) + count - len(pipelined),
+        'ops_per_sec': round(count / timings['pipelined'], 1),
+        'total_ms': round(timings['pipelined'] * 1000, 3),
+    }}
+
+
+def bench_replay(journal_path, pacing, speed):
+    """Rejoue un journal enregistré par l'add-in (start_recording) dans notify(), comme charge réaliste"""
+    entries, skipped = addin._read_journal(journal_path)
+    if not entries:
+        return {}
+    _reset()
+    done = []
+    latencies = []
+
+    def producer():
+        started, origin = time.perf_counter(), entries[0]['t']
+        for index, entry in enumerate(entries):
+            if pacing == 'original':
+                delay = (entry['t'] - origin) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            submitted = time.perf_counter()
+            # Une seule classe de priorité : les entrées du journal dépendent les unes des autres
+            addin._submit_request(f"bench-replay-{index}", entry['request'],
+                                  lambda result, t0=submitted: (latencies.append((time.perf_counter() - t0) * 1000), done.append(result)),
+                                  priority='modeling')
+
+    thread = threading.Thread(target=producer, daemon=True)
+    started = time.perf_counter()
+    thread.start()
+    _pump_until(lambda: len(done) == len(entries), timeout=3600)
+    elapsed = time.perf_counter() - started
+    recorded = sum(1 for e in entries if e.get('ok'))
+    return {f"replay_{pacing}": {
+        'ops': len(entries),
+        'skipped_lines': skipped,
+        # Écart d'issue par rapport à l'enregistrement : la relecture doit reproduire la session
+        'outcome_mismatches': sum(1 for e, r in zip(entries, done) if bool(e.get('ok')) != r['ok']),
+        'recorded_ok': recorded,
+        'ops_per_sec': round(len(entries) / elapsed, 1),
+        **_percentiles(latencies),
+        'api_calls_per_op': round(_api_calls() / len(entries), 2),
+    }}
+
+
+# Sens d'amélioration des indicateurs comparés : +1 plus grand est meilleur, -1 plus petit est meilleur
+def _direction(metric):
+    if metric.endswith('_per_sec'):
+        return 1
+    if metric.endswith('_ms') or metric in ('api_calls_per_op', 'recomputes', 'failures', 'outcome_mismatches'):
+        return -1
+    return 0
+
+
+def compare(baseline, current, tolerance, min_delta_ms):
+    """Affiche l'écart à la référence ; retourne le nombre de régressions au-delà de la tolérance"""
+    regressions = 0
+    for scenario, metrics in current['scenarios'].items():
+        reference = baseline['scenarios'].get(scenario)
+        if reference is None:
+            print(f"  {scenario}: nouveau scénario")
+            continue
+        for metric, value in metrics.items():
+            direction = _direction(metric)
+            old = reference.get(metric)
+            if not direction or not isinstance(old, (int, float)):
+                continue
+            change = (value - old) / old if old else (0.0 if value == old else float('inf'))
+            worse = change * direction < -tolerance
+            # Sous un écart absolu minimal, la différence est du bruit de mesure
+            if metric.endswith('_ms'):
+                worse = worse and abs(value - old) >= min_delta_ms
+            elif metric.endswith('_per_sec') and value and old:
+                worse = worse and abs(1000 / value - 1000 / old) >= min_delta_ms
+            # p99 sur quelques centaines d'échantillons : affiché, pas bloquant
+            if 'p99' in metric:
+                worse = False
+            # Le nombre d'appels d'API est déterministe : la moindre hausse compte
+            if metric == 'api_calls_per_op':
+                worse = value > old + 1e-9
+            regressions += worse
+            flag = '❌' if worse else '✅'
+            print(f"  {flag} {scenario}.{metric}: {old} -> {value} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de mesure hors ligne de l'add-in Fusion MCP")
+    parser.add_argument('--quick', action='store_true', help="Petits effectifs, pour vérifier le banc")
+    parser.add_argument('--api-latency-us', type=float, default=0.0, help="Latence simulée par appel d'API (µs)")
+    parser.add_argument('--output', help="Écrit les résultats JSON dans ce fichier")
+    parser.add_argument('--compare', help="Compare aux résultats JSON de référence")
+    parser.add_argument('--tolerance', type=float, default=0.30, help="Écart relatif toléré sur les durées (0.30 = 30 %%)")
+    parser.add_argument('--min-delta-ms', type=float, default=0.25, help="Écart absolu minimal pour signaler une durée (ms)")
+    parser.add_argument('--journal', help="Rejoue aussi ce journal enregistré par l'add-in (start_recording)")
+    parser.add_argument('--pacing', choices=('fast', 'original'), default='fast', help="Rythme de relecture du journal")
+    parser.add_argument('--speed', type=float, default=1.0, help="Accélération du rythme d'origine")
+    parser.add_argument('--skip-node', action='store_true', help="Ignore le scénario server.js")
+    options = parser.parse_args()
+
+    scale = 10 if options.quick else 1
+    adsk.set_api_latency(options.api_latency_us / 1e6)
+    addin.run(None)
+    try:
+        scenarios = {}
+        scenarios.update(bench_single(200 // scale))
+        scenarios.update(bench_burst(1000 // scale))
+        scenarios.update(bench_burst_priority(1000 // scale))
+        scenarios.update(bench_batch(500 // scale))
+        scenarios.update(bench_pipelined_selection(100 // scale))
+        scenarios.update(bench_spool(200 // scale))
+        if not options.skip_node:
+            scenarios.update(bench_server_js(200 // scale))
+        if options.journal:
+            scenarios.update(bench_replay(options.journal, options.pacing, options.speed))
+    finally:
+        addin.stop(None)
+        shutil.rmtree(_HOME, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'api_latency_us': options.api_latency_us,
+            'quick': options.quick,
+        },
+        'scenarios': scenarios,
+    }
+    for scenario, metrics in scenarios.items():
+        summary = ', '.join(f"{k}={v}" for k, v in metrics.items())
+        print(f"{scenario}: {summary}")
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ Résultats écrits dans {options.output}")
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"📊 Comparaison avec {options.compare} ({baseline['meta']['time']})")
+        # Effectifs et latence simulée doivent être les mêmes pour que les chiffres soient comparables
+        for key in ('quick', 'api_latency_us'):
+            if baseline['meta'].get(key) != report['meta'][key]:
+                print(f"⚠️ Référence incomparable: {key}={baseline['meta'].get(key)} contre {report['meta'][key]}")
+                return 2
+        regressions = compare(baseline, report, options.tolerance, options.min_delta_ms)
+        if regressions:
+            print(f"❌ {regressions} régression(s)")
+            return 1
+        print("✅ Aucune régression")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,12 +3,30 @@ import adsk.core, adsk.fusion, traceback
 import threading
 import time
 import os
+import sys
 import math
+import operator
+import select
+import ctypes, ctypes.util
+import json
+import itertools
+import array
+import fnmatch
+import functools
+import socket
+import socketserver
+import collections
+import bisect
+import heapq
+import hmac
+import secrets
+import cProfile, pstats, io
+import logging, logging.handlers
 
 # --- Variables globales ---
 _app = None
 _ui = None
-_command_file_path = None
+_spool_dir = None
 _file_watcher_thread = None 
 _stop_flag = None 
 _command_received_event_id = 'FusionMCPCommandReceived'
@@ -25,27 +43,1039 @@ def get_construction_plane(root: adsk.fusion.Component, plane_str: str):
     else: # xy ou défaut
         return root.xYConstructionPlane
 
+# Résultat structuré de la commande en cours (thread principal uniquement)
+_current_result = None
+# Profondeur de lots en cours : seul le résumé du lot ouvre une boîte de dialogue
+_batch_depth = 0
+
+# Mode de sortie : 'dialog' (boîtes modales) ou 'quiet' (journal seul, pour l'automatisation)
+_OUTPUT_MODES = ('dialog', 'quiet')
+_output_mode = os.environ.get('FUSION_MCP_OUTPUT', 'dialog').lower()
+if _output_mode not in _OUTPUT_MODES:
+    _output_mode = 'dialog'
+# Derniers statuts en mémoire, consultables via get_log
+_status_log = collections.deque(maxlen=500)
+# Journal structuré (une ligne JSON par statut), configuré au démarrage
+_status_logger = logging.getLogger('fusion_mcp_server.status')
+_status_logger.propagate = False
+
+def _configure_status_log(path: str):
+    """Dirige le journal structuré vers un fichier tournant"""
+    for handler in list(_status_logger.handlers):
+        _status_logger.removeHandler(handler)
+        handler.close()
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=2 * 1024 * 1024, backupCount=3, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    _status_logger.addHandler(handler)
+    _status_logger.setLevel(logging.INFO)
+
+def _status(message: str, ok: bool = True, **data):
+    """Signale l'issue d'une commande à l'utilisateur et au client qui l'a émise"""
+    command = None
+    if _current_result is not None:
+        _current_result['ok'] = _current_result['ok'] and ok
+        _current_result['message'] = message
+        _current_result.update(data)
+        command = _current_result.get('command')
+    entry = {'time': time.time(), 'ok': ok, 'command': command, 'message': message}
+    _status_log.append(entry)
+    if _status_logger.handlers:
+        _status_logger.log(logging.INFO if ok else logging.ERROR, json.dumps(entry, ensure_ascii=False))
+    if _ui and _output_mode == 'dialog' and _batch_depth == 0: _ui.messageBox(message)
+
+# --- Métriques ---
+# Bornes des seaux d'histogramme en ms, à la Prometheus (+Inf implicite)
+_METRIC_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+# Étapes mesurées, dans l'ordre du trajet d'une commande :
+# pickup (écriture spool -> lecture), receipt (réception -> événement), queue (événement -> thread principal),
+# parse (analyse + conversion), preflight (validation préalable), handler (appels à l'API Fusion),
+# compute (recalcul différé), total (exécution)
+_METRIC_STAGES = ('pickup', 'receipt', 'queue', 'parse', 'preflight', 'handler', 'compute', 'total')
+_METRICS_INTERVAL = float(os.environ.get('FUSION_MCP_METRICS_INTERVAL', '10'))
+
+class _Histogram:
+    """Histogramme à seaux fixes : mémoire bornée, percentiles estimés par interpolation dans le seau"""
+    __slots__ = ('buckets', 'count', 'sum', 'min', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * (len(_METRIC_BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, ms: float):
+        self.buckets[bisect.bisect_left(_METRIC_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                lower = _METRIC_BUCKETS_MS[i - 1] if i > 0 else 0.0
+                upper = _METRIC_BUCKETS_MS[i] if i < len(_METRIC_BUCKETS_MS) else self.max
+                value = lower + (upper - lower) * (rank - seen) / n
+                return round(min(max(value, self.min), self.max), 3)
+            seen += n
+        return round(self.max, 3)
+
+    def summary(self) -> dict:
+        return {'count': self.count, 'sum_ms': round(self.sum, 3), 'min_ms': round(self.min, 3) if self.count else 0.0,
+                'max_ms': round(self.max, 3), 'p50_ms': self.percentile(0.5), 'p95_ms': self.percentile(0.95),
+                'p99_ms': self.percentile(0.99)}
+
+# Commande -> {'count', 'errors', 'stages': {étape: _Histogram}} ; alimenté par plusieurs threads
+_metrics = {}
+_metrics_lock = threading.Lock()
+_metrics_version = 0
+_metrics_paths = None
+
+def _record_metrics(command_name: str, stages: dict, ok: bool = True):
+    """Ajoute les durées d'étapes (ms) d'une exécution aux histogrammes de sa commande"""
+    global _metrics_version
+    with _metrics_lock:
+        entry = _metrics.setdefault(command_name, {'count': 0, 'errors': 0, 'stages': {}})
+        entry['count'] += 1
+        if not ok:
+            entry['errors'] += 1
+        for stage, ms in stages.items():
+            if ms is not None:
+                entry['stages'].setdefault(stage, _Histogram()).observe(ms)
+        _metrics_version += 1
+
+def _metrics_snapshot(command_name: str = None) -> dict:
+    """Résumé des métriques par commande (toutes, ou une seule)"""
+    with _metrics_lock:
+        names = [command_name] if command_name else sorted(_metrics)
+        commands = {}
+        for name in names:
+            entry = _metrics.get(name)
+            if entry is None:
+                continue
+            commands[name] = {
+                'count': entry['count'],
+                'errors': entry['errors'],
+                'error_rate': round(entry['errors'] / entry['count'], 4),
+                'stages': {stage: entry['stages'][stage].summary() for stage in _METRIC_STAGES if stage in entry['stages']},
+            }
+    return {'time': time.time(), 'commands': commands}
+
+def _metrics_prometheus() -> str:
+    """Métriques au format texte Prometheus"""
+    lines = ['# HELP fusion_mcp_stage_duration_ms Durée des étapes de traitement des commandes MCP',
+             '# TYPE fusion_mcp_stage_duration_ms histogram']
+    totals = []
+    with _metrics_lock:
+        for name in sorted(_metrics):
+            entry = _metrics[name]
+            totals.append((name, entry['count'], entry['errors']))
+            for stage in _METRIC_STAGES:
+                histogram = entry['stages'].get(stage)
+                if histogram is None:
+                    continue
+                labels = f'command="{name}",stage="{stage}"'
+                cumulative = 0
+                for bound, n in zip(_METRIC_BUCKETS_MS + ('+Inf',), histogram.buckets):
+                    cumulative += n
+                    lines.append(f'fusion_mcp_stage_duration_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'fusion_mcp_stage_duration_ms_sum{{{labels}}} {histogram.sum:.3f}')
+                lines.append(f'fusion_mcp_stage_duration_ms_count{{{labels}}} {histogram.count}')
+    lines += ['# HELP fusion_mcp_commands_total Commandes exécutées', '# TYPE fusion_mcp_commands_total counter']
+    lines += [f'fusion_mcp_commands_total{{command="{name}"}} {count}' for name, count, _ in totals]
+    lines += ['# HELP fusion_mcp_command_errors_total Commandes en échec', '# TYPE fusion_mcp_command_errors_total counter']
+    lines += [f'fusion_mcp_command_errors_total{{command="{name}"}} {errors}' for name, _, errors in totals]
+    return '\n'.join(lines) + '\n'
+
+def _write_text_atomic(path: str, text: str):
+    """Écrit un fichier d'un bloc : un lecteur ne voit jamais de fichier à moitié écrit"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _write_metrics(last_version: int = -1) -> int:
+    """Écrit les fichiers JSON et Prometheus s'il y a du nouveau ; retourne la version écrite"""
+    version = _metrics_version
+    if _metrics_paths is None or version == last_version:
+        return last_version
+    json_path, prom_path = _metrics_paths
+    snapshot = _metrics_snapshot()
+    snapshot['watcher'] = dict(_watcher_stats)
+    with _pending_lock:
+        queued = sum(1 for entry in _pending_requests.values() if not entry.running)
+        snapshot['scheduler'] = dict(_scheduler_stats, queued=queued, tick_budget_ms=_tick_budget_ms)
+    _write_text_atomic(json_path, json.dumps(snapshot, ensure_ascii=False, indent=2))
+    _write_text_atomic(prom_path, _metrics_prometheus())
+    return version
+
+def metrics_writer(stop_flag):
+    """Exporte périodiquement les métriques, puis une dernière fois à l'arrêt"""
+    written = -1
+    while not stop_flag.wait(_METRICS_INTERVAL):
+        try:
+            written = _write_metrics(written)
+        except OSError as e:
+            print(f"⚠️ Export des métriques impossible: {e}")
+    try:
+        _write_metrics(written)
+    except OSError:
+        pass
+
+# --- Registre des commandes ---
+# Nom -> spécification déclarative ; sert au dispatch, à la validation et au tools/list de server.js
+_COMMANDS = {}
+# Jetons positionnels qui désignent un plan ou une absence de nom, jamais un nom de corps
+_NOT_A_BODY_NAME = ('xy', 'yz', 'xz', 'none', 'null')
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on', 'oui')
+    return bool(value)
+
+def _to_json(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+def _to_names(value):
+    # Liste JSON de noms, ou texte « A,B,C »
+    if isinstance(value, str):
+        text = value.strip()
+        if text.lower() in ('none', 'null'):
+            return None
+        if text.startswith('['):
+            return json.loads(text)
+        return [name for name in (part.strip() for part in text.split(',')) if name]
+    return list(value)
+
+def _to_packed(value):
+    # Liste JSON, ou texte compact « x,y,z;x,y,z » laissé tel quel pour _unpack_mm
+    if isinstance(value, str):
+        text = value.strip()
+        if text.lower() in ('none', 'null'):
+            return None
+        if text.startswith('['):
+            return json.loads(text)
+    return value
+
+# Type d'argument -> (conversion vers les unités internes de Fusion, type JSON Schema)
+_ARG_KINDS = {
+    'length': (lambda v: float(v) / 10.0, 'number'),   # mm -> cm
+    'number': (float, 'number'),
+    'angle': (float, 'number'),                         # degrés, convertis par la fonction
+    'integer': (int, 'integer'),
+    'string': (str, 'string'),
+    'name': (str, 'string'),
+    'boolean': (_to_bool, 'boolean'),
+    'json': (_to_json, None),
+    'packed': (_to_packed, None),
+    'names': (_to_names, None),
+}
+
+def _arg(name: str, kind: str, default=None, description: str = '', required: bool = False, choices=None, schema=None):
+    """Déclare un argument de commande : nom MCP, type, valeur par défaut (unités MCP) et description"""
+    return {'name': name, 'kind': kind, 'default': default, 'description': description,
+            'required': required, 'choices': choices, 'schema': schema}
+
+class _CommandSpec:
+    """Commande enregistrée : fonction cible et conversion de ses arguments, compilée une fois"""
+
+    def __init__(self, name, handler, description, args):
+        self.name = name
+        self.handler = handler
+        self.description = description
+        self.args = args
+        self._binders = [self._compile(arg) for arg in args]
+
+    @staticmethod
+    def _compile(arg):
+        convert = _ARG_KINDS[arg['kind']][0]
+        choices = arg['choices']
+        if choices:
+            base_convert = convert
+            def convert(value, base_convert=base_convert):
+                value = base_convert(value).lower()
+                if value not in choices:
+                    raise ValueError(f"'{arg['name']}' doit valoir {', '.join(choices)} (reçu '{value}')")
+                return value
+        default = None if arg['default'] is None else convert(arg['default'])
+        return arg['name'], convert, default, arg['required']
+
+    def bind(self, arguments):
+        """Convertit des arguments nommés (dict) ou positionnels (liste de jetons) en paramètres de la fonction"""
+        if isinstance(arguments, dict):
+            arguments = dict(arguments)
+        else:
+            arguments = self._name_positional(arguments)
+        values = []
+        for name, convert, default, required in self._binders:
+            value = arguments.get(name)
+            if value is None or value == '':
+                if default is None and required:
+                    raise ValueError(f"argument '{name}' manquant")
+                values.append(default)
+                continue
+            values.append(convert(value))
+        return values
+
+    def _name_positional(self, tokens):
+        """Associe les jetons de l'ancien format texte aux noms d'arguments"""
+        named = {}
+        tokens = list(tokens)
+        for arg in self.args:
+            if not tokens:
+                break
+            token = tokens[0]
+            if arg['kind'] == 'name' and not arg['required'] and token.lower() in _NOT_A_BODY_NAME:
+                # Nom omis : un plan n'est pas consommé, 'none'/'null' l'est
+                if token.lower() in ('none', 'null'):
+                    tokens.pop(0)
+                continue
+            named[arg['name']] = tokens.pop(0)
+        return named
+
+    def schema(self):
+        """Description MCP (tools/list) de la commande"""
+        properties = {}
+        for arg in self.args:
+            prop = dict(arg['schema']) if arg['schema'] else {'type': _ARG_KINDS[arg['kind']][1]}
+            prop['description'] = arg['description']
+            if arg['choices']:
+                prop['enum'] = list(arg['choices'])
+            properties[arg['name']] = prop
+        return {
+            'name': self.name,
+            'description': self.description,
+            'inputSchema': {
+                'type': 'object',
+                'properties': properties,
+                'required': [arg['name'] for arg in self.args if arg['required']],
+            },
+        }
+
+def command(name: str, description: str, *args):
+    """Décorateur : enregistre une fonction comme commande MCP"""
+    def register(handler):
+        _COMMANDS[name] = _CommandSpec(name, handler, description, list(args))
+        return handler
+    return register
+
+def export_tool_schemas():
+    """Retourne la liste des outils MCP générée depuis le registre"""
+    return [spec.schema() for spec in _COMMANDS.values()]
+
+def _parse_request(request):
+    """Retourne (nom, arguments) depuis une requête JSON ou une ligne de texte"""
+    if isinstance(request, str):
+        text = request.strip()
+        if text.startswith('{'):
+            request = json.loads(text)
+        else:
+            name, _, rest = text.partition(' ')
+            rest = rest.strip()
+            if rest.startswith('{'):
+                return name.lower(), json.loads(rest)
+            if rest.startswith('['):
+                return name.lower(), [json.loads(rest)]
+            return name.lower(), rest.split()
+    name = request.get('command') or request.get('tool') or ''
+    return name.lower(), request.get('arguments') or {}
+
+def _describe_request(request):
+    """Forme lisible d'une requête pour les journaux, y compris d'une requête malformée"""
+    if isinstance(request, str):
+        return request.strip()
+    try:
+        name, arguments = _parse_request(request)
+        return f"{name} {json.dumps(arguments, ensure_ascii=False)}" if arguments else name
+    except (AttributeError, TypeError, ValueError):
+        return repr(request)[:200]
+
+# Arguments communs aux primitives et aux booléens
+_PLANE_CHOICES = ('xy', 'yz', 'xz')
+_AXIS_CHOICES = ('x', 'y', 'z')
+_OPERATION_CHOICES = ('join', 'cut', 'intersect')
+
+def _placement_args(kind_label: str):
+    return (
+        _arg('name', 'name', None, f"Nom {kind_label} (optionnel)"),
+        _arg('plane', 'string', 'xy', "Plan de construction: xy, yz, xz (optionnel)", choices=_PLANE_CHOICES),
+        _arg('cx', 'length', 0, "Position X du centre en mm (optionnel)"),
+        _arg('cy', 'length', 0, "Position Y du centre en mm (optionnel)"),
+        _arg('cz', 'length', 0, "Position Z du centre en mm (optionnel)"),
+    )
+
+# --- Index des corps par nom ---
+# Nom -> corps du composant racine indexé ; évite de parcourir bRepBodies (un appel d'API par corps) à chaque recherche
+_body_index = {}
+_body_index_root = None
+
+def _indexed_bodies(root):
+    """Index du composant racine, vidé si le design actif a changé"""
+    global _body_index_root
+    if _body_index_root is None or _body_index_root != root:
+        _body_index.clear()
+        _edge_tables.clear()
+        _spatial_invalidate()
+        _forget_shared_sketches()
+        _checkpoints.clear()
+        _body_index_root = root
+    return _body_index
+
+def _rebuild_body_index(root):
+    """Reconstruit l'index en un seul parcours ; le premier corps d'un nom l'emporte, comme l'ancienne recherche"""
+    index = _indexed_bodies(root)
+    index.clear()
+    for body in root.bRepBodies:
+        index.setdefault(body.name, body)
+    return index
+
+def _find_body(root, name: str):
+    """Retourne le corps nommé name ou None, sans parcours tant que l'index est à jour"""
+    body = _indexed_bodies(root).get(name)
+    # Revalidation à chaque accès : un corps supprimé, annulé ou renommé à la main force une reconstruction
+    if body is not None and body.isValid and body.name == name:
+        return body
+    return _rebuild_body_index(root).get(name)
+
+def _name_body(root, new_body, body_name: str = None):
+    """Nomme un corps que l'on vient de créer et l'ajoute à l'index"""
+    if body_name:
+        new_body.name = body_name
+    # Fusion peut suffixer un nom déjà pris : on indexe le nom effectif
+    name = new_body.name
+    _indexed_bodies(root)[name] = new_body
+    _spatial_mark(name)
+
+def _unindex_body(root, name: str):
+    """Retire de l'index un corps consommé par une de nos commandes"""
+    _indexed_bodies(root).pop(name, None)
+    _spatial_tree.remove(name)
+    _spatial_dirty_names.discard(name)
+    _scene_dirty_names.add(name)
+
+# --- Table des arêtes par corps ---
+# Caractéristiques de chaque arête, lues une fois par corps puis filtrées en Python : une requête
+# sur un corps inchangé ne coûte plus qu'une vérification de signature au lieu d'un parcours de l'API
+# room : place disponible pour un congé (largeur des faces planes voisines, ou rayon d'un cercle), None si inconnue
+_EdgeRow = collections.namedtuple('_EdgeRow', 'edge key kind length direction convexity faces lo hi room')
+_EDGE_TABLE_LIMIT = 32
+_EDGE_AXIS_TOLERANCE = 1e-6
+_EDGE_KINDS = {
+    adsk.core.Curve3DTypes.Line3DCurveType: 'line',
+    adsk.core.Curve3DTypes.Arc3DCurveType: 'arc',
+    adsk.core.Curve3DTypes.Circle3DCurveType: 'circle',
+    adsk.core.Curve3DTypes.Ellipse3DCurveType: 'ellipse',
+    adsk.core.Curve3DTypes.EllipticalArc3DCurveType: 'elliptical_arc',
+    adsk.core.Curve3DTypes.NurbsCurve3DCurveType: 'nurbs',
+}
+_FACE_CHOICES = ('+x', '-x', '+y', '-y', '+z', '-z')
+_edge_tables = collections.OrderedDict()  # entityToken -> (signature, lignes), du moins au plus récent
+
+def _unit(x: float, y: float, z: float):
+    norm = math.sqrt(x * x + y * y + z * z)
+    return (x / norm, y / norm, z / norm) if norm else None
+
+def _face_info(face, faces: dict):
+    """(étiquette '+z', '-x'... ou None, normale extérieure, boîte) d'une face plane ; None pour une autre surface"""
+    key = face.tempId
+    if key not in faces:
+        info = None
+        geometry = face.geometry
+        if geometry.surfaceType == adsk.core.SurfaceTypes.PlaneSurfaceType:
+            sign = -1 if face.isParamReversed else 1
+            normal = _unit(geometry.normal.x * sign, geometry.normal.y * sign, geometry.normal.z * sign)
+            tag = None
+            for axis, component in zip('xyz', normal or ()):
+                if abs(abs(component) - 1) < _EDGE_AXIS_TOLERANCE:
+                    tag = ('+' if component > 0 else '-') + axis
+            box = face.boundingBox
+            info = (tag, normal, box.minPoint.asArray(), box.maxPoint.asArray())
+        faces[key] = info
+    return faces[key]
+
+def _face_width(info, direction):
+    """Étendue d'une face plane perpendiculairement à une arête, dans le plan de la face"""
+    _, normal, lo, hi = info
+    if normal is None or direction is None:
+        return None
+    across = (normal[1] * direction[2] - normal[2] * direction[1],
+              normal[2] * direction[0] - normal[0] * direction[2],
+              normal[0] * direction[1] - normal[1] * direction[0])
+    return sum(abs(a) * (h - l) for a, l, h in zip(across, lo, hi))
+
+def _body_signature(body, edges):
+    """Empreinte bon marché d'un corps : nombre d'arêtes et boîte englobante"""
+    box = body.boundingBox
+    return (edges.count,) + tuple(box.minPoint.asArray()) + tuple(box.maxPoint.asArray())
+
+def _build_edge_table(body, edges):
+    """Lit une fois les caractéristiques de toutes les arêtes d'un corps"""
+    try:
+        concave = {edge.tempId for edge in body.concaveEdges}
+        convex = {edge.tempId for edge in body.convexEdges}
+    except AttributeError:
+        concave = convex = None
+    face_infos = {}
+    rows = []
+    for edge in edges:
+        geometry = edge.geometry
+        kind = _EDGE_KINDS.get(geometry.curveType, 'other')
+        if kind == 'line':
+            start, end = geometry.startPoint, geometry.endPoint
+            direction = _unit(end.x - start.x, end.y - start.y, end.z - start.z)
+        elif kind in ('arc', 'circle'):
+            # Axe du cercle : une arête circulaire est « alignée » sur z si elle tourne autour de z
+            direction = _unit(geometry.normal.x, geometry.normal.y, geometry.normal.z)
+        else:
+            direction = None
+        key = edge.tempId
+        if concave is None:
+            convexity = 'unknown'
+        else:
+            convexity = 'concave' if key in concave else 'convex' if key in convex else 'smooth'
+        infos = [info for info in (_face_info(face, face_infos) for face in edge.faces) if info]
+        faces = frozenset(info[0] for info in infos if info[0])
+        if kind == 'line':
+            widths = [w for w in (_face_width(info, direction) for info in infos) if w is not None]
+            room = min(widths) if widths else None
+        elif kind in ('arc', 'circle'):
+            room = geometry.radius
+        else:
+            room = None
+        box = edge.boundingBox
+        rows.append(_EdgeRow(edge, key, kind, edge.length, direction, convexity, faces,
+                             tuple(box.minPoint.asArray()), tuple(box.maxPoint.asArray()), room))
+    return rows
+
+def _edge_table(body):
+    """Table des arêtes d'un corps, reconstruite seulement si sa signature a changé ; retourne (lignes, depuis_cache)"""
+    edges = body.edges
+    key = body.entityToken
+    signature = _body_signature(body, edges)
+    cached = _edge_tables.get(key)
+    if cached is not None and cached[0] == signature:
+        _edge_tables.move_to_end(key)
+        return cached[1], True
+    rows = _build_edge_table(body, edges)
+    _edge_tables[key] = (signature, rows)
+    _edge_tables.move_to_end(key)
+    while len(_edge_tables) > _EDGE_TABLE_LIMIT:
+        _edge_tables.popitem(last=False)
+    return rows, False
+
+def _query_edges(rows, kind: str = 'all', min_length: float = None, max_length: float = None, axis: str = None,
+                 convexity: str = 'any', face: str = None, region=None):
+    """Filtre les lignes de la table ; longueurs et région en cm"""
+    axis_index = 'xyz'.index(axis) if axis else None
+    for row in rows:
+        if kind == 'circular':
+            if row.kind != 'circle':
+                continue
+        elif kind != 'all' and row.kind != kind:
+            continue
+        if min_length is not None and row.length < min_length:
+            continue
+        if max_length is not None and row.length > max_length:
+            continue
+        if axis_index is not None and (row.direction is None or abs(abs(row.direction[axis_index]) - 1) > _EDGE_AXIS_TOLERANCE):
+            continue
+        if convexity != 'any' and row.convexity != convexity:
+            continue
+        if face and face not in row.faces:
+            continue
+        if region and not all(region[i] <= row.lo[i] and row.hi[i] <= region[i + 3] for i in range(3)):
+            continue
+        yield row
+
+# --- Index spatial des corps (arbre AABB dynamique) ---
+# Boîtes englobantes des corps du composant racine, en cm, rangées dans un arbre binaire de boîtes :
+# recherche par région, plus proche voisin et chevauchements en O(log n) au lieu d'un parcours de bRepBodies.
+# Nos commandes signalent les corps créés, déplacés ou combinés ; leurs boîtes ne sont relues qu'à la
+# requête suivante. Un nombre de corps incohérent (modification à la main) ou un undo/redo force une reconstruction,
+# de même qu'une clé renvoyée par l'arbre qui ne désigne plus aucun corps (renommage dans l'interface).
+_SPATIAL_EPSILON = 1e-7
+
+class _AABBNode:
+    __slots__ = ('lo', 'hi', 'parent', 'left', 'right', 'key', 'height')
+
+    def __init__(self, lo, hi, key=None):
+        self.lo, self.hi, self.key = lo, hi, key
+        self.parent = self.left = self.right = None
+        self.height = 0
+
+def _box_union(lo1, hi1, lo2, hi2):
+    return ((min(lo1[0], lo2[0]), min(lo1[1], lo2[1]), min(lo1[2], lo2[2])),
+            (max(hi1[0], hi2[0]), max(hi1[1], hi2[1]), max(hi1[2], hi2[2])))
+
+def _box_area(lo, hi):
+    """Demi-surface d'une boîte : coût d'un nœud pour l'heuristique d'insertion"""
+    dx, dy, dz = hi[0] - lo[0], hi[1] - lo[1], hi[2] - lo[2]
+    return dx * dy + dy * dz + dz * dx
+
+def _box_distance(point, lo, hi):
+    d2 = 0.0
+    for p, l, h in zip(point, lo, hi):
+        d = l - p if p < l else p - h if p > h else 0.0
+        d2 += d * d
+    return math.sqrt(d2)
+
+class _AABBTree:
+    """Arbre de boîtes englobantes : insertion à moindre surface, retrait et mise à jour d'une feuille"""
+
+    def __init__(self):
+        self.root = None
+        self.leaves = {}
+
+    def __len__(self):
+        return len(self.leaves)
+
+    def clear(self):
+        self.root = None
+        self.leaves.clear()
+
+    def build(self, items):
+        """Construction en bloc par coupes médianes selon l'axe le plus long : arbre équilibré"""
+        self.clear()
+        nodes = []
+        for key, lo, hi in items:
+            node = _AABBNode(tuple(lo), tuple(hi), key)
+            self.leaves[key] = node
+            nodes.append(node)
+        self.root = self._build(nodes) if nodes else None
+
+    def _build(self, nodes):
+        if len(nodes) == 1:
+            return nodes[0]
+        lo = tuple(min(n.lo[i] for n in nodes) for i in range(3))
+        hi = tuple(max(n.hi[i] for n in nodes) for i in range(3))
+        axis = max(range(3), key=lambda i: hi[i] - lo[i])
+        nodes.sort(key=lambda n: n.lo[axis] + n.hi[axis])
+        middle = len(nodes) // 2
+        parent = _AABBNode(lo, hi)
+        parent.left, parent.right = self._build(nodes[:middle]), self._build(nodes[middle:])
+        parent.left.parent = parent.right.parent = parent
+        parent.height = 1 + max(parent.left.height, parent.right.height)
+        return parent
+
+    def insert(self, key, lo, hi):
+        leaf = _AABBNode(tuple(lo), tuple(hi), key)
+        self.leaves[key] = leaf
+        if self.root is None:
+            self.root = leaf
+            return
+        # Descente vers le frère qui agrandit le moins la surface totale
+        node = self.root
+        while node.key is None:
+            union_lo, union_hi = _box_union(node.lo, node.hi, leaf.lo, leaf.hi)
+            area = _box_area(union_lo, union_hi)
+            cost_here = 2 * area
+            inherited = 2 * (area - _box_area(node.lo, node.hi))
+            costs = []
+            for child in (node.left, node.right):
+                child_lo, child_hi = _box_union(child.lo, child.hi, leaf.lo, leaf.hi)
+                cost = _box_area(child_lo, child_hi) + inherited
+                if child.key is None:
+                    cost -= _box_area(child.lo, child.hi)
+                costs.append(cost)
+            if cost_here < costs[0] and cost_here < costs[1]:
+                break
+            node = node.left if costs[0] <= costs[1] else node.right
+        old_parent = node.parent
+        parent = _AABBNode(*_box_union(node.lo, node.hi, leaf.lo, leaf.hi))
+        parent.parent = old_parent
+        parent.left, parent.right = node, leaf
+        node.parent = leaf.parent = parent
+        if old_parent is None:
+            self.root = parent
+        elif old_parent.left is node:
+            old_parent.left = parent
+        else:
+            old_parent.right = parent
+        self._refit(parent)
+
+    def remove(self, key):
+        leaf = self.leaves.pop(key, None)
+        if leaf is None:
+            return
+        parent = leaf.parent
+        if parent is None:
+            self.root = None
+            return
+        sibling = parent.right if parent.left is leaf else parent.left
+        grandparent = parent.parent
+        sibling.parent = grandparent
+        if grandparent is None:
+            self.root = sibling
+            return
+        if grandparent.left is parent:
+            grandparent.left = sibling
+        else:
+            grandparent.right = sibling
+        self._refit(grandparent)
+
+    def update(self, key, lo, hi):
+        leaf = self.leaves.get(key)
+        if leaf is not None and leaf.lo == tuple(lo) and leaf.hi == tuple(hi):
+            return
+        self.remove(key)
+        self.insert(key, lo, hi)
+
+    def _refit(self, node):
+        while node is not None:
+            node.lo, node.hi = _box_union(node.left.lo, node.left.hi, node.right.lo, node.right.hi)
+            node.height = 1 + max(node.left.height, node.right.height)
+            node = node.parent
+
+    def is_degenerate(self):
+        """Vrai si les insertions successives ont trop déséquilibré l'arbre"""
+        return self.root is not None and self.root.height > 3 * max(1, len(self.leaves)).bit_length() + 2
+
+    def query(self, lo, hi, inside: bool = False):
+        """Clés des boîtes qui touchent [lo, hi], ou qui y sont entièrement contenues"""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            if any(node.lo[i] > hi[i] or node.hi[i] < lo[i] for i in range(3)):
+                continue
+            if node.key is None:
+                stack.append(node.left)
+                stack.append(node.right)
+            elif not inside or all(lo[i] <= node.lo[i] and node.hi[i] <= hi[i] for i in range(3)):
+                found.append(node.key)
+        return found
+
+    def nearest(self, point, count: int = 1):
+        """count clés les plus proches de point (distance à la boîte), parcours au meilleur d'abord"""
+        found = []
+        if self.root is None:
+            return found
+        heap = [(_box_distance(point, self.root.lo, self.root.hi), 0, self.root)]
+        tie = itertools.count(1)
+        while heap and len(found) < count:
+            distance, _, node = heapq.heappop(heap)
+            if node.key is not None:
+                found.append((distance, node.key))
+                continue
+            for child in (node.left, node.right):
+                heapq.heappush(heap, (_box_distance(point, child.lo, child.hi), next(tie), child))
+        return found
+
+    def overlaps(self, key=None):
+        """Couples de clés dont les boîtes se chevauchent (contact exclu), ou partenaires de key"""
+        keys = [key] if key is not None else list(self.leaves)
+        pairs = []
+        for first in keys:
+            leaf = self.leaves[first]
+            lo = tuple(v + _SPATIAL_EPSILON for v in leaf.lo)
+            hi = tuple(v - _SPATIAL_EPSILON for v in leaf.hi)
+            for second in self.query(lo, hi):
+                if second != first and (key is not None or first < second):
+                    pairs.append((first, second))
+        return pairs
+
+_spatial_tree = _AABBTree()
+_spatial_dirty_names = set()   # corps nommés à relire
+_spatial_dirty_bodies = []     # corps modifiés dont le nom n'a pas encore été lu
+_spatial_stale = True          # reconstruction complète nécessaire
+
+def _spatial_mark(name: str = None, body=None):
+    """Signale un corps créé ou modifié ; sa boîte et sa description seront relues à la prochaine requête spatiale ou get_scene"""
+    if name:
+        _spatial_dirty_names.add(name)
+        _scene_dirty_names.add(name)
+    elif body is not None:
+        _spatial_dirty_bodies.append(body)
+        _scene_dirty_bodies.append(body)
+
+def _spatial_invalidate():
+    """Force la reconstruction de l'index spatial (undo/redo, changement de design)"""
+    global _spatial_stale, _scene_stale
+    _spatial_stale = True
+    _spatial_dirty_names.clear()
+    _spatial_dirty_bodies.clear()
+    _scene_stale = True
+
+def _body_box(body):
+    box = body.boundingBox
+    return tuple(box.minPoint.asArray()), tuple(box.maxPoint.asArray())
+
+def _spatial_index(root):
+    """Index spatial à jour : relit les seuls corps signalés, ou reconstruit tout si l'index a divergé"""
+    global _spatial_stale
+    _indexed_bodies(root)
+    if not _spatial_stale:
+        for body in _spatial_dirty_bodies:
+            if body.isValid:
+                name = body.name
+                _spatial_tree.update(name, *_body_box(body))
+                _spatial_dirty_names.discard(name)
+        for name in _spatial_dirty_names:
+            body = _find_body(root, name)
+            if body is None:
+                _spatial_tree.remove(name)
+            else:
+                _spatial_tree.update(name, *_body_box(body))
+        _spatial_stale = root.bRepBodies.count != len(_spatial_tree) or _spatial_tree.is_degenerate()
+    _spatial_dirty_names.clear()
+    _spatial_dirty_bodies.clear()
+    if _spatial_stale:
+        _spatial_tree.build([(body.name, *_body_box(body)) for body in root.bRepBodies])
+        _spatial_stale = False
+    return _spatial_tree
+
+# --- Instantané de la scène (get_scene) ---
+# Les corps signalés par nos commandes sont relus à la requête suivante ; chaque description changée prend
+# le numéro de révision courant, et un client qui repasse la dernière révision reçue n'obtient que la différence
+_SCENE_REMOVED_LIMIT = 10000   # suppressions mémorisées ; un client plus ancien repart d'un instantané complet
+_SCENE_REPORT_LIMIT = 200      # lignes de corps dans le message
+_scene_entries = {}            # nom -> description du corps
+_scene_revisions = {}          # nom -> révision de sa dernière modification
+_scene_removed = collections.OrderedDict()  # nom -> révision de sa suppression, par révision croissante
+_scene_revision = 0
+_scene_floor = 0               # plus ancienne révision depuis laquelle un différentiel reste exact
+_scene_dirty_names = set()
+_scene_dirty_bodies = []
+_scene_stale = True            # relecture complète nécessaire (undo/redo, changement de design, divergence)
+
+def _scene_entry(body, name: str):
+    """Description d'un corps : boîte en mm, volume en mm³, nombres de faces et d'arêtes, matériau"""
+    box = body.boundingBox
+    material = body.material
+    return {'name': name,
+            'box': [round(v * 10, 6) for v in box.minPoint.asArray() + box.maxPoint.asArray()],
+            'volume': round(body.volume * 1000, 6),
+            'faces': body.faces.count,
+            'edges': body.edges.count,
+            'material': material.name if material else None}
+
+def _scene_refresh(root):
+    """Relit les corps signalés, ou tout le design s'il a divergé, et attribue une révision aux descriptions changées"""
+    global _scene_revision, _scene_floor, _scene_stale
+    _indexed_bodies(root)
+    fresh = {}  # nom -> description relue, None si le corps a disparu
+    if not _scene_stale:
+        for body in _scene_dirty_bodies:
+            if body.isValid:
+                name = body.name
+                fresh[name] = _scene_entry(body, name)
+        for name in _scene_dirty_names:
+            if name not in fresh:
+                body = _find_body(root, name)
+                fresh[name] = None if body is None else _scene_entry(body, name)
+        count = len(_scene_entries) + sum((entry is not None) - (name in _scene_entries) for name, entry in fresh.items())
+        # Corps ajoutés ou supprimés hors de nos commandes : on relit tout
+        _scene_stale = root.bRepBodies.count != count
+    _scene_dirty_names.clear()
+    _scene_dirty_bodies.clear()
+    if _scene_stale:
+        fresh = {}
+        for body in root.bRepBodies:
+            name = body.name
+            if name not in fresh:
+                fresh[name] = _scene_entry(body, name)
+        for name in _scene_entries:
+            fresh.setdefault(name, None)
+        _scene_stale = False
+    revision = _scene_revision + 1
+    for name, entry in fresh.items():
+        if entry == _scene_entries.get(name):
+            continue
+        if entry is None:
+            del _scene_entries[name]
+            del _scene_revisions[name]
+            _scene_removed[name] = revision
+            _scene_removed.move_to_end(name)
+        else:
+            _scene_entries[name] = entry
+            _scene_revisions[name] = revision
+            _scene_removed.pop(name, None)
+        _scene_revision = revision
+    while len(_scene_removed) > _SCENE_REMOVED_LIMIT:
+        _scene_floor = _scene_removed.popitem(last=False)[1]
+
+# --- Création directe (TemporaryBRepManager) ---
+# 'parametric' : esquisse + extrusion/révolution ; 'direct' : corps B-Rep insérés dans une base feature ;
+# 'shared' : paramétrique, avec esquisses et plans décalés réutilisés d'une primitive à l'autre
+_CREATION_MODES = ('parametric', 'direct', 'shared')
+_creation_mode = os.environ.get('FUSION_MCP_CREATION', 'parametric').lower()
+if _creation_mode not in _CREATION_MODES:
+    _creation_mode = 'parametric'
+# Base feature ouverte, partagée par toutes les primitives directes d'un même lot
+_open_base_feature = None
+# Commandes qui peuvent écrire dans la base feature ouverte sans la refermer
+_BASE_FEATURE_COMMANDS = {'create_cube', 'create_cylinder', 'create_box', 'create_sphere', 'create_cone', 'place_primitives'}
+
+def _offset_point(x: float, y: float, z: float, direction, distance: float):
+    """Point (x, y, z) décalé de distance le long de direction"""
+    return adsk.core.Point3D.create(x + direction.x * distance, y + direction.y * distance, z + direction.z * distance)
+
+def _direct_box(root, plane_str: str, cx: float, cy: float, cz: float, width: float, depth: float, height: float):
+    """Boîte temporaire : base centrée en (cx, cy, cz), largeur/profondeur dans le plan, hauteur selon sa normale"""
+    geometry = get_construction_plane(root, plane_str).geometry
+    center = _offset_point(cx, cy, cz, geometry.normal, height / 2)
+    box = adsk.core.OrientedBoundingBox3D.create(center, geometry.uDirection, geometry.vDirection, width, depth, height)
+    return adsk.fusion.TemporaryBRepManager.get().createBox(box)
+
+def _direct_cylinder(root, plane_str: str, cx: float, cy: float, cz: float, base_radius: float, top_radius: float, height: float):
+    """Cylindre (ou cône si top_radius vaut 0) temporaire dressé selon la normale du plan"""
+    normal = get_construction_plane(root, plane_str).geometry.normal
+    base = adsk.core.Point3D.create(cx, cy, cz)
+    top = _offset_point(cx, cy, cz, normal, height)
+    return adsk.fusion.TemporaryBRepManager.get().createCylinderOrCone(base, base_radius, top, top_radius)
+
+def _temporary_body_container(root):
+    """Base feature qui reçoit les corps temporaires (ouverte à la demande), ou None en modélisation directe"""
+    global _open_base_feature
+    design = adsk.fusion.Design.cast(_app.activeProduct)
+    if design.designType == adsk.fusion.DesignTypes.DirectDesignType:
+        return None
+    if _open_base_feature is None:
+        _open_base_feature = root.features.baseFeatures.add()
+        _open_base_feature.startEdit()
+    return _open_base_feature
+
+def _insert_temporary_body(root, temp_body, body_name: str = None):
+    """Ajoute un corps temporaire au design, dans la base feature ouverte en mode paramétrique"""
+    base_feature = _temporary_body_container(root)
+    new_body = root.bRepBodies.add(temp_body) if base_feature is None else root.bRepBodies.add(temp_body, base_feature)
+    _name_body(root, new_body, body_name)
+    return new_body
+
+def _finish_base_feature():
+    """Referme la base feature ouverte : une seule entrée de timeline pour toutes ses primitives"""
+    global _open_base_feature
+    if _open_base_feature is not None:
+        base_feature, _open_base_feature = _open_base_feature, None
+        base_feature.finishEdit()
+
+@command('set_creation_mode', "Choisit le mode de création des primitives : parametric (esquisse + extrusion), direct (corps B-Rep dans une base feature, plus rapide) ou shared (paramétrique, une esquisse partagée par plan)",
+         _arg('mode', 'string', None, "Mode: parametric, direct ou shared", required=True, choices=_CREATION_MODES))
+def set_creation_mode(mode: str):
+    """Bascule entre création paramétrique et création directe des primitives"""
+    global _creation_mode
+    _finish_base_feature()
+    _creation_mode = mode
+    _status(f"Mode de création: {mode}", mode=mode)
+
+# --- Esquisses partagées ---
+# En mode 'shared', les primitives d'un même plan (et d'un même décalage) dessinent leurs profils dans une
+# seule esquisse, et les plans décalés des pyramides sont réutilisés : moins d'entrées de timeline et de résolutions
+_SHARED_SKETCH_LIMIT = 200   # profils par esquisse partagée : borne sa résolution et le test de recouvrement
+_PROFILE_TOLERANCE = 1e-6    # cm, pour retrouver un profil d'après sa boîte
+_shared_sketches = {}        # (plan, décalage) -> [esquisse, transformée inverse, ses 16 valeurs, boîtes des profils]
+_offset_planes = {}          # (plan, décalage) -> plan de construction décalé
+
+def _forget_shared_sketches():
+    """Oublie esquisses et plans partagés (annulation, changement de design)"""
+    _shared_sketches.clear()
+    _offset_planes.clear()
+
+def _sketch_plane(root, plane_str: str, offset: float = 0.0):
+    """Plan d'esquisse : plan d'origine, ou plan décalé selon sa normale (réutilisé en mode 'shared')"""
+    plane = get_construction_plane(root, plane_str)
+    if not offset:
+        return plane
+    key = ((plane_str or 'xy').lower(), offset)
+    cached = _offset_planes.get(key) if _creation_mode == 'shared' else None
+    if cached is not None and cached.isValid:
+        return cached
+    planes = root.constructionPlanes
+    plane_input = planes.createInput()
+    plane_input.setByOffset(plane, adsk.core.ValueInput.createByReal(offset))
+    cached = _offset_planes[key] = planes.add(plane_input)
+    return cached
+
+def _new_shared_sketch(root, key, previous=None):
+    """Nouvelle esquisse partagée ; une esquisse du même plan en fournit déjà la transformée"""
+    sketch = root.sketches.add(_sketch_plane(root, key[0], key[1]))
+    if previous is not None:
+        return [sketch, previous[1], previous[2], []]
+    if key[1]:
+        return [sketch, None, None, []]
+    transform = sketch.transform
+    transform.invert()
+    return [sketch, transform, transform.asArray(), []]
+
+def _sketch_area(values, corners):
+    """Boîte (umin, vmin, umax, vmax) de points modèle ramenés dans l'esquisse"""
+    us = [values[0] * x + values[1] * y + values[2] * z + values[3] for x, y, z in corners]
+    vs = [values[4] * x + values[5] * y + values[6] * z + values[7] for x, y, z in corners]
+    return (min(us), min(vs), max(us), max(vs))
+
+def _primitive_sketch(root, plane_str: str, corners=(), offset: float = 0.0):
+    """Esquisse où dessiner une primitive : (esquisse, transformée modèle -> esquisse ou None si décalée, boîte du profil).
+    corners : coins (x, y, z) du profil en coordonnées modèle. En mode 'shared', l'esquisse du plan est
+    réutilisée tant que ce profil ne touche aucun de ceux déjà dessinés ; la boîte sert alors à le retrouver"""
+    if _creation_mode != 'shared':
+        sketch = root.sketches.add(_sketch_plane(root, plane_str, offset))
+        if offset:
+            return sketch, None, None
+        transform = sketch.transform
+        transform.invert()
+        return sketch, transform, None
+    _indexed_bodies(root)  # vide les caches si le design actif a changé
+    key = ((plane_str or 'xy').lower(), offset)
+    entry = _shared_sketches.get(key)
+    if entry is None or not entry[0].isValid:
+        entry = _shared_sketches[key] = _new_shared_sketch(root, key)
+    area = None
+    if corners:
+        area = _sketch_area(entry[2], corners)
+        tol = _PROFILE_TOLERANCE
+        if len(entry[3]) >= _SHARED_SKETCH_LIMIT or any(
+                area[0] <= b[2] + tol and b[0] <= area[2] + tol and area[1] <= b[3] + tol and b[1] <= area[3] + tol
+                for b in entry[3]):
+            entry = _shared_sketches[key] = _new_shared_sketch(root, key, entry)
+        entry[3].append(area)
+    return entry[0], entry[1], area
+
+def _drawn_profile(sketch, area=None):
+    """Profil qui vient d'être dessiné : le seul de son esquisse, ou retrouvé d'après sa boîte dans une esquisse partagée"""
+    profiles = sketch.profiles
+    if area is None:
+        return profiles.item(0)
+    # L'ordre des profils n'est pas garanti, mais le nouveau est en général le dernier
+    tol = _PROFILE_TOLERANCE
+    for index in range(profiles.count - 1, -1, -1):
+        profile = profiles.item(index)
+        box = profile.boundingBox
+        lo, hi = box.minPoint, box.maxPoint
+        if (abs(lo.x - area[0]) <= tol and abs(lo.y - area[1]) <= tol
+                and abs(hi.x - area[2]) <= tol and abs(hi.y - area[3]) <= tol):
+            return profile
+    raise RuntimeError("Profil introuvable dans l'esquisse partagée")
+
 # --- Phase 1: Fonctions de création de base ---
 
+@command('create_cube', "Crée un cube dans Fusion 360",
+         _arg('size', 'length', 50, "Taille du cube en mm", required=True),
+         *_placement_args('du cube'))
 def create_cube(size: float, body_name: str = None, plane_str: str = 'xy', cx: float = 0, cy: float = 0, cz: float = 0):
     """Crée un cube avec les paramètres spécifiés"""
     try:
         root = _app.activeProduct.rootComponent
-        plane = get_construction_plane(root, plane_str)
-        sketch = root.sketches.add(plane)
-        
-        transform = sketch.transform
-        transform.invert()
+        if _creation_mode == 'direct':
+            new_body = _insert_temporary_body(root, _direct_box(root, plane_str, cx, cy, cz, size, size, size), body_name)
+            _status(f"Cube '{new_body.name}' créé (direct) avec une taille de {size*10}mm", body=new_body.name)
+            return
+        corners = ((cx - size / 2, cy - size / 2, cz), (cx + size / 2, cy + size / 2, cz))
+        sketch, transform, area = _primitive_sketch(root, plane_str, corners)
         
-        p1_model = adsk.core.Point3D.create(cx - size / 2, cy - size / 2, cz)
-        p2_model = adsk.core.Point3D.create(cx + size / 2, cy + size / 2, cz)
+        p1_model = adsk.core.Point3D.create(*corners[0])
+        p2_model = adsk.core.Point3D.create(*corners[1])
         
         p1_model.transformBy(transform)
         p2_model.transformBy(transform)
         
         sketch.sketchCurves.sketchLines.addTwoPointRectangle(p1_model, p2_model)
         
-        prof = sketch.profiles.item(0)
+        prof = _drawn_profile(sketch, area)
         extrudes = root.features.extrudeFeatures
         extInput = extrudes.createInput(prof, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
         distance = adsk.core.ValueInput.createByReal(size)
@@ -54,30 +1084,33 @@ def create_cube(size: float, body_name: str = None, plane_str: str = 'xy', cx: f
         extrude_feature = extrudes.add(extInput)
         new_body = extrude_feature.bodies.item(0)
         
-        if body_name:
-            new_body.name = body_name
+        _name_body(root, new_body, body_name)
         
-        if _ui: _ui.messageBox(f"Cube '{new_body.name}' créé avec une taille de {size*10}mm")
+        _status(f"Cube '{new_body.name}' créé avec une taille de {size*10}mm", body=new_body.name)
         
     except:
-        if _ui: _ui.messageBox(f"Échec de la création du cube:\n{traceback.format_exc()}")
+        _status(f"Échec de la création du cube:\n{traceback.format_exc()}", ok=False)
 
+@command('create_cylinder', "Crée un cylindre dans Fusion 360",
+         _arg('radius', 'length', 25, "Rayon en mm", required=True),
+         _arg('height', 'length', 50, "Hauteur en mm", required=True),
+         *_placement_args('du cylindre'))
 def create_cylinder(radius: float, height: float, body_name: str = None, plane_str: str = 'xy', cx: float = 0, cy: float = 0, cz: float = 0):
     """Crée un cylindre avec les paramètres spécifiés"""
     try:
         root = _app.activeProduct.rootComponent
-        plane = get_construction_plane(root, plane_str)
-        sketch = root.sketches.add(plane)
-        
-        transform = sketch.transform
-        transform.invert()
+        if _creation_mode == 'direct':
+            new_body = _insert_temporary_body(root, _direct_cylinder(root, plane_str, cx, cy, cz, radius, radius, height), body_name)
+            _status(f"Cylindre '{new_body.name}' créé (direct) (R:{radius*10}mm, H:{height*10}mm)", body=new_body.name)
+            return
+        sketch, transform, area = _primitive_sketch(root, plane_str, ((cx - radius, cy - radius, cz), (cx + radius, cy + radius, cz)))
         
         center_point_model = adsk.core.Point3D.create(cx, cy, cz)
         center_point_model.transformBy(transform)
         
         sketch.sketchCurves.sketchCircles.addByCenterRadius(center_point_model, radius)
         
-        prof = sketch.profiles.item(0)
+        prof = _drawn_profile(sketch, area)
         extrudes = root.features.extrudeFeatures
         extInput = extrudes.createInput(prof, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
         distance = adsk.core.ValueInput.createByReal(height)
@@ -86,33 +1119,38 @@ def create_cylinder(radius: float, height: float, body_name: str = None, plane_s
         
         new_body = extrude_feature.bodies.item(0)
         
-        if body_name:
-            new_body.name = body_name
+        _name_body(root, new_body, body_name)
         
-        if _ui: _ui.messageBox(f"Cylindre '{new_body.name}' créé (R:{radius*10}mm, H:{height*10}mm)")
+        _status(f"Cylindre '{new_body.name}' créé (R:{radius*10}mm, H:{height*10}mm)", body=new_body.name)
         
     except:
-        if _ui: _ui.messageBox(f"Échec de la création du cylindre:\n{traceback.format_exc()}")
+        _status(f"Échec de la création du cylindre:\n{traceback.format_exc()}", ok=False)
 
+@command('create_box', "Crée une boîte rectangulaire dans Fusion 360",
+         _arg('width', 'length', 50, "Largeur en mm", required=True),
+         _arg('depth', 'length', 50, "Profondeur en mm", required=True),
+         _arg('height', 'length', 50, "Hauteur en mm", required=True),
+         *_placement_args('de la boîte'))
 def create_box(width: float, depth: float, height: float, body_name: str = None, plane_str: str = 'xy', cx: float = 0, cy: float = 0, cz: float = 0):
     """Crée une boîte rectangulaire"""
     try:
         root = _app.activeProduct.rootComponent
-        plane = get_construction_plane(root, plane_str)
-        sketch = root.sketches.add(plane)
-        
-        transform = sketch.transform
-        transform.invert()
+        if _creation_mode == 'direct':
+            new_body = _insert_temporary_body(root, _direct_box(root, plane_str, cx, cy, cz, width, depth, height), body_name)
+            _status(f"Boîte '{new_body.name}' créée (direct): {width*10}×{depth*10}×{height*10}mm", body=new_body.name)
+            return
+        corners = ((cx - width / 2, cy - depth / 2, cz), (cx + width / 2, cy + depth / 2, cz))
+        sketch, transform, area = _primitive_sketch(root, plane_str, corners)
         
-        p1_model = adsk.core.Point3D.create(cx - width / 2, cy - depth / 2, cz)
-        p2_model = adsk.core.Point3D.create(cx + width / 2, cy + depth / 2, cz)
+        p1_model = adsk.core.Point3D.create(*corners[0])
+        p2_model = adsk.core.Point3D.create(*corners[1])
         
         p1_model.transformBy(transform)
         p2_model.transformBy(transform)
         
         sketch.sketchCurves.sketchLines.addTwoPointRectangle(p1_model, p2_model)
         
-        prof = sketch.profiles.item(0)
+        prof = _drawn_profile(sketch, area)
         extrudes = root.features.extrudeFeatures
         extInput = extrudes.createInput(prof, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
         distance = adsk.core.ValueInput.createByReal(height)
@@ -121,18 +1159,25 @@ def create_box(width: float, depth: float, height: float, body_name: str = None,
         extrude_feature = extrudes.add(extInput)
         new_body = extrude_feature.bodies.item(0)
         
-        if body_name:
-            new_body.name = body_name
+        _name_body(root, new_body, body_name)
         
-        if _ui: _ui.messageBox(f"Boîte '{new_body.name}' créée: {width*10}×{depth*10}×{height*10}mm")
+        _status(f"Boîte '{new_body.name}' créée: {width*10}×{depth*10}×{height*10}mm", body=new_body.name)
         
     except:
-        if _ui: _ui.messageBox(f"Échec de la création de la boîte:\n{traceback.format_exc()}")
+        _status(f"Échec de la création de la boîte:\n{traceback.format_exc()}", ok=False)
 
+@command('create_sphere', "Crée une sphère dans Fusion 360",
+         _arg('radius', 'length', 25, "Rayon en mm", required=True),
+         *_placement_args('de la sphère'))
 def create_sphere(radius: float, body_name: str = None, plane_str: str = 'xy', cx: float = 0, cy: float = 0, cz: float = 0):
     """Crée une sphère"""
     try:
         root = _app.activeProduct.rootComponent
+        if _creation_mode == 'direct':
+            temp_body = adsk.fusion.TemporaryBRepManager.get().createSphere(adsk.core.Point3D.create(cx, cy, cz), radius)
+            new_body = _insert_temporary_body(root, temp_body, body_name)
+            _status(f"Sphère '{new_body.name}' créée (direct): R{radius*10}mm", body=new_body.name)
+            return
         
         tempSketch = root.sketches.add(root.xZConstructionPlane)
         centerPt = adsk.core.Point3D.create(0, 0, 0)
@@ -156,29 +1201,29 @@ def create_sphere(radius: float, body_name: str = None, plane_str: str = 'xy', c
         
         tempSketch.isVisible = False
         
+        # Déplacement de positionnement : un déplacement suivant de la sphère s'y replie
         if cx != 0 or cy != 0 or cz != 0:
-            bodiesToMove = adsk.core.ObjectCollection.create()
-            bodiesToMove.add(new_body)
-            vector = adsk.core.Vector3D.create(cx, cy, cz)
-            transform = adsk.core.Matrix3D.create()
-            transform.translation = vector
-            
-            moveFeats = root.features.moveFeatures
-            moveInput = moveFeats.createInput(bodiesToMove, transform)
-            moveFeats.add(moveInput)
+            _apply_move(root, [new_body], _mat_translation(cx, cy, cz))
         
-        if body_name:
-            new_body.name = body_name
+        _name_body(root, new_body, body_name)
         
-        if _ui: _ui.messageBox(f"Sphère '{new_body.name}' créée: R{radius*10}mm")
+        _status(f"Sphère '{new_body.name}' créée: R{radius*10}mm", body=new_body.name)
         
     except:
-        if _ui: _ui.messageBox(f"Échec de la création de la sphère:\n{traceback.format_exc()}")
+        _status(f"Échec de la création de la sphère:\n{traceback.format_exc()}", ok=False)
 
+@command('create_cone', "Crée un cône dans Fusion 360",
+         _arg('radius', 'length', 25, "Rayon de base en mm", required=True),
+         _arg('height', 'length', 50, "Hauteur en mm", required=True),
+         *_placement_args('du cône'))
 def create_cone(radius: float, height: float, body_name: str = None, plane_str: str = 'xy', cx: float = 0, cy: float = 0, cz: float = 0):
     """Crée un cône"""
     try:
         root = _app.activeProduct.rootComponent
+        if _creation_mode == 'direct':
+            new_body = _insert_temporary_body(root, _direct_cylinder(root, plane_str, cx, cy, cz, radius, 0, height), body_name)
+            _status(f"Cône '{new_body.name}' créé (direct) (R:{radius*10}mm, H:{height*10}mm)", body=new_body.name)
+            return
         plane = get_construction_plane(root, plane_str)
         sketch = root.sketches.add(plane)
         
@@ -207,37 +1252,33 @@ def create_cone(radius: float, height: float, body_name: str = None, plane_str:
         revolve_feature = revolves.add(revolve_input)
         new_body = revolve_feature.bodies.item(0)
 
-        if body_name:
-            new_body.name = body_name
+        _name_body(root, new_body, body_name)
 
-        if _ui: _ui.messageBox(f"Cône '{new_body.name}' créé (R:{radius*10}mm, H:{height*10}mm)")
+        _status(f"Cône '{new_body.name}' créé (R:{radius*10}mm, H:{height*10}mm)", body=new_body.name)
     except:
-        if _ui: _ui.messageBox(f"Échec de la création du cône:\n{traceback.format_exc()}")
+        _status(f"Échec de la création du cône:\n{traceback.format_exc()}", ok=False)
 
+@command('create_sq_pyramid', "Crée une pyramide carrée dans Fusion 360",
+         _arg('side', 'length', 50, "Côté de la base en mm", required=True),
+         _arg('height', 'length', 50, "Hauteur en mm", required=True),
+         *_placement_args('de la pyramide'))
 def create_sq_pyramid(side_length: float, height: float, body_name: str = None, plane_str: str = 'xy', cx: float = 0, cy: float = 0, cz: float = 0):
     """Crée une pyramide carrée"""
     try:
         root = _app.activeProduct.rootComponent
-        plane = get_construction_plane(root, plane_str)
-        
-        sketch_base = root.sketches.add(plane)
         s = side_length
+        corners = ((cx - s/2, cy - s/2, cz), (cx + s/2, cy + s/2, cz))
+        sketch_base, transform, area = _primitive_sketch(root, plane_str, corners)
         
-        transform = sketch_base.transform
-        transform.invert()
-        
-        p1_base_model = adsk.core.Point3D.create(cx - s/2, cy - s/2, cz)
-        p2_base_model = adsk.core.Point3D.create(cx + s/2, cy + s/2, cz)
+        p1_base_model = adsk.core.Point3D.create(*corners[0])
+        p2_base_model = adsk.core.Point3D.create(*corners[1])
         p1_base_model.transformBy(transform)
         p2_base_model.transformBy(transform)
         sketch_base.sketchCurves.sketchLines.addTwoPointRectangle(p1_base_model, p2_base_model)
-        prof_base = sketch_base.profiles.item(0)
+        prof_base = _drawn_profile(sketch_base, area)
 
-        planes = root.constructionPlanes
-        plane_input = planes.createInput()
-        plane_input.setByOffset(plane, adsk.core.ValueInput.createByReal(height))
-        plane_top = planes.add(plane_input)
-        sketch_top = root.sketches.add(plane_top)
+        # Sommet dans une esquisse du plan décalé de la hauteur (plan et esquisse partagés en mode 'shared')
+        sketch_top = _primitive_sketch(root, plane_str, offset=height)[0]
 
         top_point_model = adsk.core.Point3D.create(cx, cy, cz)
         top_point_model.transformBy(transform)
@@ -251,30 +1292,29 @@ def create_sq_pyramid(side_length: float, height: float, body_name: str = None,
         loft_feature = lofts.add(loft_input)
         new_body = loft_feature.bodies.item(0)
 
-        if body_name:
-            new_body.name = body_name
+        _name_body(root, new_body, body_name)
 
-        if _ui: _ui.messageBox(f"Pyramide carrée '{new_body.name}' créée (base:{s*10}mm, hauteur:{height*10}mm)")
+        _status(f"Pyramide carrée '{new_body.name}' créée (base:{s*10}mm, hauteur:{height*10}mm)", body=new_body.name)
     except:
-        if _ui: _ui.messageBox(f"Échec de la création de la pyramide carrée:\n{traceback.format_exc()}")
+        _status(f"Échec de la création de la pyramide carrée:\n{traceback.format_exc()}", ok=False)
 
+@command('create_tri_pyramid', "Crée une pyramide triangulaire dans Fusion 360",
+         _arg('side', 'length', 50, "Côté de la base en mm", required=True),
+         _arg('height', 'length', 50, "Hauteur en mm", required=True),
+         *_placement_args('de la pyramide'))
 def create_tri_pyramid(side_length: float, height: float, body_name: str = None, plane_str: str = 'xy', cx: float = 0, cy: float = 0, cz: float = 0):
     """Crée une pyramide triangulaire"""
     try:
         root = _app.activeProduct.rootComponent
-        plane = get_construction_plane(root, plane_str)
-        
-        sketch_base = root.sketches.add(plane)
-        
-        transform = sketch_base.transform
-        transform.invert()
-        
         s = side_length
         h_tri = s * math.sqrt(3) / 2
+        corners = ((cx - s/2, cy - h_tri/3, cz), (cx + s/2, cy - h_tri/3, cz), (cx, cy + h_tri*2/3, cz))
         
-        p1_model = adsk.core.Point3D.create(cx - s/2, cy - h_tri/3, cz)
-        p2_model = adsk.core.Point3D.create(cx + s/2, cy - h_tri/3, cz)
-        p3_model = adsk.core.Point3D.create(cx, cy + h_tri*2/3, cz)
+        sketch_base, transform, area = _primitive_sketch(root, plane_str, corners)
+        
+        p1_model = adsk.core.Point3D.create(*corners[0])
+        p2_model = adsk.core.Point3D.create(*corners[1])
+        p3_model = adsk.core.Point3D.create(*corners[2])
         
         p1_model.transformBy(transform)
         p2_model.transformBy(transform)
@@ -284,13 +1324,9 @@ def create_tri_pyramid(side_length: float, height: float, body_name: str = None,
         lines.addByTwoPoints(p1_model, p2_model)
         lines.addByTwoPoints(p2_model, p3_model)
         lines.addByTwoPoints(p3_model, p1_model)
-        prof_base = sketch_base.profiles.item(0)
+        prof_base = _drawn_profile(sketch_base, area)
 
-        planes = root.constructionPlanes
-        plane_input = planes.createInput()
-        plane_input.setByOffset(plane, adsk.core.ValueInput.createByReal(height))
-        plane_top = planes.add(plane_input)
-        sketch_top = root.sketches.add(plane_top)
+        sketch_top = _primitive_sketch(root, plane_str, offset=height)[0]
         
         top_point_model = adsk.core.Point3D.create(cx, cy, cz)
         top_point_model.transformBy(transform)
@@ -304,59 +1340,259 @@ def create_tri_pyramid(side_length: float, height: float, body_name: str = None,
         loft_feature = lofts.add(loft_input)
         new_body = loft_feature.bodies.item(0)
 
-        if body_name:
-            new_body.name = body_name
+        _name_body(root, new_body, body_name)
 
-        if _ui: _ui.messageBox(f"Pyramide triangulaire '{new_body.name}' créée (base:{s*10}mm, hauteur:{height*10}mm)")
+        _status(f"Pyramide triangulaire '{new_body.name}' créée (base:{s*10}mm, hauteur:{height*10}mm)", body=new_body.name)
     except:
-        if _ui: _ui.messageBox(f"Échec de la création de la pyramide triangulaire:\n{traceback.format_exc()}")
+        _status(f"Échec de la création de la pyramide triangulaire:\n{traceback.format_exc()}", ok=False)
+
+# Forme -> (dimensions par instance en mm, valeurs par défaut) pour place_primitives
+_PRIMITIVE_DIMENSIONS = {
+    'cube': (('size',), (50,)),
+    'box': (('width', 'depth', 'height'), (50, 50, 50)),
+    'cylinder': (('radius', 'height'), (25, 50)),
+    'cone': (('radius', 'height'), (25, 50)),
+    'sphere': (('radius',), (25,)),
+}
+_PACKED_NUMBERS_SCHEMA = {
+    'type': 'array',
+    'items': {'oneOf': [{'type': 'number'}, {'type': 'array', 'items': {'type': 'number'}}]},
+}
+
+def _unpack_mm(values, stride: int, label: str):
+    """Liste à plat, liste de n-uplets ou texte « a,b,c;d,e,f » (mm) -> array de cm, en une passe"""
+    if isinstance(values, str):
+        values = [v for v in values.replace(';', ',').replace('\n', ',').split(',') if v.strip()]
+    if values and isinstance(values[0], (list, tuple)):
+        if any(len(row) != stride for row in values):
+            raise ValueError(f"{label}: chaque élément doit compter {stride} valeur(s)")
+        values = itertools.chain.from_iterable(values)
+    # Conversion mm -> cm de tout le paquet d'un coup (map au niveau C) plutôt qu'élément par élément
+    packed = array.array('d', map((10.0).__rtruediv__, map(float, values)))
+    if len(packed) % stride:
+        raise ValueError(f"{label}: {len(packed)} valeur(s), multiple de {stride} attendu")
+    return packed
+
+def _packed_count(values) -> int:
+    """Nombre de valeurs d'un argument empaqueté, sans les convertir"""
+    if isinstance(values, str):
+        return sum(1 for v in values.replace(';', ',').replace('\n', ',').split(',') if v.strip())
+    if isinstance(values, (list, tuple)):
+        return sum(len(v) if isinstance(v, (list, tuple)) else 1 for v in values)
+    return 1
+
+@command('place_primitives', "Crée en une seule passe des primitives à une liste de positions (et dimensions) : tous les corps dans une seule base feature",
+         _arg('shape', 'string', 'box', "Forme: cube, box, cylinder, cone, sphere", required=True, choices=tuple(_PRIMITIVE_DIMENSIONS)),
+         _arg('positions', 'packed', None, "Positions x,y,z en mm: liste à plat [x0,y0,z0,x1,...], liste de triplets ou texte 'x,y,z;x,y,z'",
+              required=True, schema=_PACKED_NUMBERS_SCHEMA),
+         _arg('sizes', 'packed', None, "Dimensions par instance en mm, même format : size (cube), width,depth,height (box), radius,height (cylinder, cone), radius (sphere) (optionnel)",
+              schema=_PACKED_NUMBERS_SCHEMA),
+         _arg('dimensions', 'packed', None, "Dimensions communes en mm si sizes est absent : un seul jeu, dans le même ordre (optionnel)",
+              schema={'type': 'array', 'items': {'type': 'number'}}),
+         _arg('prefix', 'string', None, "Préfixe des noms: <prefix>_1, <prefix>_2, ... (optionnel)"),
+         _arg('plane', 'string', 'xy', "Plan de construction: xy, yz, xz (optionnel)", choices=_PLANE_CHOICES))
+def place_primitives(shape: str, positions, sizes=None, dimensions=None, prefix: str = None, plane_str: str = 'xy'):
+    """Place des primitives en masse par le TemporaryBRepManager, dans une seule base feature"""
+    try:
+        dimension_names, dimension_defaults = _PRIMITIVE_DIMENSIONS[shape]
+        stride = len(dimension_names)
+        try:
+            points = _unpack_mm(positions, 3, 'positions')
+            if sizes is not None:
+                dims = _unpack_mm(sizes, stride, 'sizes')
+            else:
+                dims = _unpack_mm(dimensions if dimensions is not None else dimension_defaults, stride, 'dimensions')
+        except (ValueError, TypeError) as e:
+            _status(f"Données invalides pour place_primitives: {e}", ok=False)
+            return
+        count = len(points) // 3
+        if count == 0:
+            _status("Aucune position fournie.", ok=False)
+            return
+        if sizes is not None and len(dims) != count * stride:
+            _status(f"sizes décrit {len(dims) // stride} instance(s) pour {count} position(s).", ok=False)
+            return
+        if sizes is None and len(dims) != stride:
+            _status(f"dimensions attend {stride} valeur(s) pour {shape}, reçu {len(dims)} ; "
+                    "dimensions par instance : utiliser sizes.", ok=False)
+            return
+        dims_stride = stride if sizes is not None else 0
+        if any(d <= 0 for d in dims):
+            _status("Les dimensions doivent être strictement positives.", ok=False)
+            return
+
+        root = _app.activeProduct.rootComponent
+        # Géométrie du plan lue une fois : les vecteurs sont réutilisés par toutes les instances
+        geometry = get_construction_plane(root, plane_str).geometry
+        u_dir, v_dir, normal = geometry.uDirection, geometry.vDirection, geometry.normal
+        nx, ny, nz = normal.x, normal.y, normal.z
+        tbm = adsk.fusion.TemporaryBRepManager.get()
+        Point3D = adsk.core.Point3D
+        bodies = root.bRepBodies
+        base_feature = _temporary_body_container(root)
+        names = [f"{prefix}_{i}" for i in range(1, count + 1)] if prefix else None
+
+        created = []
+        failed = []
+        for i in range(count):
+            x, y, z = points[3 * i], points[3 * i + 1], points[3 * i + 2]
+            d = dims[dims_stride * i:dims_stride * i + stride]
+            try:
+                if shape in ('cube', 'box'):
+                    width, depth, height = (d[0], d[0], d[0]) if shape == 'cube' else d
+                    half = height / 2
+                    center = Point3D.create(x + nx * half, y + ny * half, z + nz * half)
+                    temp_body = tbm.createBox(adsk.core.OrientedBoundingBox3D.create(center, u_dir, v_dir, width, depth, height))
+                elif shape == 'sphere':
+                    temp_body = tbm.createSphere(Point3D.create(x, y, z), d[0])
+                else:
+                    radius, height = d
+                    top = Point3D.create(x + nx * height, y + ny * height, z + nz * height)
+                    temp_body = tbm.createCylinderOrCone(Point3D.create(x, y, z), radius, top, radius if shape == 'cylinder' else 0)
+                new_body = bodies.add(temp_body) if base_feature is None else bodies.add(temp_body, base_feature)
+                if names:
+                    new_body.name = names[i]
+                created.append((i, new_body))
+            except:
+                failed.append(i)
+
+        # Index mis à jour en bloc ; les corps sans préfixe seront indexés à la première recherche
+        if names:
+            _indexed_bodies(root).update((new_body.name, new_body) for _, new_body in created)
+        for _, new_body in created:
+            _spatial_mark(body=new_body)
+
+        message = f"{len(created)}/{count} {shape}(s) placé(s) en une seule passe"
+        if failed:
+            message += f" ; échec aux index {failed[:20]}{'...' if len(failed) > 20 else ''}"
+        _status(message, ok=not failed, count=len(created), failed=failed)
+    except:
+        _status(f"Échec du placement des primitives:\n{traceback.format_exc()}", ok=False)
 
 # --- Phase 2: Fonctions de manipulation ---
 
+# --- Regroupement des déplacements ---
+# Déplacements et rotations consécutifs des mêmes corps repliés dans une seule feature de déplacement :
+# toujours dans un lot ; entre deux requêtes distinctes seulement sur demande (fenêtre > 0), car chacune
+# ne pourrait plus être annulée ou modifiée séparément
+_coalesce_window_ms = float(os.environ.get('FUSION_MCP_COALESCE_MS', '0'))
+_last_move = None  # {'feature', 'bodies', 'matrix', 'at'} du dernier déplacement encore repliable
+
+_MOVE_COMMANDS = frozenset(('move_selection', 'rotate_selection'))
+# Commandes sans effet sur le modèle : elles laissent le dernier déplacement repliable
+_MOVE_NEUTRAL_COMMANDS = frozenset((
+    'select_body', 'select_bodies', 'select_in_region', 'select_nearest', 'find_overlaps', 'select_edges',
+    'get_scene', 'export_mesh', 'begin_bulk', 'end_bulk', 'set_output_mode', 'get_log', 'get_metrics',
+    'profile_command', 'start_recording', 'stop_recording', 'set_move_coalescing', 'checkpoint', 'cancel',
+    'set_tick_budget'))
+
+def _mat_translation(x: float, y: float, z: float):
+    """Matrice 4x4 (16 valeurs, ligne par ligne) d'une translation"""
+    return [1.0, 0.0, 0.0, x, 0.0, 1.0, 0.0, y, 0.0, 0.0, 1.0, z, 0.0, 0.0, 0.0, 1.0]
+
+def _mat_rotation(axis, angle: float, center):
+    """Matrice 4x4 d'une rotation autour d'un axe unitaire passant par un centre"""
+    x, y, z = axis
+    c, s = math.cos(angle), math.sin(angle)
+    t = 1 - c
+    r = ((t * x * x + c, t * x * y - s * z, t * x * z + s * y),
+         (t * x * y + s * z, t * y * y + c, t * y * z - s * x),
+         (t * x * z - s * y, t * y * z + s * x, t * z * z + c))
+    values = []
+    for row in r:
+        values.extend(row)
+        values.append(center[len(values) // 4] - sum(a * b for a, b in zip(row, center)))
+    return values + [0.0, 0.0, 0.0, 1.0]
+
+def _mat_compose(after, before):
+    """Produit after·before : before appliquée d'abord, puis after"""
+    return [sum(after[i * 4 + k] * before[k * 4 + j] for k in range(4)) for i in range(4) for j in range(4)]
+
+def _matrix3d(values):
+    """Matrix3D Fusion construite depuis 16 valeurs"""
+    matrix = adsk.core.Matrix3D.create()
+    matrix.setWithArray(values)
+    return matrix
+
+def _apply_move(root, bodies, matrix):
+    """Applique une transformation aux corps, repliée dans le déplacement précédent si possible ; retourne True si repliée"""
+    global _last_move
+    last, now = _last_move, time.perf_counter()
+    if (last is not None and len(last['bodies']) == len(bodies)
+            and all(a == b for a, b in zip(last['bodies'], bodies))
+            and (_batch_depth > 0 or (now - last['at']) * 1000 <= _coalesce_window_ms)):
+        composed = _mat_compose(matrix, last['matrix'])
+        try:
+            if last['feature'].isValid and last['feature'].defineAsFreeMove(_matrix3d(composed)):
+                last.update(matrix=composed, at=now)
+                return True
+        except:
+            pass  # redéfinition refusée (design direct, version ancienne) : nouvelle feature
+    collection = adsk.core.ObjectCollection.create()
+    for body in bodies:
+        collection.add(body)
+    move_features = root.features.moveFeatures
+    feature = move_features.add(move_features.createInput(collection, _matrix3d(matrix)))
+    _last_move = {'feature': feature, 'bodies': list(bodies), 'matrix': matrix, 'at': now} if feature else None
+    return False
+
+@command('set_move_coalescing', "Règle la fenêtre de regroupement des déplacements et rotations successifs en une seule feature",
+         _arg('window_ms', 'number', None, "Fenêtre en millisecondes entre deux requêtes (0, par défaut : regroupement dans les lots seulement)", required=True))
+def set_move_coalescing(window_ms: float):
+    """Règle la fenêtre de regroupement des déplacements"""
+    global _coalesce_window_ms
+    if window_ms < 0:
+        _status("La fenêtre de regroupement doit être positive ou nulle.", ok=False)
+        return
+    _coalesce_window_ms = window_ms
+    _status(f"Fenêtre de regroupement des déplacements: {window_ms:g} ms", window_ms=window_ms)
+
+@command('move_selection', "Déplace les objets sélectionnés",
+         _arg('x', 'length', 0, "Distance X en mm", required=True),
+         _arg('y', 'length', 0, "Distance Y en mm", required=True),
+         _arg('z', 'length', 0, "Distance Z en mm", required=True))
 def move_selection(x_dist: float, y_dist: float, z_dist: float):
     """Déplace les objets sélectionnés"""
     try:
         selections = _ui.activeSelections
         if selections.count == 0:
-            _ui.messageBox("Aucun objet sélectionné pour déplacement.")
+            _status("Aucun objet sélectionné pour déplacement.", ok=False)
             return
 
-        bodies_to_move = adsk.core.ObjectCollection.create()
+        bodies_to_move = []
         for selection in selections:
             if selection.entity.objectType == adsk.fusion.BRepBody.classType():
-                bodies_to_move.add(selection.entity)
+                bodies_to_move.append(selection.entity)
         
-        if bodies_to_move.count == 0:
-            _ui.messageBox("Aucun corps sélectionné pour déplacement.")
+        if not bodies_to_move:
+            _status("Aucun corps sélectionné pour déplacement.", ok=False)
             return
 
-        vector = adsk.core.Vector3D.create(x_dist, y_dist, z_dist)
-        transform = adsk.core.Matrix3D.create()
-        transform.translation = vector
-
         root = _app.activeProduct.rootComponent
-        move_features = root.features.moveFeatures
-        
-        move_input = move_features.createInput(bodies_to_move, transform)
-        move_features.add(move_input)
+        coalesced = _apply_move(root, bodies_to_move, _mat_translation(x_dist, y_dist, z_dist))
+        for body in bodies_to_move:
+            _spatial_mark(body=body)
 
-        if _ui: _ui.messageBox(f"{bodies_to_move.count} objet(s) déplacé(s) de ({x_dist*10}, {y_dist*10}, {z_dist*10}) mm")
+        note = " (regroupé avec le déplacement précédent)" if coalesced else ""
+        _status(f"{len(bodies_to_move)} objet(s) déplacé(s) de ({x_dist*10}, {y_dist*10}, {z_dist*10}) mm{note}", coalesced=coalesced)
 
     except:
-        if _ui: _ui.messageBox(f"Échec du déplacement:\n{traceback.format_exc()}")
+        _status(f"Échec du déplacement:\n{traceback.format_exc()}", ok=False)
 
+@command('combine_selection', "Combine deux objets sélectionnés",
+         _arg('operation', 'string', 'join', "Opération: join, cut, intersect", required=True, choices=_OPERATION_CHOICES))
 def combine_selection(operation: str):
     """Combine deux objets sélectionnés"""
     try:
         selections = _ui.activeSelections
         if selections.count != 2:
-            _ui.messageBox("Sélectionnez exactement 2 objets pour la combinaison.")
+            _status("Sélectionnez exactement 2 objets pour la combinaison.", ok=False)
             return
 
         body1 = selections.item(0).entity
         body2 = selections.item(1).entity
         if not (body1.objectType == adsk.fusion.BRepBody.classType() and body2.objectType == adsk.fusion.BRepBody.classType()):
-            _ui.messageBox("Les deux éléments sélectionnés doivent être des corps.")
+            _status("Les deux éléments sélectionnés doivent être des corps.", ok=False)
             return
 
         target_body = body1
@@ -377,35 +1613,37 @@ def combine_selection(operation: str):
         
         op_str = operation.lower()
         if op_str not in op_map:
-            _ui.messageBox(f"Opération invalide: '{operation}'. Utilisez: join, cut, ou intersect")
+            _status(f"Opération invalide: '{operation}'. Utilisez: join, cut, ou intersect", ok=False)
             return
             
         combine_input.operation = op_map[op_str]
         
+        target_name, tool_name = target_body.name, tool_body.name
         combine_features.add(combine_input)
-        if _ui: _ui.messageBox(f"Combinaison '{op_str}' effectuée entre '{target_body.name}' et '{tool_body.name}'")
+        _unindex_body(root, tool_name)
+        _spatial_mark(target_name)
+        _status(f"Combinaison '{op_str}' effectuée entre '{target_name}' et '{tool_name}'")
 
     except:
-        if _ui: _ui.messageBox(f"Échec de la combinaison:\n{traceback.format_exc()}")
+        _status(f"Échec de la combinaison:\n{traceback.format_exc()}", ok=False)
 
+@command('combine_by_name', "Combine deux objets par leur nom",
+         _arg('target', 'name', None, "Nom de l'objet cible", required=True),
+         _arg('tool', 'name', None, "Nom de l'objet outil", required=True),
+         _arg('operation', 'string', 'join', "Opération: join, cut, intersect", required=True, choices=_OPERATION_CHOICES))
 def combine_by_name(target_body_name: str, tool_body_name: str, operation: str):
     """Combine deux objets par leur nom"""
     try:
         root = _app.activeProduct.rootComponent
         
-        target_body = None
-        tool_body = None
-        for body in root.bRepBodies:
-            if body.name == target_body_name:
-                target_body = body
-            elif body.name == tool_body_name:
-                tool_body = body
+        target_body = _find_body(root, target_body_name)
+        tool_body = _find_body(root, tool_body_name)
         
         if not target_body:
-            _ui.messageBox(f"Objet cible '{target_body_name}' introuvable.")
+            _status(f"Objet cible '{target_body_name}' introuvable.", ok=False)
             return
         if not tool_body:
-            _ui.messageBox(f"Objet outil '{tool_body_name}' introuvable.")
+            _status(f"Objet outil '{tool_body_name}' introuvable.", ok=False)
             return
 
         tool_bodies_collection = adsk.core.ObjectCollection.create()
@@ -422,160 +1660,438 @@ def combine_by_name(target_body_name: str, tool_body_name: str, operation: str):
         
         op_str = operation.lower()
         if op_str not in op_map:
-            _ui.messageBox(f"Opération invalide: '{op_str}'. Utilisez: join, cut, ou intersect")
+            _status(f"Opération invalide: '{op_str}'. Utilisez: join, cut, ou intersect", ok=False)
             return
             
         combine_input.operation = op_map[op_str]
         
         combine_features.add(combine_input)
-        if _ui: _ui.messageBox(f"Combinaison '{op_str}' effectuée: '{target_body_name}' avec '{tool_body_name}'")
+        _unindex_body(root, tool_body_name)
+        _spatial_mark(target_body_name)
+        _status(f"Combinaison '{op_str}' effectuée: '{target_body_name}' avec '{tool_body_name}'")
 
     except:
-        if _ui: _ui.messageBox(f"Échec de la combinaison par nom:\n{traceback.format_exc()}")
+        _status(f"Échec de la combinaison par nom:\n{traceback.format_exc()}", ok=False)
+
+_COMBINE_STRATEGIES = ('auto', 'single', 'balanced')
+
+def _combine_step(root, target, tools, operation: str, level: int, steps: list):
+    """Une fonction de combinaison entre des couples (nom, corps) ; la durée et les noms consommés sont ajoutés à steps"""
+    tool_names = [name for name, _ in tools]
+    step = {'level': level, 'target': target[0], 'tools': len(tools)}
+    collection = adsk.core.ObjectCollection.create()
+    for _, tool in tools:
+        collection.add(tool)
+    combine_features = root.features.combineFeatures
+    combine_input = combine_features.createInput(target[1], collection)
+    combine_input.operation = {
+        'join': adsk.fusion.FeatureOperations.JoinFeatureOperation,
+        'cut': adsk.fusion.FeatureOperations.CutFeatureOperation,
+        'intersect': adsk.fusion.FeatureOperations.IntersectFeatureOperation,
+    }[operation]
+    t0 = time.perf_counter()
+    try:
+        combine_features.add(combine_input)
+    finally:
+        step['ms'] = round((time.perf_counter() - t0) * 1000, 3)
+        steps.append(step)
+    for name in tool_names:
+        _unindex_body(root, name)
+    _spatial_mark(target[0])
+    step['consumed'] = tool_names
+
+def _reduce_balanced(root, bodies: list, operation: str, steps: list):
+    """Réduit les couples (nom, corps) deux à deux, niveau par niveau : chaque corps est combiné O(log n) fois au lieu de n.
+    Le premier corps reste toujours à gauche et reçoit le résultat final"""
+    level = 0
+    while len(bodies) > 1:
+        level += 1
+        survivors = []
+        for i in range(0, len(bodies) - 1, 2):
+            _combine_step(root, bodies[i], [bodies[i + 1]], operation, level, steps)
+            survivors.append(bodies[i])
+        if len(bodies) % 2:
+            survivors.append(bodies[-1])
+        bodies = survivors
+    return bodies[0]
+
+@command('combine_many', "Combine un objet cible avec une liste d'objets outils ou tous ceux dont le nom correspond à un motif, en une seule fonction ou par réduction équilibrée",
+         _arg('target', 'name', None, "Nom de l'objet cible", required=True),
+         _arg('tools', 'names', None, "Noms des objets outils: liste ou texte 'A,B,C' (optionnel si pattern)",
+              schema={'type': 'array', 'items': {'type': 'string'}}),
+         _arg('operation', 'string', 'join', "Opération: join, cut, intersect (optionnel)", choices=_OPERATION_CHOICES),
+         _arg('pattern', 'string', None, "Motif des noms d'outils, ex. 'Vis_*' (optionnel)"),
+         _arg('strategy', 'string', 'auto', "auto (une seule fonction, réduction équilibrée en cas d'échec), single, balanced (optionnel)",
+              choices=_COMBINE_STRATEGIES))
+def combine_many(target_body_name: str, tool_names=None, operation: str = 'join', pattern: str = None, strategy: str = 'auto'):
+    """Combinaison N-aire : évite les N-1 combinaisons successives contre une cible toujours plus lourde"""
+    steps = []
+    try:
+        root = _app.activeProduct.rootComponent
+        target = _find_body(root, target_body_name)
+        if not target:
+            _status(f"Objet cible '{target_body_name}' introuvable.", ok=False)
+            return
 
+        # Couples (nom, corps) : les noms ne sont plus relus dans Fusion une fois les outils résolus
+        tools = {name: _find_body(root, name) for name in tool_names or [] if name != target_body_name}
+        missing = [name for name, tool in tools.items() if not tool]
+        if pattern:
+            for body in root.bRepBodies:
+                name = body.name
+                if name not in tools and name != target_body_name and fnmatch.fnmatchcase(name, pattern):
+                    tools[name] = body
+        tools = list(tools.items())
+        if missing:
+            _status(f"Objet(s) outil(s) introuvable(s): {', '.join(missing[:20])}", ok=False, missing=missing)
+            return
+        if not tools:
+            _status("Aucun objet outil à combiner (tools ou pattern).", ok=False)
+            return
+
+        started = time.perf_counter()
+        used = strategy
+        if strategy in ('auto', 'single'):
+            try:
+                _combine_step(root, (target_body_name, target), tools, operation, 0, steps)
+                used = 'single'
+            except:
+                if strategy == 'single':
+                    raise
+                # Fusion peut refuser une grande collection d'outils : repli sur la réduction équilibrée
+                used = 'balanced'
+                steps[-1]['error'] = traceback.format_exc(limit=1).strip().splitlines()[-1]
+        if used == 'balanced':
+            if operation == 'cut':
+                # Union équilibrée des outils, puis une seule soustraction
+                tool = _reduce_balanced(root, tools, 'join', steps)
+                _combine_step(root, (target_body_name, target), [tool], 'cut', steps[-1]['level'] + 1 if steps else 1, steps)
+            else:
+                _reduce_balanced(root, [(target_body_name, target)] + tools, operation, steps)
+
+        total_ms = round((time.perf_counter() - started) * 1000, 3)
+        levels = {}
+        for step in steps:
+            if 'error' in step:
+                continue
+            summary = levels.setdefault(step['level'], {'level': step['level'], 'steps': 0, 'ms': 0.0})
+            summary['steps'] += 1
+            summary['ms'] = round(summary['ms'] + step['ms'], 3)
+        _status(f"{len(tools)} objet(s) combiné(s) ({operation}) avec '{target_body_name}' en {len(levels)} niveau(x), "
+                f"{sum(l['steps'] for l in levels.values())} fonction(s), {total_ms} ms ({used})",
+                tools=len(tools), strategy=used, total_ms=total_ms, levels=list(levels.values()),
+                steps=[{k: v for k, v in step.items() if k != 'consumed'} for step in steps])
+    except:
+        done = sum(len(step.get('consumed', ())) for step in steps)
+        _status(f"Échec de la combinaison multiple après {done} outil(s) consommé(s):\n{traceback.format_exc()}", ok=False,
+                steps=[{k: v for k, v in step.items() if k != 'consumed'} for step in steps])
+
+@command('rotate_selection', "Fait tourner l'objet sélectionné",
+         _arg('axis', 'string', 'z', "Axe de rotation: x, y, z", required=True, choices=('x', 'y', 'z')),
+         _arg('angle', 'angle', 90, "Angle en degrés", required=True),
+         _arg('cx', 'length', 0, "Centre X en mm", required=True),
+         _arg('cy', 'length', 0, "Centre Y en mm", required=True),
+         _arg('cz', 'length', 0, "Centre Z en mm", required=True))
 def rotate_selection(axis_str: str, angle_degrees: float, cx: float, cy: float, cz: float):
     """Fait tourner l'objet sélectionné"""
     try:
         selections = _ui.activeSelections
         if selections.count != 1:
-            _ui.messageBox("Sélectionnez exactement 1 objet pour la rotation.")
+            _status("Sélectionnez exactement 1 objet pour la rotation.", ok=False)
             return
         
         target_body = selections.item(0).entity
         if target_body.objectType != adsk.fusion.BRepBody.classType():
-            _ui.messageBox("L'élément sélectionné doit être un corps.")
+            _status("L'élément sélectionné doit être un corps.", ok=False)
             return
         
-        bodies_to_move = adsk.core.ObjectCollection.create()
-        bodies_to_move.add(target_body)
-        
         axis_str = axis_str.lower()
         if axis_str == 'x':
-            axis_vector = adsk.core.Vector3D.create(1, 0, 0)
+            axis_vector = (1.0, 0.0, 0.0)
         elif axis_str == 'y':
-            axis_vector = adsk.core.Vector3D.create(0, 1, 0)
+            axis_vector = (0.0, 1.0, 0.0)
         elif axis_str == 'z':
-            axis_vector = adsk.core.Vector3D.create(0, 0, 1)
+            axis_vector = (0.0, 0.0, 1.0)
         else:
-            _ui.messageBox(f"Axe invalide: '{axis_str}'. Utilisez: x, y, ou z")
+            _status(f"Axe invalide: '{axis_str}'. Utilisez: x, y, ou z", ok=False)
             return
         
-        center_point = adsk.core.Point3D.create(cx, cy, cz)
-        
         angle_rad = math.radians(angle_degrees)
         
-        transform = adsk.core.Matrix3D.create()
-        transform.setToRotation(angle_rad, axis_vector, center_point)
-        
         root = _app.activeProduct.rootComponent
-        move_features = root.features.moveFeatures
-        move_input = move_features.createInput(bodies_to_move, transform)
-        move_features.add(move_input)
+        coalesced = _apply_move(root, [target_body], _mat_rotation(axis_vector, angle_rad, (cx, cy, cz)))
+        _spatial_mark(body=target_body)
         
-        if _ui: _ui.messageBox(f"Objet '{target_body.name}' tourné de {angle_degrees}° autour de l'axe {axis_str.upper()}")
+        note = " (regroupé avec le déplacement précédent)" if coalesced else ""
+        _status(f"Objet '{target_body.name}' tourné de {angle_degrees}° autour de l'axe {axis_str.upper()}{note}", coalesced=coalesced)
         
     except:
-        if _ui: _ui.messageBox(f"Échec de la rotation:\n{traceback.format_exc()}")
+        _status(f"Échec de la rotation:\n{traceback.format_exc()}", ok=False)
 
 # --- Phase 3: Fonctions de sélection ---
 
+@command('select_body', "Sélectionne un objet par son nom",
+         _arg('name', 'name', None, "Nom de l'objet à sélectionner", required=True))
 def select_body(body_name: str):
     """Sélectionne un objet par son nom"""
     try:
         root = _app.activeProduct.rootComponent
-        target_body = None
-        for body in root.bRepBodies:
-            if body.name == body_name:
-                target_body = body
-                break
+        target_body = _find_body(root, body_name)
         
         if not target_body:
-            _ui.messageBox(f"Objet '{body_name}' introuvable.")
+            _status(f"Objet '{body_name}' introuvable.", ok=False)
             return
 
         _ui.activeSelections.clear()
         _ui.activeSelections.add(target_body)
-        if _ui: _ui.messageBox(f"Objet '{body_name}' sélectionné.")
+        _status(f"Objet '{body_name}' sélectionné.")
     except:
-        if _ui: _ui.messageBox(f"Échec de la sélection:\n{traceback.format_exc()}")
+        _status(f"Échec de la sélection:\n{traceback.format_exc()}", ok=False)
 
+@command('select_bodies', "Sélectionne deux objets par leur nom",
+         _arg('name1', 'name', None, "Nom du premier objet", required=True),
+         _arg('name2', 'name', None, "Nom du second objet", required=True))
 def select_bodies(body_name1: str, body_name2: str):
     """Sélectionne deux objets par leur nom"""
     try:
         root = _app.activeProduct.rootComponent
-        body1 = None
-        body2 = None
-        for body in root.bRepBodies:
-            if body.name == body_name1:
-                body1 = body
-            elif body.name == body_name2:
-                body2 = body
+        body1 = _find_body(root, body_name1)
+        body2 = _find_body(root, body_name2)
 
         if not body1:
-            _ui.messageBox(f"Objet '{body_name1}' introuvable.")
+            _status(f"Objet '{body_name1}' introuvable.", ok=False)
             return
         if not body2:
-            _ui.messageBox(f"Objet '{body_name2}' introuvable.")
+            _status(f"Objet '{body_name2}' introuvable.", ok=False)
             return
 
         _ui.activeSelections.clear()
         _ui.activeSelections.add(body1)
         _ui.activeSelections.add(body2)
 
-        if _ui: _ui.messageBox(f"Objets '{body_name1}' et '{body_name2}' sélectionnés.")
+        _status(f"Objets '{body_name1}' et '{body_name2}' sélectionnés.")
+    except:
+        _status(f"Échec de la sélection multiple:\n{traceback.format_exc()}", ok=False)
+
+_REGION_SCHEMA = {'type': 'array', 'items': {'type': 'number'}, 'minItems': 6, 'maxItems': 6}
+_SPATIAL_REPORT_LIMIT = 500
+
+def _region_cm(region):
+    """[xmin, ymin, zmin, xmax, ymax, zmax] en mm -> (lo, hi) en cm, ou None si la boîte est invalide"""
+    if region is None or len(region) != 6:
+        return None
+    values = [float(v) / 10.0 for v in region]
+    lo, hi = tuple(values[:3]), tuple(values[3:])
+    return (lo, hi) if all(l <= h for l, h in zip(lo, hi)) else None
+
+def _spatial_keys_valid(root, names) -> bool:
+    """Vérifie que les clés renvoyées par l'index spatial désignent encore des corps ; sinon (corps renommé
+    ou supprimé à la main, sans changement du nombre de corps) l'arbre sera reconstruit à la prochaine requête"""
+    if all(_find_body(root, name) is not None for name in names):
+        return True
+    _spatial_invalidate()
+    return False
+
+def _select_named(root, names):
+    """Remplace la sélection par les corps nommés ; retourne les noms effectivement sélectionnés"""
+    _ui.activeSelections.clear()
+    selected = []
+    for name in names:
+        body = _find_body(root, name)
+        if body:
+            _ui.activeSelections.add(body)
+            selected.append(name)
+    return selected
+
+@command('select_in_region', "Sélectionne les objets dont la boîte englobante est dans une région (index spatial)",
+         _arg('region', 'json', None, "Boîte [xmin, ymin, zmin, xmax, ymax, zmax] en mm", required=True, schema=_REGION_SCHEMA),
+         _arg('mode', 'string', 'inside', "inside (entièrement contenus) ou intersects (qui touchent la région) (optionnel)",
+              choices=('inside', 'intersects')))
+def select_in_region(region, mode: str = 'inside'):
+    """Sélectionne les corps d'une région par l'arbre de boîtes englobantes"""
+    try:
+        box = _region_cm(region)
+        if box is None:
+            _status("region doit compter 6 valeurs: xmin, ymin, zmin, xmax, ymax, zmax (min <= max).", ok=False)
+            return
+        root = _app.activeProduct.rootComponent
+        names = sorted(_spatial_index(root).query(*box, inside=(mode == 'inside')))
+        selected = _select_named(root, names)
+        if len(selected) < len(names):
+            # Clé périmée : un corps a été renommé ou supprimé hors de l'add-in
+            _spatial_invalidate()
+            names = sorted(_spatial_index(root).query(*box, inside=(mode == 'inside')))
+            selected = _select_named(root, names)
+        _status(f"{len(selected)} objet(s) sélectionné(s) dans la région ({mode})",
+                count=len(selected), bodies=selected[:_SPATIAL_REPORT_LIMIT])
+    except:
+        _status(f"Échec de la sélection par région:\n{traceback.format_exc()}", ok=False)
+
+@command('select_nearest', "Sélectionne le ou les objets les plus proches d'un point (distance à la boîte englobante)",
+         _arg('x', 'length', 0, "X en mm", required=True),
+         _arg('y', 'length', 0, "Y en mm", required=True),
+         _arg('z', 'length', 0, "Z en mm", required=True),
+         _arg('count', 'integer', 1, "Nombre d'objets (optionnel)"))
+def select_nearest(x: float, y: float, z: float, count: int = 1):
+    """Plus proches voisins d'un point par parcours au meilleur d'abord de l'arbre"""
+    try:
+        if count < 1:
+            _status("count doit être >= 1.", ok=False)
+            return
+        root = _app.activeProduct.rootComponent
+        nearest = _spatial_index(root).nearest((x, y, z), count)
+        selected = _select_named(root, [name for _, name in nearest])
+        if len(selected) < len(nearest):
+            # Clé périmée : un corps a été renommé ou supprimé hors de l'add-in
+            _spatial_invalidate()
+            nearest = _spatial_index(root).nearest((x, y, z), count)
+            selected = _select_named(root, [name for _, name in nearest])
+        if not nearest:
+            _status("Aucun objet dans le design.", ok=False)
+            return
+        distances = [{'body': name, 'distance_mm': round(distance * 10, 3)} for distance, name in nearest]
+        _status(f"{len(selected)} objet(s) le(s) plus proche(s) de ({x*10}, {y*10}, {z*10}) mm: {', '.join(selected[:10])}",
+                count=len(selected), bodies=distances)
     except:
-        if _ui: _ui.messageBox(f"Échec de la sélection multiple:\n{traceback.format_exc()}")
+        _status(f"Échec de la recherche du plus proche:\n{traceback.format_exc()}", ok=False)
 
-def select_edges(body_name: str, edge_type: str):
-    """Sélectionne les arêtes d'un objet"""
+@command('find_overlaps', "Liste les couples d'objets dont les boîtes englobantes se chevauchent, ou les voisins d'un objet",
+         _arg('name', 'name', None, "Objet dont chercher les chevauchements (optionnel, tous les couples sinon)"))
+def find_overlaps(body_name: str = None):
+    """Chevauchements de boîtes englobantes (phase large), sans modifier la sélection"""
     try:
         root = _app.activeProduct.rootComponent
-        target_body = None
-        for body in root.bRepBodies:
-            if body.name == body_name:
-                target_body = body
-                break
+        tree = _spatial_index(root)
+        # Clés périmées (corps renommé ou supprimé hors de l'add-in) : un nom absent de l'arbre qui désigne
+        # pourtant un corps, ou un résultat qui n'en désigne plus, fait reconstruire l'arbre une fois
+        if body_name and body_name not in tree.leaves and _find_body(root, body_name) is not None:
+            _spatial_invalidate()
+            tree = _spatial_index(root)
+        if body_name and body_name not in tree.leaves:
+            _status(f"Objet '{body_name}' introuvable.", ok=False)
+            return
+        pairs = sorted(tree.overlaps(body_name))
+        if not _spatial_keys_valid(root, {name for pair in pairs for name in pair}):
+            tree = _spatial_index(root)
+            if body_name and body_name not in tree.leaves:
+                _status(f"Objet '{body_name}' introuvable.", ok=False)
+                return
+            pairs = sorted(tree.overlaps(body_name))
+        if body_name:
+            others = [second for _, second in pairs]
+            _status(f"{len(others)} objet(s) chevauche(nt) '{body_name}'", count=len(others), bodies=others[:_SPATIAL_REPORT_LIMIT])
+        else:
+            _status(f"{len(pairs)} couple(s) d'objets en chevauchement", count=len(pairs),
+                    pairs=[list(pair) for pair in pairs[:_SPATIAL_REPORT_LIMIT]])
+    except:
+        _status(f"Échec de la recherche de chevauchements:\n{traceback.format_exc()}", ok=False)
+
+@command('get_scene', "Décrit les corps du design (boîte, volume, faces, arêtes, matériau) avec un numéro de révision ; depuis une révision donnée, seulement les changements",
+         _arg('since', 'integer', None, "Dernière révision reçue : ne renvoie que les corps changés ou supprimés depuis (optionnel)"))
+def get_scene(since: int = None):
+    """Instantané de la scène, complet ou différentiel depuis une révision"""
+    try:
+        root = _app.activeProduct.rootComponent
+        _scene_refresh(root)
+        # Révision inconnue (add-in redémarré) ou trop ancienne pour le journal des suppressions : instantané complet
+        full = since is None or since < _scene_floor or since > _scene_revision
+        if full:
+            bodies = list(_scene_entries.values())
+            removed = []
+        else:
+            bodies = [entry for name, entry in _scene_entries.items() if _scene_revisions[name] > since]
+            removed = []
+            for name, revision in reversed(_scene_removed.items()):
+                if revision <= since:
+                    break
+                removed.append(name)
+        lines = [f"{e['name']}: [{', '.join(f'{v:g}' for v in e['box'])}] mm, {e['volume']:g} mm³, "
+                 f"{e['faces']} face(s), {e['edges']} arête(s){', ' + e['material'] if e['material'] else ''}"
+                 for e in bodies[:_SCENE_REPORT_LIMIT]]
+        if len(bodies) > _SCENE_REPORT_LIMIT:
+            lines.append(f"... et {len(bodies) - _SCENE_REPORT_LIMIT} autre(s)")
+        if removed:
+            lines.append(f"Supprimé(s): {', '.join(removed)}")
+        summary = (f"Scène: {len(_scene_entries)} corps, révision {_scene_revision}" if full else
+                   f"Scène: révision {_scene_revision}, {len(bodies)} corps modifié(s) et {len(removed)} supprimé(s) depuis la révision {since}")
+        _status("\n".join([summary] + lines), revision=_scene_revision, full=full, count=len(_scene_entries),
+                bodies=bodies, removed=removed)
+    except:
+        _status(f"Échec de la lecture de la scène:\n{traceback.format_exc()}", ok=False)
+
+@command('select_edges', "Sélectionne les arêtes d'un objet, filtrées par type, longueur, axe, convexité, face ou région",
+         _arg('bodyName', 'name', None, "Nom de l'objet", required=True),
+         _arg('edgeType', 'string', 'all', "Type d'arêtes: all, circular, line, arc, circle, ellipse, elliptical_arc, nurbs", required=True,
+              choices=('all', 'circular') + tuple(dict.fromkeys(_EDGE_KINDS.values()))),
+         _arg('minLength', 'length', None, "Longueur minimale en mm (optionnel)"),
+         _arg('maxLength', 'length', None, "Longueur maximale en mm (optionnel)"),
+         _arg('axis', 'string', None, "Droites parallèles à l'axe, ou cercles et arcs autour de l'axe: x, y, z (optionnel)", choices=_AXIS_CHOICES),
+         _arg('convexity', 'string', 'any', "any, convex, concave, smooth (optionnel)", choices=('any', 'convex', 'concave', 'smooth')),
+         _arg('face', 'string', None, "Arêtes d'une face plane de normale extérieure: +x, -x, +y, -y, +z, -z (optionnel)", choices=_FACE_CHOICES),
+         _arg('region', 'json', None, "Boîte [xmin, ymin, zmin, xmax, ymax, zmax] en mm contenant les arêtes (optionnel)",
+              schema=_REGION_SCHEMA))
+def select_edges(body_name: str, edge_type: str, min_length: float = None, max_length: float = None, axis: str = None,
+                 convexity: str = 'any', face: str = None, region=None):
+    """Sélectionne les arêtes d'un objet à partir de sa table d'arêtes en cache"""
+    try:
+        root = _app.activeProduct.rootComponent
+        target_body = _find_body(root, body_name)
         
         if not target_body:
-            _ui.messageBox(f"Objet '{body_name}' introuvable.")
+            _status(f"Objet '{body_name}' introuvable.", ok=False)
             return
+        if region is not None:
+            if len(region) != 6:
+                _status("region doit compter 6 valeurs: xmin, ymin, zmin, xmax, ymax, zmax.", ok=False)
+                return
+            region = [float(v) / 10.0 for v in region]
 
+        unfiltered = (edge_type == 'all' and min_length is None and max_length is None and axis is None
+                      and convexity == 'any' and face is None and region is None)
+        if unfiltered:
+            # Toutes les arêtes : inutile de lire leurs caractéristiques
+            edges, cached = list(target_body.edges), None
+        else:
+            rows, cached = _edge_table(target_body)
+            edges = [row.edge for row in _query_edges(rows, edge_type, min_length, max_length, axis, convexity, face, region)]
         _ui.activeSelections.clear()
 
         selected_count = 0
-        for edge in target_body.edges:
-            if edge_type == 'all':
-                _ui.activeSelections.add(edge)
-                selected_count += 1
-            elif edge_type == 'circular' and edge.geometry.curveType == adsk.core.Curve3DTypes.Circle3DCurveType:
-                _ui.activeSelections.add(edge)
-                selected_count += 1
+        for edge in edges:
+            _ui.activeSelections.add(edge)
+            selected_count += 1
         
         if selected_count > 0:
-            if _ui: _ui.messageBox(f"{selected_count} arête(s) de type '{edge_type}' sélectionnée(s) sur '{body_name}'")
+            _status(f"{selected_count} arête(s) de type '{edge_type}' sélectionnée(s) sur '{body_name}'", count=selected_count, cached=cached)
         else:
-            if _ui: _ui.messageBox(f"Aucune arête de type '{edge_type}' trouvée sur '{body_name}'")
+            _status(f"Aucune arête de type '{edge_type}' trouvée sur '{body_name}'", count=0, cached=cached)
 
     except:
-        if _ui: _ui.messageBox(f"Échec de la sélection d'arêtes:\n{traceback.format_exc()}")
+        _status(f"Échec de la sélection d'arêtes:\n{traceback.format_exc()}", ok=False)
 
+@command('add_fillet', "Ajoute un congé aux arêtes sélectionnées",
+         _arg('radius', 'length', 5, "Rayon du congé en mm", required=True))
 def add_fillet(radius: float):
     """Ajoute un congé aux arêtes sélectionnées"""
     try:
         selections = _ui.activeSelections
         if selections.count == 0:
-            _ui.messageBox("Sélectionnez des arêtes pour appliquer le congé.")
+            _status("Sélectionnez des arêtes pour appliquer le congé.", ok=False)
             return
 
         edges_to_fillet = adsk.core.ObjectCollection.create()
+        bodies = []
         for i in range(selections.count):
             selection = selections.item(i)
             entity = selection.entity
             if entity.objectType == adsk.fusion.BRepEdge.classType():
                 edges_to_fillet.add(entity)
+                body = entity.body
+                if not any(body == other for other in bodies):
+                    bodies.append(body)
 
         if edges_to_fillet.count == 0:
-            _ui.messageBox("Aucune arête sélectionnée.")
+            _status("Aucune arête sélectionnée.", ok=False)
             return
 
         root = _app.activeProduct.rootComponent
@@ -586,33 +2102,1239 @@ def add_fillet(radius: float):
         fillet_input.addConstantRadiusEdgeSet(edges_to_fillet, fillet_radius, True)
         
         fillets.add(fillet_input)
-        if _ui: _ui.messageBox(f"Congé de R{radius*10}mm appliqué à {edges_to_fillet.count} arête(s)")
+        for body in bodies:
+            _spatial_mark(body=body)
+        _status(f"Congé de R{radius*10}mm appliqué à {edges_to_fillet.count} arête(s)")
     except:
-        if _ui: _ui.messageBox(f"Échec de l'application du congé:\n{traceback.format_exc()}")
+        _status(f"Échec de l'application du congé:\n{traceback.format_exc()}", ok=False)
+
+# Attente maximale (s) de la fin d'une étape d'annulation ; la pile vide est détectée avant, sans attente
+_HISTORY_STEP_TIMEOUT = float(os.environ.get('FUSION_MCP_HISTORY_STEP_TIMEOUT', '0.5'))
+_HISTORY_COMMANDS = frozenset(('UndoCommand', 'RedoCommand'))
+# Fins des commandes d'historique (identifiant, raison), signalées par UserInterface.commandTerminated
+_history_terminated = collections.deque()
+_history_handler = None
+
+class HistoryTerminatedEventHandler(adsk.core.ApplicationCommandEventHandler):
+    """Note la fin des commandes Annuler et Rétablir"""
+    def __init__(self):
+        super().__init__()
 
-def undo():
-    """Annule la dernière opération"""
+    def notify(self, args):
+        if args.commandId in _HISTORY_COMMANDS:
+            _history_terminated.append((args.commandId, args.terminationReason))
+
+def _history_state():
+    """Empreinte de l'état annulable : marqueur et longueur de timeline, puis nom, faces et boîte de chaque corps"""
+    design = adsk.fusion.Design.cast(_app.activeProduct)
+    marker = None
+    if design.designType == adsk.fusion.DesignTypes.ParametricDesignType:
+        timeline = design.timeline
+        marker = timeline.markerPosition, timeline.count
+    return marker, tuple((body.name, body.faces.count, _body_box(body)) for body in design.rootComponent.bRepBodies)
+
+def _wait_history_step(command_id: str) -> bool:
+    """Laisse Fusion traiter ses événements jusqu'à la fin de la commande ; False si elle n'est pas terminée à temps"""
+    deadline = time.perf_counter() + _HISTORY_STEP_TIMEOUT
+    while True:
+        adsk.doEvents()
+        for terminated_id, reason in _history_terminated:
+            if terminated_id == command_id:
+                return reason == adsk.core.CommandTerminationReason.CompletedTerminationReason
+        if time.perf_counter() > deadline:
+            return False
+        # Attente passive entre deux passages : le thread principal n'est pas accaparé
+        time.sleep(0.002)
+
+def _repeat_history(command_id: str, steps: int):
+    """Exécute la commande d'historique de Fusion une étape à la fois ; retourne le nombre d'étapes effectuées.
+    execute() ne fait que lancer la commande : chaque étape attend sa fin (commandTerminated) avant la suivante,
+    et les caches ne sont invalidés qu'une fois la dernière terminée. None si la commande est introuvable"""
+    cmd_def = _ui.commandDefinitions.itemById(command_id)
+    if not cmd_def:
+        return None
+    done = 0
     try:
-        cmd_def = _ui.commandDefinitions.itemById('UndoCommand')
-        if cmd_def:
+        for _ in range(steps):
+            # Commande grisée : plus rien à annuler ou à refaire, inutile d'attendre
+            if not cmd_def.controlDefinition.isEnabled:
+                break
+            _history_terminated.clear()
+            before = _history_state()
             cmd_def.execute()
-            if _ui: _ui.messageBox("Opération annulée")
+            # Sans fin signalée à temps (ou fin anormale), l'étape compte si le design a changé
+            if not _wait_history_step(command_id) and _history_state() == before:
+                break
+            done += 1
+        return done
+    finally:
+        _spatial_invalidate()
+        _forget_shared_sketches()
+
+@command('undo', "Annule les dernières opérations",
+         _arg('steps', 'integer', 1, "Nombre d'opérations à annuler (optionnel, 1 par défaut)"))
+def undo(steps: int = 1):
+    """Annule les steps dernières opérations"""
+    if steps < 1:
+        _status(f"Nombre d'opérations à annuler invalide: {steps}", ok=False)
+        return
+    try:
+        done = _repeat_history('UndoCommand', steps)
+        if done is None:
+            _status("Commande d'annulation introuvable", ok=False)
+        elif done == 0:
+            _status("Aucune opération à annuler", ok=False, steps=0, requested=steps)
+        elif done < steps:
+            _status(f"{done} opération(s) annulée(s) sur {steps}: plus rien à annuler", steps=done, requested=steps)
         else:
-            _ui.messageBox("Commande d'annulation introuvable")
+            _status("Opération annulée" if steps == 1 else f"{steps} opérations annulées", steps=steps, requested=steps)
     except:
-        if _ui: _ui.messageBox(f"Échec de l'annulation:\n{traceback.format_exc()}")
+        _status(f"Échec de l'annulation:\n{traceback.format_exc()}", ok=False)
+
+@command('redo', "Refait les dernières opérations annulées",
+         _arg('steps', 'integer', 1, "Nombre d'opérations à refaire (optionnel, 1 par défaut)"))
+def redo(steps: int = 1):
+    """Refait les steps dernières opérations annulées"""
+    if steps < 1:
+        _status(f"Nombre d'opérations à refaire invalide: {steps}", ok=False)
+        return
+    try:
+        done = _repeat_history('RedoCommand', steps)
+        if done is None:
+            _status("Commande de rétablissement introuvable", ok=False)
+        elif done == 0:
+            _status("Aucune opération à refaire", ok=False, steps=0, requested=steps)
+        elif done < steps:
+            _status(f"{done} opération(s) refaite(s) sur {steps}: plus rien à refaire", steps=done, requested=steps)
+        else:
+            _status("Opération refaite" if steps == 1 else f"{steps} opérations refaites", steps=steps, requested=steps)
+    except:
+        _status(f"Échec du rétablissement:\n{traceback.format_exc()}", ok=False)
+
+# --- Points de reprise ---
+# Nom -> position du marqueur de timeline ; rollback_to y ramène le design en une seule opération,
+# esquisses et plans de construction orphelins compris. Vidés au changement de design.
+_checkpoints = collections.OrderedDict()
+
+def _active_timeline():
+    """Timeline du design actif, ou None en modélisation directe"""
+    design = adsk.fusion.Design.cast(_app.activeProduct)
+    if design and design.designType == adsk.fusion.DesignTypes.ParametricDesignType:
+        return design.timeline
+    return None
+
+def _roll_back_timeline(timeline, position: int, discard: bool = True):
+    """Ramène le marqueur à position ; avec discard, supprime aussi les entrées situées après lui"""
+    global _last_move
+    _finish_base_feature()
+    timeline.markerPosition = position
+    if discard:
+        timeline.deleteAllAfterMarker()
+        for name in [name for name, marker in _checkpoints.items() if marker > position]:
+            del _checkpoints[name]
+    _last_move = None
+    _spatial_invalidate()
+    _forget_shared_sketches()
+
+@command('checkpoint', "Enregistre un point de reprise nommé à la position actuelle de la timeline",
+         _arg('name', 'name', None, "Nom du point de reprise", required=True))
+def checkpoint(name: str):
+    """Mémorise la position du marqueur de timeline sous le nom donné"""
+    try:
+        _indexed_bodies(_app.activeProduct.rootComponent)
+        timeline = _active_timeline()
+        if timeline is None:
+            _status("Points de reprise indisponibles en modélisation directe (pas de timeline).", ok=False)
+            return
+        _checkpoints.pop(name, None)
+        _checkpoints[name] = timeline.markerPosition
+        _status(f"Point de reprise '{name}' enregistré (position {_checkpoints[name]})", name=name,
+                position=_checkpoints[name], checkpoints=dict(_checkpoints))
+    except:
+        _status(f"Échec de l'enregistrement du point de reprise:\n{traceback.format_exc()}", ok=False)
 
-def redo():
-    """Refait la dernière opération annulée"""
+@command('rollback_to', "Ramène le design à un point de reprise en une seule opération, en supprimant ce qui a été fait depuis",
+         _arg('name', 'name', None, "Nom du point de reprise", required=True),
+         _arg('discard', 'boolean', True, "Supprime les opérations suivantes ; sinon elles restent derrière le marqueur (optionnel)"))
+def rollback_to(name: str, discard: bool = True):
+    """Replace le marqueur de timeline sur un point de reprise"""
     try:
-        cmd_def = _ui.commandDefinitions.itemById('RedoCommand')
-        if cmd_def:
-            cmd_def.execute()
-            if _ui: _ui.messageBox("Opération refaite")
+        _indexed_bodies(_app.activeProduct.rootComponent)
+        if name not in _checkpoints:
+            _status(f"Point de reprise introuvable: {name}", ok=False, checkpoints=dict(_checkpoints))
+            return
+        timeline = _active_timeline()
+        if timeline is None:
+            _status("Points de reprise indisponibles en modélisation directe (pas de timeline).", ok=False)
+            return
+        position = _checkpoints[name]
+        count = timeline.count
+        if position > count:
+            # Annulations manuelles au-delà du point de reprise : la position ne désigne plus le même état
+            del _checkpoints[name]
+            _status(f"Point de reprise '{name}' dépassé: la timeline n'a plus que {count} entrée(s)", ok=False)
+            return
+        removed = count - position
+        _roll_back_timeline(timeline, position, discard)
+        _status(f"Design ramené au point de reprise '{name}' ({removed} entrée(s) de timeline "
+                f"{'supprimée(s)' if discard else 'derrière le marqueur'})",
+                name=name, position=position, removed=removed, discarded=discard)
+    except:
+        _status(f"Échec du retour au point de reprise:\n{traceback.format_exc()}", ok=False)
+
+# --- Phase 4: Lots ---
+
+# Calcul différé : profondeur d'imbrication (begin_bulk manuels + lots) et état à restaurer
+_bulk_depth = 0
+_bulk_design = None
+_bulk_was_deferred = False
+
+def _enter_bulk():
+    """Suspend le recalcul du design ; seul le niveau le plus externe touche à Fusion"""
+    global _bulk_depth, _bulk_design, _bulk_was_deferred
+    if _bulk_depth == 0:
+        design = adsk.fusion.Design.cast(_app.activeProduct)
+        # Pas de timeline à recalculer en modélisation directe
+        if design and design.designType == adsk.fusion.DesignTypes.ParametricDesignType:
+            _bulk_design = design
+            _bulk_was_deferred = design.isComputeDeferred
+            design.isComputeDeferred = True
+    _bulk_depth += 1
+
+def _exit_bulk():
+    """Referme un niveau ; au dernier, restaure le calcul et retourne sa durée en ms (sinon None)"""
+    global _bulk_depth, _bulk_design
+    if _bulk_depth == 0:
+        return None
+    _bulk_depth -= 1
+    if _bulk_depth > 0 or _bulk_design is None:
+        return None
+    design, _bulk_design = _bulk_design, None
+    started = time.perf_counter()
+    # Repasser isComputeDeferred à False recalcule une seule fois toutes les features en attente
+    design.isComputeDeferred = _bulk_was_deferred
+    compute_ms = round((time.perf_counter() - started) * 1000, 3)
+    if _current_metrics is not None:
+        _current_metrics['stages']['compute'] = compute_ms
+    return compute_ms
+
+@command('begin_bulk', "Suspend le recalcul du design jusqu'à end_bulk, pour enchaîner de nombreuses opérations")
+def begin_bulk():
+    """Ouvre une section de calcul différé"""
+    _enter_bulk()
+    _status(f"Calcul différé activé (niveau {_bulk_depth})", depth=_bulk_depth)
+
+@command('end_bulk', "Referme la section ouverte par begin_bulk et recalcule le design une seule fois")
+def end_bulk():
+    """Referme une section de calcul différé"""
+    if _bulk_depth == 0:
+        _status("Aucune section de calcul différé ouverte (begin_bulk).", ok=False)
+        return
+    try:
+        compute_ms = _exit_bulk()
+    except:
+        _status(f"Échec du recalcul du design:\n{traceback.format_exc()}", ok=False)
+        return
+    if compute_ms is None:
+        _status(f"Niveau de calcul différé refermé (reste {_bulk_depth})", depth=_bulk_depth)
+    else:
+        _status(f"Calcul différé terminé, design recalculé en {compute_ms} ms", depth=0, compute_ms=compute_ms)
+
+@command('batch', "Exécute plusieurs opérations d'affilée dans Fusion 360, regroupées dans un seul groupe de timeline",
+         _arg('operations', 'json', None, "Opérations à exécuter dans l'ordre", required=True, schema={
+             'type': 'array',
+             'items': {
+                 'type': 'object',
+                 'properties': {
+                     'tool': {'type': 'string', 'description': "Nom de l'outil (create_box, move_selection, combine_by_name, add_fillet, ...)"},
+                     'arguments': {'type': 'object', 'description': "Arguments de l'outil"},
+                 },
+                 'required': ['tool'],
+             },
+         }),
+         _arg('stop_on_error', 'boolean', False, "Arrête le lot à la première erreur (optionnel)"),
+         _arg('defer_compute', 'boolean', True, "Suspend le recalcul du design pendant le lot (optionnel, activé par défaut)"),
+         _arg('rollback_on_error', 'boolean', False, "À la première erreur, arrête le lot et supprime tout ce qu'il a créé (optionnel)"))
+def run_batch(operations: list, stop_on_error: bool = False, defer_compute: bool = True, rollback_on_error: bool = False):
+    """Exécute plusieurs commandes dans un seul événement et un seul groupe de timeline"""
+    global _batch_depth
+    timeline = _active_timeline()
+    start_index = timeline.markerPosition if timeline else 0
+
+    results = []
+    compute_ms = None
+    _batch_depth += 1
+    if defer_compute:
+        _enter_bulk()
+    try:
+        for index, operation in enumerate(operations):
+            if isinstance(operation, (str, dict)):
+                result = execute_command(operation)
+            else:
+                result = {'ok': False, 'command': repr(operation)[:200],
+                          'message': f"Opération {index + 1} invalide: texte ou objet JSON attendu, pas {type(operation).__name__}"}
+            if not result['ok']:
+                result['index'] = index
+            results.append(result)
+            if (stop_on_error or rollback_on_error) and not result['ok']:
+                break
+    finally:
+        _batch_depth -= 1
+        try:
+            _finish_base_feature()
+        finally:
+            # Restauré même si une opération ou la fermeture de la base feature a échoué
+            if defer_compute:
+                compute_ms = _exit_bulk()
+
+    failed = next((index for index, result in enumerate(results) if not result['ok']), None)
+    if rollback_on_error and failed is not None:
+        # Transaction : le lot échoué ne laisse ni corps, ni esquisse, ni plan de construction
+        if timeline is None:
+            _status(f"Lot interrompu à l'opération {failed + 1}/{len(operations)} ; retour arrière impossible "
+                    "en modélisation directe (pas de timeline)", ok=False, results=results, rolled_back=False)
+            return
+        try:
+            _roll_back_timeline(timeline, start_index)
+        except:
+            _status(f"Échec du retour arrière du lot:\n{traceback.format_exc()}", ok=False, results=results, rolled_back=False)
+            return
+        _status(f"Lot annulé: l'opération {failed + 1}/{len(operations)} a échoué ({results[failed]['message']})",
+                ok=False, results=results, rolled_back=True, failed_index=failed)
+        return
+
+    # Un seul groupe : le lot se replie, se supprime ou se supprime du calcul en une fois
+    end_index = timeline.markerPosition - 1 if timeline else -1
+    if timeline and end_index > start_index:
+        group = timeline.timelineGroups.add(start_index, end_index)
+        group.name = f"MCP lot ({len(results)} opérations)"
+
+    succeeded = sum(1 for r in results if r['ok'])
+    data = {'results': results}
+    if compute_ms is not None:
+        data['compute_ms'] = compute_ms
+    _status(f"Lot exécuté: {succeeded}/{len(operations)} opération(s) réussie(s)",
+            ok=succeeded == len(operations), **data)
+
+# --- Phase 5: Mode de sortie et journal ---
+
+@command('set_output_mode', "Choisit le mode de sortie de Fusion 360 : dialog (boîtes de dialogue) ou quiet (sans fenêtre modale, statuts journalisés)",
+         _arg('mode', 'string', None, "Mode: dialog ou quiet", required=True, choices=_OUTPUT_MODES))
+def set_output_mode(mode: str):
+    """Bascule entre boîtes de dialogue et mode silencieux"""
+    global _output_mode
+    _output_mode = mode
+    _status(f"Mode de sortie: {mode}", mode=mode)
+
+@command('get_log', "Retourne les derniers statuts et erreurs enregistrés par l'add-in",
+         _arg('count', 'integer', 20, "Nombre d'entrées (optionnel, 20 par défaut)"))
+def get_log(count: int = 20):
+    """Retourne les derniers statuts enregistrés"""
+    entries = list(_status_log)[-count:] if count > 0 else []
+    lines = [f"{'✅' if e['ok'] else '❌'} {e['command'] or '-'}: {e['message']}" for e in entries]
+    _status(f"{len(entries)} statut(s) récent(s)\n" + "\n".join(lines), entries=entries)
+
+@command('get_metrics', "Retourne les latences par commande et par étape (p50/p95/p99, nombres d'appels, taux d'erreur)",
+         _arg('command', 'name', None, "Limiter à une commande (optionnel)"),
+         _arg('reset', 'boolean', False, "Remet les compteurs à zéro après lecture (optionnel)"))
+def get_metrics(command_name: str = None, reset: bool = False):
+    """Retourne les métriques agrégées par commande"""
+    global _metrics_version
+    snapshot = _metrics_snapshot(command_name)
+    snapshot['watcher'] = dict(_watcher_stats)
+    with _pending_lock:
+        queued = sum(1 for entry in _pending_requests.values() if not entry.running)
+        snapshot['scheduler'] = dict(_scheduler_stats, queued=queued, tick_budget_ms=_tick_budget_ms)
+    lines = []
+    for name, entry in snapshot['commands'].items():
+        total = entry['stages'].get('total')
+        timing = f", total p50 {total['p50_ms']} / p95 {total['p95_ms']} / p99 {total['p99_ms']} ms" if total else ''
+        lines.append(f"{name}: {entry['count']} appel(s), {entry['errors']} erreur(s){timing}")
+    if reset:
+        with _metrics_lock:
+            _metrics.clear()
+            _metrics_version += 1
+    _status(f"Métriques de {len(lines)} commande(s)\n" + "\n".join(lines), metrics=snapshot)
+
+# Commandes exécutées sous cProfile, et dossier des profils .prof produits
+_profiled_commands = set()
+_profile_dir = None
+
+@command('profile_command', "Active ou désactive la capture cProfile des prochaines exécutions d'une commande",
+         _arg('command', 'name', None, "Nom de la commande à profiler", required=True),
+         _arg('enabled', 'boolean', True, "Active (true) ou désactive (false) la capture (optionnel)"))
+def profile_command(command_name: str, enabled: bool = True):
+    """Bascule la capture cProfile d'une commande"""
+    if command_name not in _COMMANDS:
+        _status(f"Commande inconnue: '{command_name}'", ok=False)
+        return
+    if enabled:
+        _profiled_commands.add(command_name)
+    else:
+        _profiled_commands.discard(command_name)
+    _status(f"Profilage de '{command_name}' {'activé' if enabled else 'désactivé'}", profiled=sorted(_profiled_commands))
+
+def _run_profiled(command_name: str, handler, values):
+    """Exécute une commande sous cProfile ; le profil est sauvé et résumé dans le résultat"""
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(handler, *values)
+    finally:
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(15)
+        profile = {'top': summary.getvalue()}
+        if _profile_dir:
+            os.makedirs(_profile_dir, exist_ok=True)
+            path = os.path.join(_profile_dir, f"{command_name}-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}.prof")
+            profiler.dump_stats(path)
+            profile['path'] = path
+        if _current_result is not None:
+            _current_result['profile'] = profile
+
+# --- Phase 6: Enregistrement et relecture du flux de commandes ---
+# Journal JSON Lines : une requête reçue par ligne, avec son instant, son issue et sa durée
+_journal_file = None
+_journal_path = None
+# Commandes de pilotage du journal : jamais enregistrées, pour qu'une relecture ne se relance pas elle-même
+_JOURNAL_COMMANDS = {'start_recording', 'stop_recording', 'replay_journal'}
+# Préfixe des clés de requêtes issues d'une relecture (non réenregistrées)
+_REPLAY_KEY_PREFIX = 'replay-'
+
+def _default_journal_path() -> str:
+    return os.path.join(os.path.expanduser('~'), 'Documents', 'fusion_mcp_journals',
+                        f"session-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+
+def _open_journal(path: str = None) -> str:
+    """Démarre l'enregistrement (ajout en fin de fichier) ; retourne le chemin du journal"""
+    global _journal_file, _journal_path
+    _close_journal()
+    path = os.path.abspath(os.path.expanduser(path or _default_journal_path()))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Tampon ligne : chaque entrée est sur disque même si Fusion se ferme brutalement
+    _journal_file = open(path, 'a', encoding='utf-8', buffering=1)
+    _journal_path = path
+    return path
+
+def _close_journal():
+    global _journal_file, _journal_path
+    if _journal_file is not None:
+        journal_file, _journal_file, _journal_path = _journal_file, None, None
+        journal_file.close()
+
+def _journal_record(request, result: dict, received_at: float):
+    """Ajoute une requête exécutée au journal, si l'enregistrement est actif"""
+    if _journal_file is None or (isinstance(request, str) and not request.strip()):
+        return
+    try:
+        command_name = _parse_request(request)[0]
+    except Exception:
+        command_name = None
+    if command_name in _JOURNAL_COMMANDS:
+        return
+    entry = {'t': round(received_at, 6), 'request': request, 'ok': result.get('ok', False),
+             'ms': result.get('duration_ms')}
+    if not entry['ok']:
+        entry['message'] = result.get('message', '')
+    try:
+        _journal_file.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n')
+    except (OSError, TypeError, ValueError) as e:
+        print(f"⚠️ Journal: entrée non enregistrée ({e})")
+
+def _read_journal(path: str):
+    """Lit un journal ; retourne (entrées dans l'ordre, lignes illisibles ignorées)"""
+    entries, skipped = [], 0
+    with open(os.path.expanduser(path), 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+                entry['request']
+            except (ValueError, KeyError, TypeError):
+                skipped += 1
+                continue
+            entries.append(entry)
+    return entries, skipped
+
+@command('start_recording', "Enregistre chaque commande reçue (instant, arguments, issue) dans un journal rejouable",
+         _arg('path', 'string', None, "Fichier journal .jsonl (optionnel, ~/Documents/fusion_mcp_journals par défaut)"))
+def start_recording(path: str = None):
+    """Démarre l'enregistrement du flux de commandes"""
+    try:
+        journal_path = _open_journal(path)
+    except OSError as e:
+        _status(f"Impossible d'ouvrir le journal: {e}", ok=False)
+        return
+    _status(f"Enregistrement démarré: {journal_path}", path=journal_path)
+
+@command('stop_recording', "Arrête l'enregistrement du flux de commandes")
+def stop_recording():
+    """Arrête l'enregistrement du flux de commandes"""
+    if _journal_file is None:
+        _status("Aucun enregistrement en cours.", ok=False)
+        return
+    journal_path = _journal_path
+    _close_journal()
+    _status(f"Enregistrement arrêté: {journal_path}", path=journal_path)
+
+@command('replay_journal', "Rejoue un journal enregistré : au plus vite dans un seul lot, ou au rythme d'origine",
+         _arg('path', 'string', None, "Fichier journal .jsonl", required=True),
+         _arg('pacing', 'string', 'fast', "fast (au plus vite, un seul lot) ou original (rythme d'origine)", choices=('fast', 'original')),
+         _arg('speed', 'number', 1.0, "Facteur d'accélération du rythme d'origine (optionnel)"),
+         _arg('stop_on_error', 'boolean', False, "Arrête à la première erreur (optionnel)"))
+def replay_journal(path: str, pacing: str = 'fast', speed: float = 1.0, stop_on_error: bool = False):
+    """Rejoue un journal de commandes"""
+    try:
+        entries, skipped = _read_journal(path)
+    except OSError as e:
+        _status(f"Journal illisible: {e}", ok=False)
+        return
+    if not entries:
+        _status(f"Journal vide: {path}", ok=False)
+        return
+    requests = [entry['request'] for entry in entries]
+
+    if pacing == 'fast':
+        # Reconstruction déterministe : un seul événement, calcul différé, un seul groupe de timeline
+        run_batch(requests, stop_on_error)
+        results = _current_result.get('results', []) if _current_result else []
+        succeeded = sum(1 for r in results if r['ok'])
+        _status(f"Journal rejoué: {succeeded}/{len(requests)} commande(s) réussie(s), {skipped} ligne(s) ignorée(s)",
+                ok=succeeded == len(requests))
+        return
+
+    if speed <= 0:
+        _status("Le facteur de vitesse doit être positif.", ok=False)
+        return
+    # Rythme d'origine : un thread réémet chaque requête dans notify() à son instant relatif
+    threading.Thread(target=_paced_replay, args=(entries, speed, stop_on_error), daemon=True).start()
+    duration = (entries[-1]['t'] - entries[0]['t']) / speed
+    _status(f"Relecture démarrée: {len(entries)} commande(s) sur {duration:.1f} s", count=len(entries), duration_s=round(duration, 3))
+
+def _paced_replay(entries, speed: float, stop_on_error: bool):
+    """Soumet les entrées au thread principal en respectant leurs écarts d'origine divisés par speed"""
+    replay_id = time.time_ns()
+    started, origin = time.perf_counter(), entries[0]['t']
+    outcomes = []
+    finished = threading.Event()
+
+    def on_done(result):
+        outcomes.append(result['ok'])
+        if len(outcomes) == len(entries) or (stop_on_error and not result['ok']):
+            finished.set()
+
+    for index, entry in enumerate(entries):
+        delay = (entry['t'] - origin) / speed - (time.perf_counter() - started)
+        if delay > 0 and finished.wait(delay):
+            break
+        if finished.is_set() or (_stop_flag is not None and _stop_flag.is_set()):
+            break
+        _submit_request(f"{_REPLAY_KEY_PREFIX}{replay_id}-{index}", entry['request'], on_done, priority='modeling')
+    while not finished.wait(_WATCH_TIMEOUT):
+        if _stop_flag is None or _stop_flag.is_set():
+            break
+    print(f"♻️ Relecture terminée: {sum(outcomes)}/{len(entries)} commande(s) réussie(s) "
+          f"en {time.perf_counter() - started:.2f} s")
+
+# --- Phase 7: Réseaux de corps (pattern features) ---
+_ARRAY_OPERATION_CHOICES = ('none',) + _OPERATION_CHOICES
+
+def _construction_axis(root, axis_str: str):
+    """Axe de construction du composant racine correspondant à x, y ou z"""
+    return {'x': root.xConstructionAxis, 'y': root.yConstructionAxis, 'z': root.zConstructionAxis}[axis_str.lower()]
+
+def _finish_array(root, source, source_name: str, pattern_feature, target_name: str, operation: str):
+    """Nomme les copies d'un réseau, ou les combine avec la source dans le corps cible ; retourne le message"""
+    copies = [pattern_feature.bodies.item(i) for i in range(pattern_feature.bodies.count)]
+    if operation == 'none':
+        for index, copy in enumerate(copies, start=1):
+            _name_body(root, copy, f"{source_name}_{index}")
+        return f"{len(copies)} copie(s) de '{source_name}' créée(s)"
+
+    target = _find_body(root, target_name)
+    tools = adsk.core.ObjectCollection.create()
+    tools.add(source)
+    for copy in copies:
+        tools.add(copy)
+    combine_features = root.features.combineFeatures
+    combine_input = combine_features.createInput(target, tools)
+    combine_input.operation = {
+        'join': adsk.fusion.FeatureOperations.JoinFeatureOperation,
+        'cut': adsk.fusion.FeatureOperations.CutFeatureOperation,
+        'intersect': adsk.fusion.FeatureOperations.IntersectFeatureOperation,
+    }[operation]
+    combine_features.add(combine_input)
+    _unindex_body(root, source_name)
+    _spatial_mark(target_name)
+    return f"{len(copies) + 1} occurrence(s) de '{source_name}' combinée(s) ({operation}) avec '{target_name}'"
+
+def _resolve_array_bodies(root, body_name: str, target_name: str, operation: str):
+    """Corps source et contrôle de la cible ; retourne la source ou None après avoir signalé l'erreur"""
+    source = _find_body(root, body_name)
+    if not source:
+        _status(f"Objet '{body_name}' introuvable.", ok=False)
+        return None
+    if operation != 'none':
+        if not target_name:
+            _status(f"L'opération '{operation}' demande un objet cible (target).", ok=False)
+            return None
+        if target_name == body_name or not _find_body(root, target_name):
+            _status(f"Objet cible '{target_name}' introuvable ou identique à la source.", ok=False)
+            return None
+    return source
+
+@command('create_rectangular_array', "Duplique un objet en grille avec une seule fonction de réseau rectangulaire, et peut combiner les copies avec un objet cible",
+         _arg('name', 'name', None, "Nom de l'objet à dupliquer", required=True),
+         _arg('count1', 'integer', 2, "Nombre d'occurrences dans la première direction (source comprise)", required=True),
+         _arg('spacing1', 'length', 10, "Espacement dans la première direction en mm", required=True),
+         _arg('count2', 'integer', 1, "Nombre d'occurrences dans la seconde direction (optionnel)"),
+         _arg('spacing2', 'length', 10, "Espacement dans la seconde direction en mm (optionnel)"),
+         _arg('direction1', 'string', 'x', "Première direction: x, y, z (optionnel)", choices=_AXIS_CHOICES),
+         _arg('direction2', 'string', 'y', "Seconde direction: x, y, z (optionnel)", choices=_AXIS_CHOICES),
+         _arg('target', 'name', None, "Objet avec lequel combiner la source et ses copies (optionnel)"),
+         _arg('operation', 'string', 'none', "Combinaison avec la cible: none, join, cut, intersect (optionnel)", choices=_ARRAY_OPERATION_CHOICES))
+def create_rectangular_array(body_name: str, count1: int, spacing1: float, count2: int = 1, spacing2: float = 1.0,
+                             direction1: str = 'x', direction2: str = 'y', target_name: str = None, operation: str = 'none'):
+    """Réseau rectangulaire d'un corps : une fonction de réseau au lieu de N créations"""
+    try:
+        if count1 < 1 or count2 < 1 or count1 * count2 < 2:
+            _status("Le réseau doit compter au moins 2 occurrences (count1, count2 >= 1).", ok=False)
+            return
+        if count2 > 1 and direction1 == direction2:
+            _status("Les deux directions du réseau doivent être différentes.", ok=False)
+            return
+        root = _app.activeProduct.rootComponent
+        source = _resolve_array_bodies(root, body_name, target_name, operation)
+        if not source:
+            return
+
+        entities = adsk.core.ObjectCollection.create()
+        entities.add(source)
+        patterns = root.features.rectangularPatternFeatures
+        pattern_input = patterns.createInput(entities, _construction_axis(root, direction1),
+                                             adsk.core.ValueInput.createByReal(count1),
+                                             adsk.core.ValueInput.createByReal(spacing1),
+                                             adsk.fusion.PatternDistanceType.SpacingPatternDistanceType)
+        if count2 > 1:
+            pattern_input.setDirectionTwo(_construction_axis(root, direction2),
+                                          adsk.core.ValueInput.createByReal(count2),
+                                          adsk.core.ValueInput.createByReal(spacing2))
+        pattern_feature = patterns.add(pattern_input)
+
+        message = _finish_array(root, source, body_name, pattern_feature, target_name, operation)
+        _status(f"Réseau rectangulaire {count1}×{count2} ({spacing1*10}mm × {spacing2*10}mm): {message}",
+                count=count1 * count2)
+    except:
+        _status(f"Échec du réseau rectangulaire:\n{traceback.format_exc()}", ok=False)
+
+@command('create_circular_array', "Duplique un objet autour d'un axe avec une seule fonction de réseau circulaire, et peut combiner les copies avec un objet cible",
+         _arg('name', 'name', None, "Nom de l'objet à dupliquer", required=True),
+         _arg('count', 'integer', 6, "Nombre d'occurrences (source comprise)", required=True),
+         _arg('angle', 'angle', 360, "Angle total en degrés (optionnel, 360 par défaut)"),
+         _arg('axis', 'string', 'z', "Axe de rotation passant par l'origine: x, y, z (optionnel)", choices=_AXIS_CHOICES),
+         _arg('target', 'name', None, "Objet avec lequel combiner la source et ses copies (optionnel)"),
+         _arg('operation', 'string', 'none', "Combinaison avec la cible: none, join, cut, intersect (optionnel)", choices=_ARRAY_OPERATION_CHOICES))
+def create_circular_array(body_name: str, count: int, angle_degrees: float = 360, axis_str: str = 'z',
+                          target_name: str = None, operation: str = 'none'):
+    """Réseau circulaire d'un corps : une fonction de réseau au lieu de N créations et rotations"""
+    try:
+        if count < 2:
+            _status("Le réseau doit compter au moins 2 occurrences.", ok=False)
+            return
+        root = _app.activeProduct.rootComponent
+        source = _resolve_array_bodies(root, body_name, target_name, operation)
+        if not source:
+            return
+
+        entities = adsk.core.ObjectCollection.create()
+        entities.add(source)
+        patterns = root.features.circularPatternFeatures
+        pattern_input = patterns.createInput(entities, _construction_axis(root, axis_str))
+        pattern_input.quantity = adsk.core.ValueInput.createByReal(count)
+        pattern_input.totalAngle = adsk.core.ValueInput.createByReal(math.radians(angle_degrees))
+        pattern_input.isSymmetric = False
+        pattern_feature = patterns.add(pattern_input)
+
+        message = _finish_array(root, source, body_name, pattern_feature, target_name, operation)
+        _status(f"Réseau circulaire de {count} sur {angle_degrees}° autour de {axis_str.upper()}: {message}", count=count)
+    except:
+        _status(f"Échec du réseau circulaire:\n{traceback.format_exc()}", ok=False)
+
+# --- Phase 8: Export de maillages ---
+
+# Finesse du maillage -> TriangleMeshQualityOptions
+_MESH_QUALITIES = {
+    'low': 'LowQualityTriangleMesh',
+    'normal': 'NormalQualityTriangleMesh',
+    'high': 'HighQualityTriangleMesh',
+    'very_high': 'VeryHighQualityTriangleMesh',
+}
+_MESH_FORMATS = ('stl', 'buffers')
+_MESH_CHUNK_TRIANGLES = 65536  # triangles convertis puis écrits à la fois ; l'interface reprend la main entre deux
+_STL_RECORD = 50               # normale et trois sommets en float32, puis 2 octets d'attribut
+_MESH_MAGIC = b'FMCPMESH'      # en-tête du format buffers
+
+def _default_export_path(extension: str) -> str:
+    return os.path.join(os.path.expanduser('~'), 'Documents', 'fusion_mcp_exports',
+                        f"mesh-{time.strftime('%Y%m%d-%H%M%S')}.{extension}")
+
+def _body_mesh(body, refinement: str, tolerance: float = None):
+    """Maillage d'un corps en tableaux compacts : sommets en mm (float32) et indices (uint32)"""
+    calculator = body.meshManager.createMeshCalculator()
+    if tolerance:
+        calculator.surfaceTolerance = tolerance
+    else:
+        calculator.setQuality(getattr(adsk.fusion.TriangleMeshQualityOptions, _MESH_QUALITIES[refinement]))
+    mesh = calculator.calculate()
+    # Les listes renvoyées par l'API sont converties aussitôt : 4 octets par valeur au lieu d'un objet float
+    coordinates = array.array('f', map((10.0).__mul__, mesh.nodeCoordinatesAsFloat))
+    indices = array.array('I', mesh.nodeIndices)
+    return coordinates, indices
+
+def _little_endian(values):
+    """Tableau au format petit-boutiste des fichiers STL et buffers"""
+    if sys.byteorder == 'big':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values
+
+def _stl_vertices(coordinates):
+    """Sommets regroupés pour la collecte : x et y de chaque sommet dans un entier de 64 bits, z dans un de 32.
+    Deux tampons compacts par corps, sans objet Python par sommet"""
+    raw = memoryview(coordinates).cast('B').cast('I')
+    pairs = bytearray(8 * (len(coordinates) // 3))
+    view = memoryview(pairs).cast('I')
+    view[0::2] = raw[0::3]
+    view[1::2] = raw[1::3]
+    return memoryview(pairs).cast('Q'), raw[2::3]
+
+def _stl_records(vertices, corners) -> bytearray:
+    """Enregistrements STL binaires des triangles de corners (indices des sommets, par trois), écrits dans un seul tampon.
+    Seuls des objets de la taille de la tranche sont créés"""
+    pairs, heights = vertices
+    count = len(corners) // 3
+    records = array.array('f', bytes(48 * count))
+    slots = memoryview(records)
+    # points[k][axe] : coordonnées du k-ième sommet de chaque triangle, collectées en C par itemgetter
+    points = []
+    for k in range(3):
+        pick = operator.itemgetter(*corners[k::3]) if count > 1 else (lambda values, index=corners[k]: (values[index],))
+        xy = memoryview(array.array('Q', pick(pairs))).cast('B').cast('f')
+        z = memoryview(array.array('I', pick(heights))).cast('B').cast('f')
+        points.append((xy[0::2], xy[1::2], z))
+        for axis in range(3):
+            slots[3 + 3 * k + axis::12] = points[k][axis]
+    # Normale de facette (v1 - v0) x (v2 - v0), normalisée ; nulle pour un triangle dégénéré
+    first = [list(map(operator.sub, points[1][axis], points[0][axis])) for axis in range(3)]
+    second = [list(map(operator.sub, points[2][axis], points[0][axis])) for axis in range(3)]
+    normal = [list(map(operator.sub, map(operator.mul, first[(axis + 1) % 3], second[(axis + 2) % 3]),
+                       map(operator.mul, first[(axis + 2) % 3], second[(axis + 1) % 3]))) for axis in range(3)]
+    scale = [1.0 / length if length else 0.0 for length in map(math.hypot, *normal)]
+    for axis in range(3):
+        records[axis::12] = array.array('f', map(operator.mul, normal[axis], scale))
+    # 48 octets de flottants puis 2 octets d'attribut nuls : recopie par colonnes de 16 bits (25 par enregistrement)
+    chunk = bytearray(_STL_RECORD * count)
+    target = memoryview(chunk).cast('H')
+    source = memoryview(_little_endian(records)).cast('B').cast('H')
+    for offset in range(24):
+        target[offset::_STL_RECORD // 2] = source[offset::24]
+    return chunk
+
+def _write_mesh(handle, mesh_format: str, name: str, mesh) -> int:
+    """Écrit le maillage d'un corps par tranches ; retourne son nombre de triangles"""
+    coordinates, indices = mesh
+    triangles = len(indices) // 3
+    if mesh_format == 'buffers':
+        encoded = name.encode('utf-8')
+        handle.write(len(encoded).to_bytes(4, 'little') + encoded)
+        handle.write((len(coordinates) // 3).to_bytes(4, 'little') + triangles.to_bytes(4, 'little'))
+        _little_endian(coordinates).tofile(handle)
+        _little_endian(indices).tofile(handle)
+        return triangles
+    vertices = _stl_vertices(coordinates)
+    step = 3 * _MESH_CHUNK_TRIANGLES
+    for start in range(0, len(indices), step):
+        handle.write(_stl_records(vertices, indices[start:start + step]))
+        adsk.doEvents()
+    return triangles
+
+@command('export_mesh', "Exporte le maillage d'objets nommés ou sélectionnés en STL binaire ou en tampons sommets/indices",
+         _arg('bodies', 'names', None, "Noms des objets: liste ou texte 'A,B,C' (optionnel, sélection courante sinon)"),
+         _arg('path', 'string', None, "Fichier de sortie (optionnel, ~/Documents/fusion_mcp_exports par défaut)"),
+         _arg('refinement', 'string', 'normal', "Finesse: low, normal, high, very_high (optionnel)", choices=tuple(_MESH_QUALITIES)),
+         _arg('format', 'string', 'stl', "stl (binaire) ou buffers (sommets float32 et indices uint32) (optionnel)", choices=_MESH_FORMATS),
+         _arg('tolerance', 'length', None, "Écart maximal à la surface en mm, à la place de refinement (optionnel)"))
+def export_mesh(body_names=None, path: str = None, refinement: str = 'normal', mesh_format: str = 'stl', tolerance: float = None):
+    """Maillage des corps écrit tranche par tranche dans un fichier (.tmp puis renommage)"""
+    try:
+        root = _app.activeProduct.rootComponent
+        if body_names:
+            bodies = [(name, _find_body(root, name)) for name in body_names]
+            missing = [name for name, body in bodies if body is None]
+            if missing:
+                _status(f"Objet(s) introuvable(s): {', '.join(missing)}", ok=False, missing=missing)
+                return
         else:
-            _ui.messageBox("Commande de rétablissement introuvable")
+            bodies = [(entity.name, entity) for entity in (s.entity for s in _ui.activeSelections)
+                      if entity.objectType == adsk.fusion.BRepBody.classType()]
+            if not bodies:
+                _status("Aucun corps nommé ni sélectionné à exporter.", ok=False)
+                return
+        path = os.path.abspath(os.path.expanduser(path or _default_export_path('stl' if mesh_format == 'stl' else 'bin')))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        started = time.perf_counter()
+        total = 0
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as handle:
+            if mesh_format == 'stl':
+                # Nombre de triangles inconnu avant la fin : réécrit une fois tous les corps exportés
+                handle.write(b'Fusion MCP export_mesh'.ljust(80, b' ') + bytes(4))
+            else:
+                handle.write(_MESH_MAGIC + (1).to_bytes(4, 'little') + len(bodies).to_bytes(4, 'little'))
+            for name, body in bodies:
+                total += _write_mesh(handle, mesh_format, name, _body_mesh(body, refinement, tolerance))
+            if mesh_format == 'stl':
+                handle.seek(80)
+                handle.write(total.to_bytes(4, 'little'))
+        os.replace(tmp_path, path)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+        _status(f"{len(bodies)} objet(s) exporté(s) ({total} triangles, {mesh_format}): {path}", path=path,
+                bodies=[name for name, _ in bodies], triangles=total, bytes=os.path.getsize(path), ms=elapsed_ms)
     except:
-        if _ui: _ui.messageBox(f"Échec du rétablissement:\n{traceback.format_exc()}")
+        _status(f"Échec de l'export du maillage:\n{traceback.format_exc()}", ok=False)
+
+# --- Validation préalable ---
+# Contrôles en pur Python (boîtes englobantes, table des arêtes) avant le noyau : une requête vouée à
+# l'échec est refusée en quelques microsecondes avec une erreur structurée, sans esquisse à moitié
+# construite dans la timeline. FUSION_MCP_PREFLIGHT=0 les désactive.
+_DIMENSION_ARGS = ('size', 'radius', 'height', 'width', 'depth', 'side')
+_MIN_DIMENSION = 1e-4      # cm (1 µm) : en dessous, Fusion refuse la géométrie
+_OVERLAP_TOLERANCE = 1e-7  # cm : des boîtes qui se touchent comptent comme en contact
+_preflight_enabled = os.environ.get('FUSION_MCP_PREFLIGHT', '1') != '0'
+_PREFLIGHT = {}
+
+class _PreflightError(Exception):
+    """Requête refusée avant exécution : code stable pour le client et détails"""
+
+    def __init__(self, code: str, message: str, **details):
+        super().__init__(message)
+        self.code = code
+        self.details = details
+
+def preflight(*names):
+    """Décorateur : enregistre un contrôle préalable pour les commandes nommées"""
+    def register(check):
+        for name in names:
+            _PREFLIGHT.setdefault(name, []).append(check)
+        return check
+    return register
+
+def _run_preflight(spec, values):
+    """Contrôles communs (nombres finis, dimensions positives) puis contrôles propres à la commande"""
+    named = {}
+    for arg, value in zip(spec.args, values):
+        named[arg['name']] = value
+        if value is None or arg['kind'] not in ('length', 'number', 'angle'):
+            continue
+        if not math.isfinite(value):
+            raise _PreflightError('not_finite', f"'{arg['name']}' n'est pas un nombre fini", field=arg['name'])
+        if arg['kind'] == 'length' and arg['name'] in _DIMENSION_ARGS and value < _MIN_DIMENSION:
+            raise _PreflightError('invalid_dimension', f"'{arg['name']}' doit être strictement positif (reçu {value * 10} mm)",
+                                  field=arg['name'], value_mm=value * 10)
+    for check in _PREFLIGHT.get(spec.name, ()):
+        check(**named)
+
+def _boxes_touch(first, second):
+    (lo1, hi1), (lo2, hi2) = first, second
+    return all(lo1[i] <= hi2[i] + _OVERLAP_TOLERANCE and lo2[i] <= hi1[i] + _OVERLAP_TOLERANCE for i in range(3))
+
+def _detached_boxes(boxes):
+    """Indices des boîtes sans lien de contact, direct ou de proche en proche, avec boxes[0] (balayage sur x, union-find)"""
+    parent = list(range(len(boxes)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    active = []
+    for index in sorted(range(len(boxes)), key=lambda i: boxes[i][0][0]):
+        start = boxes[index][0][0] - _OVERLAP_TOLERANCE
+        active = [other for other in active if boxes[other][1][0] >= start]
+        for other in active:
+            if _boxes_touch(boxes[index], boxes[other]):
+                parent[find(index)] = find(other)
+        active.append(index)
+    anchor = find(0)
+    return [index for index in range(1, len(boxes)) if find(index) != anchor]
+
+def _check_combination(target_name: str, target_box, tools, operation: str):
+    """Règle commune à toutes les combinaisons ; tools : couples (nom, boîte englobante).
+    cut : au moins un outil touche la cible ; intersect : tous ; join : cible et outils forment un seul bloc en contact"""
+    if any(name == target_name for name, _ in tools):
+        raise _PreflightError('same_body', f"'{target_name}' ne peut pas être combiné avec lui-même", bodies=[target_name])
+    boxes = [box for _, box in tools]
+    disjoint = [name for (name, _), box in zip(tools, boxes) if not _boxes_touch(target_box, box)]
+    if not disjoint or (operation == 'cut' and len(disjoint) < len(tools)):
+        return
+    if operation == 'join':
+        # Une union peut réunir des corps disjoints par l'intermédiaire des autres outils
+        disjoint = [tools[index - 1][0] for index in _detached_boxes([target_box] + boxes)]
+        if not disjoint:
+            return
+    if len(tools) == 1:
+        message = f"'{target_name}' et '{disjoint[0]}' ne se touchent pas : combinaison '{operation}' impossible"
+    else:
+        message = f"{len(disjoint)} outil(s) ne touchent pas '{target_name}' : combinaison '{operation}' impossible"
+    raise _PreflightError('no_overlap', message, bodies=[target_name] + disjoint[:_SPATIAL_REPORT_LIMIT])
+
+@preflight('combine_by_name')
+def _preflight_combine_by_name(target, tool, operation, **_):
+    root = _app.activeProduct.rootComponent
+    target_body, tool_body = _find_body(root, target), _find_body(root, tool)
+    if not target_body or not tool_body:
+        return  # la commande signale elle-même le corps introuvable
+    _check_combination(target, _body_box(target_body), [(tool, _body_box(tool_body))], operation)
+
+@preflight('combine_selection')
+def _preflight_combine_selection(operation, **_):
+    selections = _ui.activeSelections
+    if selections.count != 2:
+        return
+    target, tool = selections.item(0).entity, selections.item(1).entity
+    body_type = adsk.fusion.BRepBody.classType()
+    if target.objectType == body_type and tool.objectType == body_type:
+        _check_combination(target.name, _body_box(target), [(tool.name, _body_box(tool))], operation)
+
+@preflight('combine_many')
+def _preflight_combine_many(target, tools, operation, pattern, **_):
+    root = _app.activeProduct.rootComponent
+    # Boîtes lues dans l'index spatial : aucun appel d'API par outil
+    leaves = _spatial_index(root).leaves
+    names = list(dict.fromkeys(tools or []))
+    if pattern:
+        # Le motif peut désigner la cible elle-même : elle est simplement écartée, comme dans la commande
+        names.extend(name for name in leaves if name != target and name not in names and fnmatch.fnmatchcase(name, pattern))
+    if target not in leaves or any(name not in leaves for name in names):
+        return  # la commande signale elle-même les corps introuvables
+    _check_combination(target, (leaves[target].lo, leaves[target].hi),
+                       [(name, (leaves[name].lo, leaves[name].hi)) for name in names], operation)
+
+@preflight('add_fillet')
+def _preflight_add_fillet(radius, **_):
+    """Le rayon doit tenir dans les faces voisines de chaque arête (largeur en cache dans la table des arêtes)"""
+    selections = _ui.activeSelections
+    edge_type = adsk.fusion.BRepEdge.classType()
+    tables = {}
+    too_large = 0
+    limit = None
+    for i in range(selections.count):
+        edge = selections.item(i).entity
+        if edge.objectType != edge_type:
+            continue
+        body = edge.body
+        token = body.entityToken
+        if token not in tables:
+            tables[token] = {row.key: row for row in _edge_table(body)[0]}
+        row = tables[token].get(edge.tempId)
+        if row is None or row.room is None:
+            continue
+        if radius >= row.room - _OVERLAP_TOLERANCE:
+            too_large += 1
+            limit = row.room if limit is None else min(limit, row.room)
+    if too_large:
+        raise _PreflightError('fillet_too_large', f"Rayon de {radius * 10} mm trop grand pour {too_large} arête(s) (maximum {limit * 10:.3f} mm exclu)",
+                              edges=too_large, max_radius_mm=round(limit * 10, 6))
+
+@preflight('create_rectangular_array')
+def _preflight_rectangular_array(count1, spacing1, count2, spacing2, **_):
+    for count, spacing, field in ((count1, spacing1, 'spacing1'), (count2, spacing2, 'spacing2')):
+        if count > 1 and abs(spacing) < _MIN_DIMENSION:
+            raise _PreflightError('invalid_dimension', f"'{field}' nul : les copies seraient confondues", field=field, value_mm=spacing * 10)
+
+@preflight('create_circular_array')
+def _preflight_circular_array(angle, **_):
+    if abs(angle) < 1e-6:
+        raise _PreflightError('invalid_dimension', "'angle' nul : les copies seraient confondues", field='angle', value=angle)
+
+@preflight('place_primitives')
+def _preflight_place_primitives(shape, positions, sizes, dimensions, **_):
+    dimension_names = _PRIMITIVE_DIMENSIONS[shape][0]
+    stride = len(dimension_names)
+    # Des valeurs en trop ne sont pas ignorées : ce sont le plus souvent des tailles par instance mal placées
+    if dimensions is not None:
+        received = _packed_count(dimensions)
+        if received != stride:
+            raise _PreflightError('invalid_dimension', f"'dimensions' attend {stride} valeur(s) pour {shape} "
+                                  f"({', '.join(dimension_names)}), reçu {received} ; dimensions par instance : utiliser 'sizes'",
+                                  field='dimensions', expected=stride, received=received)
+    if sizes is not None:
+        count = _packed_count(positions) // 3
+        received = _packed_count(sizes)
+        if received != count * stride:
+            raise _PreflightError('invalid_dimension', f"'sizes' attend {count * stride} valeur(s) "
+                                  f"({count} instance(s) × {stride}), reçu {received}",
+                                  field='sizes', expected=count * stride, received=received)
+
+# --- Ordonnanceur du thread principal ---
+# Les requêtes en attente passent par une file à priorités au lieu d'un FIFO strict : lectures pures d'abord,
+# géométrie lourde en dernier, ordre d'arrivée au sein d'une classe. Seules les lectures pures doublent, et
+# seulement les requêtes des autres connexions : ce qui modifie la sélection ou le modèle garde l'ordre de sa
+# connexion, car un client peut enchaîner select_body A ; move_selection ; select_body B ; move_selection sans
+# attendre les réponses, et une lecture attend les écritures de sa connexion déjà en file (create_box puis
+# get_scene voit la boîte). Le spool et la relecture, dont les émetteurs n'attendent pas, gardent leur ordre
+# dans une seule classe.
+_PRIORITY_CLASSES = ('query', 'modeling', 'heavy')
+_QUERY_COMMANDS = frozenset(('get_scene', 'get_log', 'get_metrics', 'find_overlaps', 'cancel', 'set_tick_budget'))
+_HEAVY_COMMANDS = frozenset((
+    'combine_selection', 'combine_by_name', 'combine_many', 'add_fillet', 'place_primitives', 'batch',
+    'create_rectangular_array', 'create_circular_array', 'export_mesh', 'replay_journal', 'rollback_to'))
+# Temps du thread principal qu'un tick peut consommer avant de rendre la main à Fusion (au moins une requête)
+_tick_budget_ms = float(os.environ.get('FUSION_MCP_TICK_BUDGET_MS', '50'))
+# additionalInfo de l'événement personnalisé qui déclenche un tick ; toute autre valeur est une commande brute
+_SCHEDULER_TICK = '__fusion_mcp_tick__'
+
+class _PendingRequest:
+    """Requête confiée au thread principal, de la soumission à la fin de son exécution"""
+    __slots__ = ('key', 'request', 'on_done', 'submitted_at', 'stages', 'priority', 'deadline', 'request_id', 'running')
+
+    def __init__(self, key, request, on_done, stages, priority, deadline, request_id):
+        self.key = key
+        self.request = request
+        self.on_done = on_done
+        self.submitted_at = time.perf_counter()
+        self.stages = stages
+        self.priority = priority
+        self.deadline = deadline
+        self.request_id = request_id
+        self.running = False
+
+# Clé -> requête en attente ou en cours ; la file est un tas (classe, ordre d'arrivée, clé)
+_pending_requests = {}
+_pending_queue = []
+_pending_order = itertools.count()
+_pending_lock = threading.Lock()
+_tick_scheduled = False
+# Connexion -> (classe, clé) de sa dernière écriture soumise : une requête suivante ne passe pas dans une classe inférieure
+_write_tails = {}
+_scheduler_stats = {'executed': 0, 'expired': 0, 'cancelled': 0, 'ticks': 0, 'yields': 0}
+
+def _request_priority(request) -> int:
+    """Classe de priorité d'après le nom de la commande, sans analyser ses arguments"""
+    if isinstance(request, dict):
+        name = str(request.get('command') or request.get('tool') or '').lower()
+    elif request.lstrip().startswith('{'):
+        return 1
+    else:
+        name = request.strip().partition(' ')[0].lower()
+    return 0 if name in _QUERY_COMMANDS else 2 if name in _HEAVY_COMMANDS else 1
+
+def _submit_request(key: str, request, on_done=None, stages=None, received_at=None,
+                    priority: str = None, deadline_ms: float = None, request_id=None, connection=None):
+    """Confie une requête (texte ou JSON) à l'ordonnanceur du thread principal.
+    priority force une classe de _PRIORITY_CLASSES ; passé deadline_ms, la requête encore en file est abandonnée.
+    Une requête soumise avec l'identifiant connection passe après les écritures de cette connexion encore en file"""
+    global _tick_scheduled
+    stages = dict(stages or {})
+    if received_at is not None:
+        stages['receipt'] = (time.perf_counter() - received_at) * 1000
+    natural = _request_priority(request)
+    rank = _PRIORITY_CLASSES.index(priority) if priority in _PRIORITY_CLASSES else natural
+    origin = received_at if received_at is not None else time.perf_counter()
+    deadline = origin + deadline_ms / 1000 if deadline_ms and deadline_ms > 0 else None
+    entry = _PendingRequest(key, request, on_done, stages, rank, deadline,
+                            None if request_id is None else str(request_id))
+    with _pending_lock:
+        if connection is not None:
+            # Classe au moins égale à celle de la dernière écriture de la connexion encore en file : elle reste devant.
+            # Les lectures s'y rangent aussi, mais seules les écritures déplacent la fin de file
+            tail = _write_tails.get(connection)
+            previous = _pending_requests.get(tail[1]) if tail else None
+            if previous is not None and not previous.running:
+                rank = entry.priority = max(rank, tail[0])
+            if natural:
+                _write_tails[connection] = (rank, key)
+        _pending_requests[key] = entry
+        heapq.heappush(_pending_queue, (rank, next(_pending_order), key))
+        # Un seul tick en attente à la fois : il traite tout ce qui est arrivé entre-temps
+        fire, _tick_scheduled = not _tick_scheduled, True
+    if fire:
+        _app.fireCustomEvent(_command_received_event_id, _SCHEDULER_TICK)
+
+def _next_request():
+    """Retire de la file la requête la plus prioritaire encore valable, ou None"""
+    with _pending_lock:
+        while _pending_queue:
+            _, _, key = heapq.heappop(_pending_queue)
+            entry = _pending_requests.get(key)
+            if entry is not None and not entry.running:
+                entry.running = True
+                return entry
+    return None
+
+def _finish_request(entry, result):
+    """Rend le résultat à l'émetteur puis libère la clé"""
+    try:
+        if entry.on_done:
+            entry.on_done(result)
+    finally:
+        with _pending_lock:
+            if _pending_requests.get(entry.key) is entry:
+                del _pending_requests[entry.key]
+
+def _scheduler_tick():
+    """Exécute les requêtes en file par ordre de priorité tant que le budget du tick n'est pas épuisé"""
+    global _tick_scheduled
+    started = time.perf_counter()
+    _scheduler_stats['ticks'] += 1
+    try:
+        while True:
+            entry = _next_request()
+            if entry is None:
+                break
+            _run_request(entry)
+            if (time.perf_counter() - started) * 1000 >= _tick_budget_ms:
+                break
+    finally:
+        with _pending_lock:
+            # Décidé sous le verrou : une soumission concurrente voit soit le tick en cours, soit aucun
+            _tick_scheduled = bool(_pending_queue)
+            fire = _tick_scheduled
+        if fire:
+            # Reste de la file au tick suivant : Fusion traite d'abord ses propres événements
+            _scheduler_stats['yields'] += 1
+            _app.fireCustomEvent(_command_received_event_id, _SCHEDULER_TICK)
+
+def _run_request(entry):
+    """Exécute une requête retirée de la file, ou l'abandonne si son échéance est passée"""
+    received_at = time.time()
+    result = {'ok': False, 'message': "Commande non exécutée"}
+    try:
+        now = time.perf_counter()
+        queue_ms = round((now - entry.submitted_at) * 1000, 3)
+        if entry.deadline is not None and now > entry.deadline:
+            _scheduler_stats['expired'] += 1
+            result = {'ok': False, 'message': f"Commande abandonnée: échéance dépassée après {queue_ms} ms d'attente",
+                      'command': _describe_request(entry.request), 'expired': True, 'queue_ms': queue_ms}
+            return
+        result = execute_command(entry.request, dict(entry.stages, queue=queue_ms))
+        result['queue_ms'] = queue_ms
+        _scheduler_stats['executed'] += 1
+        if not entry.key.startswith(_REPLAY_KEY_PREFIX):
+            _journal_record(entry.request, result, received_at)
+    finally:
+        _finish_request(entry, result)
+
+@command('cancel', "Annule une commande encore en file d'attente, par son identifiant de requête",
+         _arg('request_id', 'string', None, "Identifiant de la requête (id de la trame socket ou nom de l'entrée du spool)", required=True))
+def cancel(request_id: str):
+    """Retire de la file les requêtes portant cet identifiant et leur répond aussitôt"""
+    with _pending_lock:
+        matches = [entry for entry in _pending_requests.values() if request_id in (entry.request_id, entry.key)]
+        cancelled = [entry for entry in matches if not entry.running]
+        for entry in cancelled:
+            # Retirée du dictionnaire seulement : son emplacement dans le tas est ignoré au prochain tirage
+            del _pending_requests[entry.key]
+    for entry in cancelled:
+        _scheduler_stats['cancelled'] += 1
+        _finish_request(entry, {'ok': False, 'message': f"Commande annulée avant exécution (requête {request_id})",
+                                'command': _describe_request(entry.request), 'cancelled': True})
+    if cancelled:
+        _status(f"{len(cancelled)} commande(s) annulée(s) (requête {request_id})", cancelled=len(cancelled))
+    elif matches:
+        _status(f"Requête {request_id} déjà en cours d'exécution : trop tard pour l'annuler", ok=False)
+    else:
+        _status(f"Aucune commande en attente pour la requête {request_id}", ok=False)
+
+@command('set_tick_budget', "Règle le temps du thread principal consacré aux commandes avant de rendre la main à l'interface de Fusion",
+         _arg('budget_ms', 'number', None, "Budget d'un tick en ms (0 : une seule commande par tick)", required=True))
+def set_tick_budget(budget_ms: float):
+    """Modifie le budget d'un tick de l'ordonnanceur"""
+    global _tick_budget_ms
+    if budget_ms < 0:
+        _status(f"Budget de tick invalide: {budget_ms} ms", ok=False)
+        return
+    _tick_budget_ms = budget_ms
+    _status(f"Budget d'un tick: {budget_ms:g} ms", budget_ms=budget_ms)
+
+# --- Exécution des commandes ---
+# Nom résolu et durées d'étapes de la commande en cours (thread principal uniquement)
+_current_metrics = None
+
+def execute_command(request, stages=None):
+    """Exécute une requête (texte ou JSON) et retourne son résultat structuré"""
+    global _current_result, _current_metrics
+    previous_result, previous_metrics = _current_result, _current_metrics
+    result = _current_result = {'ok': True, 'message': '', 'command': _describe_request(request)}
+    metrics = _current_metrics = {'name': None, 'stages': dict(stages or {})}
+    started = time.perf_counter()
+    try:
+        _dispatch_command(request)
+    finally:
+        _current_result, _current_metrics = previous_result, previous_metrics
+        result['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        metrics['stages']['total'] = result['duration_ms']
+        if metrics['name'] is not None:
+            _record_metrics(metrics['name'], metrics['stages'], result['ok'])
+    return result
+
+def _dispatch_command(request):
+    """Résout la commande dans le registre, convertit ses arguments puis l'exécute"""
+    global _last_move
+    try:
+        if isinstance(request, str) and not request.strip():
+            return
+
+        # Log sécurisé sans palette
+        print(f"🔧 Commande reçue: {_describe_request(request)}")
+
+        parse_started = time.perf_counter()
+        command_name, arguments = _parse_request(request)
+        spec = _COMMANDS.get(command_name)
+        if spec is None:
+            # Noms inconnus regroupés : un client bavard ne fait pas grossir les métriques
+            _current_metrics['name'] = '(inconnue)'
+            _status(f"Commande inconnue: '{command_name}'\nCommandes disponibles: {', '.join(_COMMANDS)}", ok=False)
+            return
+        _current_metrics['name'] = command_name
+        try:
+            values = spec.bind(arguments)
+        except (ValueError, TypeError) as e:
+            _status(f"Arguments invalides pour '{command_name}': {e}", ok=False)
+            return
+        finally:
+            _current_metrics['stages']['parse'] = (time.perf_counter() - parse_started) * 1000
+        if _preflight_enabled:
+            preflight_started = time.perf_counter()
+            try:
+                _run_preflight(spec, values)
+            except _PreflightError as e:
+                _status(f"Requête refusée avant exécution: {e}", ok=False, error={'stage': 'preflight', 'code': e.code, **e.details})
+                return
+            finally:
+                _current_metrics['stages']['preflight'] = (time.perf_counter() - preflight_started) * 1000
+        # Toute commande modélisante rend le dernier déplacement non repliable
+        if command_name not in _MOVE_COMMANDS and command_name not in _MOVE_NEUTRAL_COMMANDS:
+            _last_move = None
+        # Une base feature en édition bloque les autres fonctions : on la referme avant elles
+        if command_name not in _BASE_FEATURE_COMMANDS:
+            _finish_base_feature()
+        handler_started = time.perf_counter()
+        try:
+            if command_name in _profiled_commands:
+                _run_profiled(command_name, spec.handler, values)
+            else:
+                spec.handler(*values)
+        finally:
+            if _batch_depth == 0:
+                _finish_base_feature()
+            _current_metrics['stages']['handler'] = (time.perf_counter() - handler_started) * 1000
+
+    except Exception as e:
+        print(f"❌ Erreur traitement commande: {str(e)}")
+        _status(f"Erreur lors du traitement de la commande:\n{str(e)}\n\nCommande: {_describe_request(request)}", ok=False)
 
 # --- Gestionnaire d'événements HYBRIDE ---
 class CommandReceivedEventHandler(adsk.core.CustomEventHandler):
@@ -621,168 +3343,353 @@ class CommandReceivedEventHandler(adsk.core.CustomEventHandler):
         super().__init__()
     
     def notify(self, args):
+        # additionalInfo déclenche un tick de l'ordonnanceur ; une commande brute reste acceptée
+        info = args.additionalInfo.strip()
+        if info != _SCHEDULER_TICK:
+            received_at = time.time()
+            _journal_record(info, execute_command(info), received_at)
+            return
+        _scheduler_tick()
+
+# --- Surveillance du spool de commandes ---
+# Délai maximal d'attente d'une notification : sert aussi de période au mode polling
+_WATCH_TIMEOUT = 0.5
+# Une commande par fichier ; le producteur écrit un .tmp puis le renomme en .cmd
+_SPOOL_SUFFIX = '.cmd'
+
+class _PollingWatchBackend:
+    """Repli : réveil à intervalle fixe, sans notification système"""
+    name = 'polling'
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        return True
+
+    def close(self):
+        pass
+
+class _InotifyWatchBackend:
+    """Linux : réveil immédiat via inotify sur le dossier surveillé"""
+    name = 'inotify'
+    _IN_MODIFY = 0x002
+    _IN_CLOSE_WRITE = 0x008
+    _IN_MOVED_TO = 0x080
+    _IN_CREATE = 0x100
+
+    def __init__(self, directory):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify indisponible")
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        mask = self._IN_MODIFY | self._IN_CLOSE_WRITE | self._IN_MOVED_TO | self._IN_CREATE
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), mask) < 0:
+            os.close(self._fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch")
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
         try:
-            command = args.additionalInfo.strip()
-            if not command:
-                return
-            
-            # Log sécurisé sans palette
-            print(f"🔧 Commande reçue: {command}")
-
-            parts = command.split()
-            command_name = parts[0].lower()
-            
-            # Phase 1: Création de base
-            if command_name == 'create_cube':
-                size = float(parts[1]) / 10.0 if len(parts) > 1 else 1.0
-                body_name = parts[2] if len(parts) > 2 and parts[2].lower() not in ['xy','yz','xz','none','null'] else None
-                plane_str = parts[3] if len(parts) > 3 else 'xy'
-                cx = float(parts[4]) / 10.0 if len(parts) > 4 else 0
-                cy = float(parts[5]) / 10.0 if len(parts) > 5 else 0
-                cz = float(parts[6]) / 10.0 if len(parts) > 6 else 0
-                create_cube(size, body_name, plane_str, cx, cy, cz)
-                
-            elif command_name == 'create_cylinder':
-                radius = float(parts[1]) / 10.0 if len(parts) > 1 else 0.5
-                height = float(parts[2]) / 10.0 if len(parts) > 2 else 1.0
-                body_name = parts[3] if len(parts) > 3 and parts[3].lower() not in ['xy','yz','xz','none','null'] else None
-                plane_str = parts[4] if len(parts) > 4 else 'xy'
-                cx = float(parts[5]) / 10.0 if len(parts) > 5 else 0
-                cy = float(parts[6]) / 10.0 if len(parts) > 6 else 0
-                cz = float(parts[7]) / 10.0 if len(parts) > 7 else 0
-                create_cylinder(radius, height, body_name, plane_str, cx, cy, cz)
-                
-            elif command_name == 'create_box':
-                width = float(parts[1]) / 10.0 if len(parts) > 1 else 1.0
-                depth = float(parts[2]) / 10.0 if len(parts) > 2 else 1.0
-                height = float(parts[3]) / 10.0 if len(parts) > 3 else 1.0
-                body_name = parts[4] if len(parts) > 4 and parts[4].lower() not in ['xy','yz','xz','none','null'] else None
-                plane_str = parts[5] if len(parts) > 5 else 'xy'
-                cx = float(parts[6]) / 10.0 if len(parts) > 6 else 0
-                cy = float(parts[7]) / 10.0 if len(parts) > 7 else 0
-                cz = float(parts[8]) / 10.0 if len(parts) > 8 else 0
-                create_box(width, depth, height, body_name, plane_str, cx, cy, cz)
-                
-            elif command_name == 'create_sphere':
-                radius = float(parts[1]) / 10.0 if len(parts) > 1 else 0.5
-                body_name = parts[2] if len(parts) > 2 and parts[2].lower() not in ['xy','yz','xz','none','null'] else None
-                plane_str = parts[3] if len(parts) > 3 else 'xy'
-                cx = float(parts[4]) / 10.0 if len(parts) > 4 else 0
-                cy = float(parts[5]) / 10.0 if len(parts) > 5 else 0
-                cz = float(parts[6]) / 10.0 if len(parts) > 6 else 0
-                create_sphere(radius, body_name, plane_str, cx, cy, cz)
-                
-            elif command_name == 'create_cone':
-                radius = float(parts[1]) / 10.0 if len(parts) > 1 else 0.5
-                height = float(parts[2]) / 10.0 if len(parts) > 2 else 1.0
-                body_name = parts[3] if len(parts) > 3 and parts[3].lower() not in ['xy','yz','xz','none','null'] else None
-                plane_str = parts[4] if len(parts) > 4 else 'xy'
-                cx = float(parts[5]) / 10.0 if len(parts) > 5 else 0
-                cy = float(parts[6]) / 10.0 if len(parts) > 6 else 0
-                cz = float(parts[7]) / 10.0 if len(parts) > 7 else 0
-                create_cone(radius, height, body_name, plane_str, cx, cy, cz)
-                
-            elif command_name == 'create_sq_pyramid':
-                side = float(parts[1]) / 10.0 if len(parts) > 1 else 1.0
-                height = float(parts[2]) / 10.0 if len(parts) > 2 else 1.0
-                body_name = parts[3] if len(parts) > 3 and parts[3].lower() not in ['xy','yz','xz','none','null'] else None
-                plane_str = parts[4] if len(parts) > 4 else 'xy'
-                cx = float(parts[5]) / 10.0 if len(parts) > 5 else 0
-                cy = float(parts[6]) / 10.0 if len(parts) > 6 else 0
-                cz = float(parts[7]) / 10.0 if len(parts) > 7 else 0
-                create_sq_pyramid(side, height, body_name, plane_str, cx, cy, cz)
-                
-            elif command_name == 'create_tri_pyramid':
-                side = float(parts[1]) / 10.0 if len(parts) > 1 else 1.0
-                height = float(parts[2]) / 10.0 if len(parts) > 2 else 1.0
-                body_name = parts[3] if len(parts) > 3 and parts[3].lower() not in ['xy','yz','xz','none','null'] else None
-                plane_str = parts[4] if len(parts) > 4 else 'xy'
-                cx = float(parts[5]) / 10.0 if len(parts) > 5 else 0
-                cy = float(parts[6]) / 10.0 if len(parts) > 6 else 0
-                cz = float(parts[7]) / 10.0 if len(parts) > 7 else 0
-                create_tri_pyramid(side, height, body_name, plane_str, cx, cy, cz)
-                
-            # Phase 2: Manipulation
-            elif command_name == 'move_selection':
-                x = float(parts[1]) / 10.0 if len(parts) > 1 else 0
-                y = float(parts[2]) / 10.0 if len(parts) > 2 else 0
-                z = float(parts[3]) / 10.0 if len(parts) > 3 else 0
-                move_selection(x, y, z)
-                
-            elif command_name == 'combine_selection':
-                operation = parts[1] if len(parts) > 1 else 'join'
-                combine_selection(operation)
-                
-            elif command_name == 'combine_by_name':
-                target_body_name = parts[1] if len(parts) > 1 else ''
-                tool_body_name = parts[2] if len(parts) > 2 else ''
-                operation = parts[3] if len(parts) > 3 else 'join'
-                combine_by_name(target_body_name, tool_body_name, operation)
-                
-            elif command_name == 'rotate_selection':
-                axis = parts[1] if len(parts) > 1 else 'z'
-                angle = float(parts[2]) if len(parts) > 2 else 90
-                cx = float(parts[3]) / 10.0 if len(parts) > 3 else 0
-                cy = float(parts[4]) / 10.0 if len(parts) > 4 else 0
-                cz = float(parts[5]) / 10.0 if len(parts) > 5 else 0
-                rotate_selection(axis, angle, cx, cy, cz)
-                
-            # Phase 3: Sélection et édition
-            elif command_name == 'select_body':
-                body_name = parts[1] if len(parts) > 1 else ''
-                select_body(body_name)
-                
-            elif command_name == 'select_bodies':
-                body_name1 = parts[1] if len(parts) > 1 else ''
-                body_name2 = parts[2] if len(parts) > 2 else ''
-                select_bodies(body_name1, body_name2)
-                
-            elif command_name == 'select_edges':
-                body_name = parts[1] if len(parts) > 1 else ''
-                edge_type = parts[2] if len(parts) > 2 else 'all'
-                select_edges(body_name, edge_type)
-                
-            elif command_name == 'add_fillet':
-                radius = float(parts[1]) / 10.0 if len(parts) > 1 else 0.5
-                add_fillet(radius)
-                
-            elif command_name == 'undo':
-                undo()
-                
-            elif command_name == 'redo':
-                redo()
-
-            else:
-                if _ui: _ui.messageBox(f"Commande inconnue: '{command_name}'\nCommandes disponibles: create_cube, create_cylinder, create_box, create_sphere, create_cone, create_sq_pyramid, create_tri_pyramid, move_selection, combine_selection, combine_by_name, rotate_selection, select_body, select_bodies, select_edges, add_fillet, undo, redo")
-
-        except Exception as e:
-            print(f"❌ Erreur traitement commande: {str(e)}")
-            if _ui: _ui.messageBox(f"Erreur lors du traitement de la commande:\n{str(e)}\n\nCommande: {command}")
+            while os.read(self._fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self._fd)
+
+class _KqueueWatchBackend:
+    """macOS : réveil immédiat via kqueue dès qu'une entrée du dossier change"""
+    name = 'kqueue'
+
+    def __init__(self, directory):
+        if not hasattr(select, 'kqueue'):
+            raise OSError("kqueue indisponible")
+        self._kq = select.kqueue()
+        self._fd = os.open(directory, getattr(os, 'O_EVTONLY', os.O_RDONLY))
+        event = select.kevent(self._fd, filter=select.KQ_FILTER_VNODE,
+                              flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR,
+                              fflags=select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND)
+        self._kq.control([event], 0, 0)
+
+    def wait(self, timeout):
+        return bool(self._kq.control(None, 1, timeout))
+
+    def close(self):
+        os.close(self._fd)
+        self._kq.close()
+
+class _WindowsWatchBackend:
+    """Windows : réveil immédiat via FindFirstChangeNotification sur le dossier"""
+    name = 'win32'
+    _FILE_NOTIFY_CHANGE_FILE_NAME = 0x01
+    _FILE_NOTIFY_CHANGE_SIZE = 0x08
+    _FILE_NOTIFY_CHANGE_LAST_WRITE = 0x10
+    _WAIT_OBJECT_0 = 0
+
+    def __init__(self, directory):
+        if os.name != 'nt':
+            raise OSError("API Win32 indisponible")
+        self._k32 = ctypes.windll.kernel32
+        self._k32.FindFirstChangeNotificationW.restype = ctypes.c_void_p
+        self._k32.FindNextChangeNotification.argtypes = [ctypes.c_void_p]
+        self._k32.FindCloseChangeNotification.argtypes = [ctypes.c_void_p]
+        self._k32.WaitForSingleObject.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+        flags = self._FILE_NOTIFY_CHANGE_FILE_NAME | self._FILE_NOTIFY_CHANGE_SIZE | self._FILE_NOTIFY_CHANGE_LAST_WRITE
+        self._handle = self._k32.FindFirstChangeNotificationW(directory, False, flags)
+        if not self._handle or self._handle == ctypes.c_void_p(-1).value:
+            raise OSError("FindFirstChangeNotificationW a échoué")
+
+    def wait(self, timeout):
+        if self._k32.WaitForSingleObject(self._handle, int(timeout * 1000)) != self._WAIT_OBJECT_0:
+            return False
+        self._k32.FindNextChangeNotification(self._handle)
+        return True
+
+    def close(self):
+        self._k32.FindCloseChangeNotification(self._handle)
+
+def create_watch_backend(directory: str):
+    """Retourne le meilleur moteur de surveillance disponible pour cette plateforme"""
+    for backend_class in (_InotifyWatchBackend, _KqueueWatchBackend, _WindowsWatchBackend):
+        try:
+            return backend_class(directory)
+        except Exception:
+            continue
+    return _PollingWatchBackend(directory)
+
+# Latence mesurée entre l'écriture de la commande et sa prise en charge
+_watcher_stats = {'backend': None, 'count': 0, 'last_ms': 0.0, 'avg_ms': 0.0, 'max_ms': 0.0}
+
+def _record_pickup_latency(written_ns: int) -> float:
+    """Met à jour les statistiques de latence de prise en charge et retourne cette latence en ms"""
+    latency_ms = max(0.0, (time.time_ns() - written_ns) / 1e6)
+    stats = _watcher_stats
+    stats['count'] += 1
+    stats['last_ms'] = latency_ms
+    stats['avg_ms'] += (latency_ms - stats['avg_ms']) / stats['count']
+    stats['max_ms'] = max(stats['max_ms'], latency_ms)
+    print(f"⏱️ Commande récupérée en {latency_ms:.2f} ms ({stats['backend']})")
+    return latency_ms
+
+def _collect_spool_entries():
+    """Retourne les nouvelles entrées du spool (nom, commande, date d'écriture), dans l'ordre d'arrivée"""
+    entries = []
+    for name in sorted(os.listdir(_spool_dir)):
+        if not name.endswith(_SPOOL_SUFFIX):
+            continue
+        with _pending_lock:
+            if name in _pending_requests:
+                continue
+        try:
+            with open(os.path.join(_spool_dir, name), 'r', encoding='utf-8') as f:
+                written_ns = os.fstat(f.fileno()).st_mtime_ns
+                command = f.read().strip()
+        except FileNotFoundError:
+            continue
+        entries.append((name, command, written_ns))
+    return entries
+
+def _spool_ack(entry_name: str, result=None):
+    """Acquitte une entrée traitée : elle ne sera plus rejouée"""
+    try:
+        os.remove(os.path.join(_spool_dir, entry_name))
+    except FileNotFoundError:
+        pass
 
-# --- Surveillance de fichier ---
 def file_watcher(stop_flag):
-    """Surveille le fichier de commandes en continu"""
-    last_modified = 0
-    while not stop_flag.is_set():
+    """Surveille le spool de commandes, réveillé par les notifications du système"""
+    backend = create_watch_backend(_spool_dir)
+    _watcher_stats['backend'] = backend.name
+    print(f"✅ Surveillance via {backend.name}")
+    try:
+        while not stop_flag.is_set():
+            try:
+                entries = _collect_spool_entries()
+                for name, command, written_ns in entries:
+                    if not command:
+                        _spool_ack(name)
+                        continue
+                    picked_at = time.perf_counter()
+                    pickup_ms = _record_pickup_latency(written_ns)
+                    _submit_request(name, command, functools.partial(_spool_ack, name),
+                                    stages={'pickup': pickup_ms}, received_at=picked_at, priority='modeling')
+                if entries:
+                    # Arriéré possible : on relit aussitôt sans attendre
+                    continue
+            except:
+                pass
+            backend.wait(_WATCH_TIMEOUT)
+    finally:
+        backend.close()
+
+# --- Transport socket local ---
+# server.js garde une connexion persistante ; une requête et une réponse JSON par ligne.
+# Le port est joignable par n'importe quel processus local, navigateur compris : la première trame doit
+# porter le jeton de session, écrit au démarrage dans un fichier lisible du seul utilisateur.
+_SOCKET_HOST = '127.0.0.1'
+_SOCKET_PORT = int(os.environ.get('FUSION_MCP_PORT', '8765'))
+# Taille maximale d'une ligne de requête (octets) ; au-delà, la connexion est fermée
+_SOCKET_MAX_LINE = int(os.environ.get('FUSION_MCP_MAX_LINE_BYTES', str(16 * 1024 * 1024)))
+_SOCKET_TOKEN_NAME = 'fusion_mcp_token'
+_socket_server = None
+_socket_token = None
+_socket_token_path = None
+_socket_request_ids = itertools.count(1)
+_socket_connection_ids = itertools.count(1)
+
+class _SocketRequestHandler(socketserver.StreamRequestHandler):
+    """Connexion de server.js : chaque réponse reprend l'identifiant de sa requête"""
+
+    def setup(self):
+        super().setup()
+        self._send_lock = threading.Lock()
+        self._connection_id = f"socket-connection-{next(_socket_connection_ids)}"
+        self.server.connections.add(self.connection)
+
+    def finish(self):
+        self.server.connections.discard(self.connection)
+        with _pending_lock:
+            _write_tails.pop(self._connection_id, None)
+        super().finish()
+
+    def _send(self, frame):
+        data = (json.dumps(frame, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._send_lock:
+            try:
+                self.wfile.write(data)
+            except OSError:
+                pass  # client parti : la commande a tout de même été exécutée
+
+    def _authenticate(self) -> bool:
+        """Première trame {"token": ...} : le jeton de la session, sinon la connexion est refusée"""
+        line = self.rfile.readline(1024)
         try:
-            if os.path.exists(_command_file_path):
-                modified = os.path.getmtime(_command_file_path)
-                if modified > last_modified:
-                    last_modified = modified
-                    with open(_command_file_path, 'r+', encoding='utf-8') as f:
-                        command = f.read().strip()
-                        if command:
-                            _app.fireCustomEvent(_command_received_event_id, command)
-                            f.seek(0)
-                            f.truncate()
-        except:
-            pass 
-        time.sleep(0.5)
+            token = json.loads(line).get('token')
+        except (ValueError, AttributeError):
+            token = None
+        if isinstance(token, str) and hmac.compare_digest(token.encode('utf-8'), _socket_token.encode('utf-8')):
+            return True
+        print(f"⚠️ Connexion socket refusée depuis {self.client_address[0]}: jeton absent ou invalide")
+        self._send({'id': None, 'ok': False, 'message': "Jeton de session absent ou invalide: connexion refusée"})
+        return False
+
+    def handle(self):
+        if not self._authenticate():
+            return
+        while True:
+            line = self.rfile.readline(_SOCKET_MAX_LINE + 1)
+            if not line:
+                break
+            received_at = time.perf_counter()
+            if len(line) > _SOCKET_MAX_LINE:
+                self._send({'id': None, 'ok': False,
+                            'message': f"Requête de plus de {_SOCKET_MAX_LINE} octets: connexion fermée"})
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                # Ce n'est pas server.js (en-têtes HTTP d'un navigateur, par exemple) : on ne lit pas la suite
+                self._send({'id': None, 'ok': False, 'message': f"Requête illisible, connexion fermée: {line[:200]!r}"})
+                break
+            try:
+                command = request['command']
+                deadline_ms = float(request.get('deadline_ms') or 0)
+                if not isinstance(command, str):
+                    raise TypeError(command)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                self._send({'id': None, 'ok': False, 'message': f"Requête invalide: {line[:200]!r}"})
+                continue
+            # {"command": nom, "arguments": {...}} ou ancienne ligne de texte dans "command"
+            if 'arguments' in request:
+                command = {'command': command, 'arguments': request['arguments']}
+            # Champs d'ordonnancement facultatifs : classe de priorité, échéance, identifiant pour cancel
+            reply = functools.partial(self._reply, request.get('id'))
+            _submit_request(f"socket-{next(_socket_request_ids)}", command, reply, received_at=received_at,
+                            priority=request.get('priority'), deadline_ms=deadline_ms,
+                            request_id=request.get('request_id', request.get('id')), connection=self._connection_id)
+
+    def _reply(self, request_id, result):
+        self._send({'id': request_id, **result})
+
+class _LoopbackServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    # Sous Windows, SO_REUSEADDR permettrait à un autre processus de partager le port
+    allow_reuse_address = os.name != 'nt'
+
+    def __init__(self, address, handler_class):
+        self.connections = set()
+        super().__init__(address, handler_class)
+
+def _write_socket_token(path: str) -> str:
+    """Nouveau jeton de session, écrit dans un fichier recréé en lecture seule pour l'utilisateur"""
+    token = secrets.token_urlsafe(32)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    # O_EXCL : le fichier est créé ici avec ses droits, pas hérité d'un fichier existant
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+        f.write(token)
+    return token
+
+def start_socket_server():
+    """Démarre l'écoute locale en arrière-plan ; retourne False si le port est pris ou le jeton impossible à écrire"""
+    global _socket_server, _socket_token, _socket_token_path
+    try:
+        _socket_server = _LoopbackServer((_SOCKET_HOST, _SOCKET_PORT), _SocketRequestHandler)
+    except OSError as e:
+        print(f"⚠️ Socket {_SOCKET_HOST}:{_SOCKET_PORT} indisponible ({e}), spool seul actif")
+        _socket_server = None
+        return False
+    # Écrit une fois le port obtenu : une autre instance qui l'occupe garde son jeton
+    try:
+        _socket_token_path = os.path.join(os.path.expanduser('~'), 'Documents', _SOCKET_TOKEN_NAME)
+        _socket_token = _write_socket_token(_socket_token_path)
+    except OSError as e:
+        print(f"⚠️ Jeton de session impossible à écrire ({e}), spool seul actif")
+        _socket_server.server_close()
+        _socket_server = _socket_token_path = None
+        return False
+    thread = threading.Thread(target=_socket_server.serve_forever, daemon=True)
+    thread.start()
+    return True
+
+def stop_socket_server():
+    """Ferme l'écoute locale et ses connexions, puis supprime le jeton de session"""
+    global _socket_server, _socket_token_path
+    if _socket_server:
+        _socket_server.shutdown()
+        _socket_server.server_close()
+        for connection in list(_socket_server.connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        _socket_server = None
+    if _socket_token_path:
+        try:
+            os.remove(_socket_token_path)
+        except OSError:
+            pass
+        _socket_token_path = None
 
 # --- Cycle de vie de l'add-in ---
 def run(context):
     """Démarrage de l'add-in HYBRIDE qui marche !"""
-    global _app, _ui, _command_file_path, _file_watcher_thread, _stop_flag, _command_received_event, _event_handler
+    global _app, _ui, _spool_dir, _file_watcher_thread, _stop_flag, _command_received_event, _event_handler, _metrics_paths, _profile_dir
+    global _history_handler
     
     print("🚀 Démarrage add-in HYBRIDE...")
     
@@ -792,8 +3699,25 @@ def run(context):
     try:
         print("✅ Application et UI récupérés")
         
-        _command_file_path = os.path.join(os.path.expanduser('~'), 'Documents', 'fusion_command.txt')
-        print(f"✅ Chemin fichier: {_command_file_path}")
+        _spool_dir = os.path.join(os.path.expanduser('~'), 'Documents', 'fusion_mcp_spool')
+        os.makedirs(_spool_dir, exist_ok=True)
+        print(f"✅ Spool de commandes: {_spool_dir}")
+        pending = sum(1 for name in os.listdir(_spool_dir) if name.endswith(_SPOOL_SUFFIX))
+        if pending:
+            print(f"♻️ {pending} commande(s) non acquittée(s) seront rejouées")
+
+        _configure_status_log(os.path.join(os.path.expanduser('~'), 'Documents', 'fusion_mcp_status.log'))
+        print(f"✅ Mode de sortie: {_output_mode}")
+
+        # FUSION_MCP_RECORD=1 (chemin par défaut) ou chemin du journal : enregistre dès le démarrage
+        record = os.environ.get('FUSION_MCP_RECORD', '')
+        if record and record.lower() not in ('0', 'false', 'no'):
+            print(f"✅ Enregistrement des commandes: {_open_journal(None if record == '1' else record)}")
+
+        tools_path = os.path.join(os.path.expanduser('~'), 'Documents', 'fusion_mcp_tools.json')
+        with open(tools_path, 'w', encoding='utf-8') as f:
+            json.dump(export_tool_schemas(), f, ensure_ascii=False, indent=2)
+        print(f"✅ Schémas des outils exportés: {tools_path}")
         
         _command_received_event = _app.registerCustomEvent(_command_received_event_id)
         print("✅ Event enregistré")
@@ -801,6 +3725,9 @@ def run(context):
         _event_handler = CommandReceivedEventHandler()
         _command_received_event.add(_event_handler)
         print("✅ Handler ajouté")
+
+        _history_handler = HistoryTerminatedEventHandler()
+        _ui.commandTerminated.add(_history_handler)
         
         _stop_flag = threading.Event()
         _file_watcher_thread = threading.Thread(target=file_watcher, args=(_stop_flag,))
@@ -808,7 +3735,16 @@ def run(context):
         _file_watcher_thread.start()
         print("✅ Thread de surveillance démarré")
 
-        if _ui: 
+        documents = os.path.join(os.path.expanduser('~'), 'Documents')
+        _metrics_paths = (os.path.join(documents, 'fusion_mcp_metrics.json'), os.path.join(documents, 'fusion_mcp_metrics.prom'))
+        _profile_dir = os.path.join(documents, 'fusion_mcp_profiles')
+        threading.Thread(target=metrics_writer, args=(_stop_flag,), daemon=True).start()
+        print(f"✅ Métriques exportées toutes les {_METRICS_INTERVAL:g} s: {_metrics_paths[0]}")
+
+        if start_socket_server():
+            print(f"✅ Socket local à l'écoute sur {_SOCKET_HOST}:{_SOCKET_PORT}")
+
+        if _ui and _output_mode == 'dialog':
             _ui.messageBox("🎉 FUSION 360 MCP SERVER HYBRIDE DÉMARRÉ !\n✅ Toutes les commandes disponibles\n🚀 Prêt pour Claude Desktop !")
         
         print("🎉 Add-in HYBRIDE démarré avec succès !")
@@ -820,23 +3756,34 @@ def run(context):
 
 def stop(context):
     """Arrêt de l'add-in HYBRIDE"""
-    global _stop_flag, _command_received_event, _event_handler
+    global _stop_flag, _command_received_event, _event_handler, _history_handler
     
     try:
         print("🛑 Arrêt add-in HYBRIDE...")
         
         if _stop_flag:
             _stop_flag.set()
-        
+
+        _close_journal()
+
+        stop_socket_server()
+
+        # Un begin_bulk sans end_bulk ne doit pas laisser le design en calcul différé
+        while _bulk_depth:
+            _exit_bulk()
+
         if _command_received_event and _event_handler:
             _command_received_event.remove(_event_handler)
+        if _ui and _history_handler:
+            _ui.commandTerminated.remove(_history_handler)
+            _history_handler = None
         
         print("✅ Add-in HYBRIDE arrêté proprement")
         
-        if _ui: 
+        if _ui and _output_mode == 'dialog':
             _ui.messageBox("🛑 Fusion 360 MCP Server HYBRIDE arrêté.")
             
     except Exception as e:
         print(f"❌ Erreur arrêt: {str(e)}")
-        if _ui: 
+        if _ui and _output_mode == 'dialog':
             _ui.messageBox(f"Erreur arrêt add-in: {str(e)}")
\ No newline at end of file
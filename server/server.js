@@ -1,23 +1,270 @@
 // server.js - Compatible avec la version japonaise de fusion_mcp_server.py
 const fs = require('fs');
 const path = require('path');
+const net = require('net');
+const { performance } = require('perf_hooks');
 
-const commandFilePath = path.join(require('os').homedir(), 'Documents', 'fusion_command.txt');
+// Spool : une commande par fichier, consommée puis supprimée par l'add-in
+const spoolDir = path.join(require('os').homedir(), 'Documents', 'fusion_mcp_spool');
 const logFilePath = path.join(__dirname, 'mcp_server.log');
 
+fs.mkdirSync(spoolDir, { recursive: true });
+let spoolSequence = 0;
+// Dernière écriture en cours : chaque entrée attend la précédente, donc les .cmd apparaissent
+// dans l'ordre de leurs noms et l'add-in ne peut pas exécuter N+1 avant N
+let spoolTail = Promise.resolve();
+
+// Écriture atomique (.tmp puis renommage) : l'add-in ne voit jamais une commande partielle ;
+// asynchrone pour ne pas bloquer la lecture des requêtes suivantes
+const spoolCommand = (command) => {
+    const entryName = [
+        String(Date.now()).padStart(15, '0'),
+        String(process.pid).padStart(7, '0'),
+        String(spoolSequence++).padStart(9, '0')
+    ].join('-');
+    const tmpPath = path.join(spoolDir, `${entryName}.tmp`);
+    const entryPath = path.join(spoolDir, `${entryName}.cmd`);
+    const written = spoolTail.then(async () => {
+        await fs.promises.writeFile(tmpPath, command, 'utf8');
+        await fs.promises.rename(tmpPath, entryPath);
+        return entryPath;
+    });
+    // Un échec d'écriture est signalé à son appelant sans bloquer les entrées suivantes
+    spoolTail = written.catch(() => {});
+    return written;
+};
+
+// Journal : flux d'écriture asynchrone (les entrées en attente partent groupées),
+// avec rotation par taille (mcp_server.log.1, .2, ...)
+const logMaxBytes = Number(process.env.FUSION_MCP_LOG_MAX_BYTES || 5 * 1024 * 1024);
+const logKeep = Number(process.env.FUSION_MCP_LOG_KEEP || 3);
+let logStream = null;
+let logRotating = false;
+let logPending = [];
+let logSize = 0;
+try {
+    logSize = fs.statSync(logFilePath).size;
+} catch (error) {
+    logSize = 0;
+}
+
+const openLogStream = () => {
+    logStream = fs.createWriteStream(logFilePath, { flags: 'a' });
+    logStream.on('error', (error) => console.error(`⚠️ Journal inaccessible: ${error.message}`));
+};
+
+// Le fichier plein est renommé pendant que son flux se vide : ce qui reste à écrire y aboutit quand même
+const rotateLog = async () => {
+    logRotating = true;
+    logStream.end();
+    logStream = null;
+    for (let i = logKeep - 1; i >= 1; i--) {
+        await fs.promises.rename(`${logFilePath}.${i}`, `${logFilePath}.${i + 1}`).catch(() => {});
+    }
+    await fs.promises.rename(logFilePath, `${logFilePath}.1`).catch(() => {});
+    logSize = 0;
+    logRotating = false;
+    const pending = logPending.join('');
+    logPending = [];
+    if (pending) writeLog(pending);
+};
+
+const writeLog = (text) => {
+    if (logRotating) {
+        logPending.push(text);
+        return;
+    }
+    if (!logStream) openLogStream();
+    logStream.write(text);
+    logSize += Buffer.byteLength(text);
+    if (logMaxBytes > 0 && logSize >= logMaxBytes) rotateLog();
+};
+
+// Les entrées d'un même tour de boucle sont regroupées en une seule écriture
+let logBatch = [];
+
+const flushLogBatch = () => {
+    const text = logBatch.join('');
+    logBatch = [];
+    writeLog(text);
+};
+
 const log = (message) => {
     const logEntry = `[${new Date().toISOString()}] ${message}\n`;
-    fs.appendFileSync(logFilePath, logEntry);
+    if (logBatch.push(logEntry) === 1) setImmediate(flushLogBatch);
     console.error(logEntry.trim());
 };
 
+// Entrées pas encore confiées au flux : écrites de façon synchrone à la sortie
+process.on('exit', () => {
+    const remaining = logPending.join('') + logBatch.join('');
+    logPending = [];
+    logBatch = [];
+    if (remaining) {
+        try {
+            fs.appendFileSync(logFilePath, remaining);
+        } catch (error) {
+            // sortie en cours : rien de plus à faire
+        }
+    }
+});
+
+// Socket local de l'add-in : connexion persistante, réponses corrélées par identifiant
+const addinHost = '127.0.0.1';
+const addinPort = Number(process.env.FUSION_MCP_PORT || 8765);
+const addinReplyTimeoutMs = Number(process.env.FUSION_MCP_REPLY_TIMEOUT_MS || 120000);
+// Jeton de session écrit par l'add-in à son démarrage : première trame de chaque connexion
+const addinTokenPath = path.join(require('os').homedir(), 'Documents', 'fusion_mcp_token');
+const pendingReplies = new Map();
+let addinSocket = null;
+let addinConnecting = null;
+let nextAddinRequestId = 1;
+
+const failPendingReplies = (reason) => {
+    for (const [id, pending] of pendingReplies) {
+        clearTimeout(pending.timer);
+        pending.reject(new Error(reason));
+    }
+    pendingReplies.clear();
+};
+
+const connectAddin = () => new Promise((resolve, reject) => {
+    // Relu à chaque connexion : un redémarrage de l'add-in change le jeton
+    let token;
+    try {
+        token = fs.readFileSync(addinTokenPath, 'utf8').trim();
+    } catch (error) {
+        reject(error);
+        return;
+    }
+    const socket = net.createConnection({ host: addinHost, port: addinPort });
+    let buffer = '';
+    socket.setEncoding('utf8');
+    socket.setNoDelay(true);
+    socket.once('connect', () => {
+        socket.write(JSON.stringify({ token }) + '\n');
+        log(`🔌 Connecté à l'add-in sur ${addinHost}:${addinPort}`);
+        resolve(socket);
+    });
+    socket.on('data', (data) => {
+        buffer += data;
+        let newline;
+        while ((newline = buffer.indexOf('\n')) >= 0) {
+            const line = buffer.slice(0, newline).trim();
+            buffer = buffer.slice(newline + 1);
+            if (!line) continue;
+            let reply;
+            try {
+                reply = JSON.parse(line);
+            } catch (error) {
+                log(`⚠️ Réponse illisible de l'add-in: ${line}`);
+                continue;
+            }
+            const pending = pendingReplies.get(reply.id);
+            if (!pending) continue;
+            pendingReplies.delete(reply.id);
+            clearTimeout(pending.timer);
+            reply.roundtrip_ms = Math.round((performance.now() - pending.startedAt) * 1000) / 1000;
+            pending.resolve(reply);
+        }
+    });
+    socket.on('error', (error) => {
+        if (addinSocket !== socket) reject(error);
+    });
+    socket.on('close', () => {
+        if (addinSocket === socket) {
+            addinSocket = null;
+            log("🔌 Connexion à l'add-in fermée");
+            failPendingReplies("Connexion à l'add-in perdue");
+        }
+    });
+});
+
+const getAddinSocket = async () => {
+    if (addinSocket) return addinSocket;
+    if (!addinConnecting) {
+        addinConnecting = connectAddin()
+            .then((socket) => { addinSocket = socket; return socket; })
+            .finally(() => { addinConnecting = null; });
+    }
+    return addinConnecting;
+};
+
+const sendToAddin = (socket, command) => new Promise((resolve, reject) => {
+    const id = nextAddinRequestId++;
+    const timer = setTimeout(() => {
+        pendingReplies.delete(id);
+        reject(new Error(`Pas de réponse de Fusion après ${addinReplyTimeoutMs} ms`));
+    }, addinReplyTimeoutMs);
+    pendingReplies.set(id, { resolve, reject, timer, startedAt: performance.now() });
+    socket.write(JSON.stringify({ id, ...command }) + '\n');
+});
+
+// Socket si l'add-in écoute, sinon repli sur le spool (sans retour d'exécution)
+// scheduling : champs d'ordonnancement de la trame socket (request_id, deadline_ms, priority)
+const forwardCommand = async (command, scheduling = {}) => {
+    let socket;
+    try {
+        socket = await getAddinSocket();
+    } catch (error) {
+        const entryPath = await spoolCommand(JSON.stringify(command));
+        log(`✅ Add-in injoignable (${error.code || error.message}), écrit dans: ${entryPath}`);
+        return { ok: true, spooled: true, message: `Commande '${command.command}' envoyée à Fusion 360` };
+    }
+    return sendToAddin(socket, { ...command, ...scheduling });
+};
+
+// Appels d'outils en vol, et ceux annulés par le client MCP : leur réponse n'est plus attendue
+const toolCallsInFlight = new Set();
+const cancelledCalls = new Set();
+
+const cancelToolCall = (requestId) => {
+    if (!toolCallsInFlight.has(requestId)) return;
+    cancelledCalls.add(requestId);
+    if (!addinSocket) return;
+    sendToAddin(addinSocket, { command: 'cancel', arguments: { request_id: String(requestId) }, priority: 'query' })
+        .then((reply) => log(`${reply.ok ? '🚫' : 'ℹ️'} Annulation de la requête ${requestId}: ${reply.message}`))
+        .catch((error) => log(`⚠️ Annulation de la requête ${requestId} impossible: ${error.message}`));
+};
+
+// Schémas des outils : exportés par l'add-in au démarrage, sinon instantané livré avec le serveur
+const exportedToolsPath = path.join(require('os').homedir(), 'Documents', 'fusion_mcp_tools.json');
+const bundledToolsPath = path.join(__dirname, 'tools.json');
+// Fraîcheur vérifiée au plus une fois par intervalle : pas de stat disque à chaque appel d'outil
+const toolsCheckIntervalMs = 1000;
+let toolsCache = null;
+let toolsCheckedAt = 0;
+
+const loadToolSchemas = () => {
+    const now = performance.now();
+    if (toolsCache && now - toolsCheckedAt < toolsCheckIntervalMs) return toolsCache;
+    toolsCheckedAt = now;
+    for (const toolsPath of [exportedToolsPath, bundledToolsPath]) {
+        try {
+            const mtimeMs = fs.statSync(toolsPath).mtimeMs;
+            if (toolsCache && toolsCache.path === toolsPath && toolsCache.mtimeMs === mtimeMs) {
+                return toolsCache;
+            }
+            const tools = JSON.parse(fs.readFileSync(toolsPath, 'utf8'));
+            toolsCache = { path: toolsPath, mtimeMs, tools, names: new Set(tools.map((tool) => tool.name)) };
+            return toolsCache;
+        } catch (error) {
+            continue;
+        }
+    }
+    return { tools: [], names: new Set() };
+};
+
 log("🚀 Serveur MCP Fusion démarré - Compatible version HYBRIDE");
 
 process.stdin.setEncoding('utf8');
 
-process.stdin.on('data', (chunk) => {
+// Une requête JSON-RPC par ligne : chaque ligne complète est traitée aussitôt, sans attendre
+// les réponses des précédentes ; les appels d'outils restent en vol en parallèle
+const handleLine = (line) => {
+    let request = null;
     try {
-        const data = chunk.trim();
+        const data = line.trim();
         if (!data || data.length === 0) {
             return;
         }
@@ -29,7 +276,7 @@ process.stdin.on('data', (chunk) => {
             return;
         }
         
-        const request = JSON.parse(data);
+        request = JSON.parse(data);
         
         if (request.method === "initialize") {
             const response = {
@@ -52,403 +299,77 @@ process.stdin.on('data', (chunk) => {
                 jsonrpc: "2.0",
                 id: request.id,
                 result: {
-                    tools: [
-                        // === CRÉATION DE FORMES ===
-                        {
-                            name: "create_cube",
-                            description: "Crée un cube dans Fusion 360",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    size: { type: "number", description: "Taille du cube en mm" },
-                                    name: { type: "string", description: "Nom du cube (optionnel)" },
-                                    plane: { type: "string", description: "Plan de construction: xy, yz, xz (optionnel)" },
-                                    cx: { type: "number", description: "Position X du centre en mm (optionnel)" },
-                                    cy: { type: "number", description: "Position Y du centre en mm (optionnel)" },
-                                    cz: { type: "number", description: "Position Z du centre en mm (optionnel)" }
-                                },
-                                required: ["size"]
-                            }
-                        },
-                        {
-                            name: "create_cylinder",
-                            description: "Crée un cylindre dans Fusion 360",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    radius: { type: "number", description: "Rayon en mm" },
-                                    height: { type: "number", description: "Hauteur en mm" },
-                                    name: { type: "string", description: "Nom du cylindre (optionnel)" },
-                                    plane: { type: "string", description: "Plan de construction: xy, yz, xz (optionnel)" },
-                                    cx: { type: "number", description: "Position X du centre en mm (optionnel)" },
-                                    cy: { type: "number", description: "Position Y du centre en mm (optionnel)" },
-                                    cz: { type: "number", description: "Position Z du centre en mm (optionnel)" }
-                                },
-                                required: ["radius", "height"]
-                            }
-                        },
-                        {
-                            name: "create_box",
-                            description: "Crée une boîte rectangulaire dans Fusion 360",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    width: { type: "number", description: "Largeur en mm" },
-                                    depth: { type: "number", description: "Profondeur en mm" },
-                                    height: { type: "number", description: "Hauteur en mm" },
-                                    name: { type: "string", description: "Nom de la boîte (optionnel)" },
-                                    plane: { type: "string", description: "Plan de construction: xy, yz, xz (optionnel)" },
-                                    cx: { type: "number", description: "Position X du centre en mm (optionnel)" },
-                                    cy: { type: "number", description: "Position Y du centre en mm (optionnel)" },
-                                    cz: { type: "number", description: "Position Z du centre en mm (optionnel)" }
-                                },
-                                required: ["width", "depth", "height"]
-                            }
-                        },
-                        {
-                            name: "create_sphere",
-                            description: "Crée une sphère dans Fusion 360",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    radius: { type: "number", description: "Rayon en mm" },
-                                    name: { type: "string", description: "Nom de la sphère (optionnel)" },
-                                    plane: { type: "string", description: "Plan de construction: xy, yz, xz (optionnel)" },
-                                    cx: { type: "number", description: "Position X du centre en mm (optionnel)" },
-                                    cy: { type: "number", description: "Position Y du centre en mm (optionnel)" },
-                                    cz: { type: "number", description: "Position Z du centre en mm (optionnel)" }
-                                },
-                                required: ["radius"]
-                            }
-                        },
-                        {
-                            name: "create_cone",
-                            description: "Crée un cône dans Fusion 360",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    radius: { type: "number", description: "Rayon de base en mm" },
-                                    height: { type: "number", description: "Hauteur en mm" },
-                                    name: { type: "string", description: "Nom du cône (optionnel)" },
-                                    plane: { type: "string", description: "Plan de construction: xy, yz, xz (optionnel)" },
-                                    cx: { type: "number", description: "Position X du centre en mm (optionnel)" },
-                                    cy: { type: "number", description: "Position Y du centre en mm (optionnel)" },
-                                    cz: { type: "number", description: "Position Z du centre en mm (optionnel)" }
-                                },
-                                required: ["radius", "height"]
-                            }
-                        },
-                        {
-                            name: "create_sq_pyramid",
-                            description: "Crée une pyramide carrée dans Fusion 360",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    side: { type: "number", description: "Côté de la base en mm" },
-                                    height: { type: "number", description: "Hauteur en mm" },
-                                    name: { type: "string", description: "Nom de la pyramide (optionnel)" },
-                                    plane: { type: "string", description: "Plan de construction: xy, yz, xz (optionnel)" },
-                                    cx: { type: "number", description: "Position X du centre en mm (optionnel)" },
-                                    cy: { type: "number", description: "Position Y du centre en mm (optionnel)" },
-                                    cz: { type: "number", description: "Position Z du centre en mm (optionnel)" }
-                                },
-                                required: ["side", "height"]
-                            }
-                        },
-                        {
-                            name: "create_tri_pyramid",
-                            description: "Crée une pyramide triangulaire dans Fusion 360",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    side: { type: "number", description: "Côté de la base en mm" },
-                                    height: { type: "number", description: "Hauteur en mm" },
-                                    name: { type: "string", description: "Nom de la pyramide (optionnel)" },
-                                    plane: { type: "string", description: "Plan de construction: xy, yz, xz (optionnel)" },
-                                    cx: { type: "number", description: "Position X du centre en mm (optionnel)" },
-                                    cy: { type: "number", description: "Position Y du centre en mm (optionnel)" },
-                                    cz: { type: "number", description: "Position Z du centre en mm (optionnel)" }
-                                },
-                                required: ["side", "height"]
-                            }
-                        },
-                        
-                        // === MANIPULATION D'OBJETS ===
-                        {
-                            name: "move_selection",
-                            description: "Déplace les objets sélectionnés",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    x: { type: "number", description: "Distance X en mm" },
-                                    y: { type: "number", description: "Distance Y en mm" },
-                                    z: { type: "number", description: "Distance Z en mm" }
-                                },
-                                required: ["x", "y", "z"]
-                            }
-                        },
-                        {
-                            name: "rotate_selection",
-                            description: "Fait tourner l'objet sélectionné",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    axis: { type: "string", description: "Axe de rotation: x, y, z" },
-                                    angle: { type: "number", description: "Angle en degrés" },
-                                    cx: { type: "number", description: "Centre X en mm" },
-                                    cy: { type: "number", description: "Centre Y en mm" },
-                                    cz: { type: "number", description: "Centre Z en mm" }
-                                },
-                                required: ["axis", "angle", "cx", "cy", "cz"]
-                            }
-                        },
-                        {
-                            name: "combine_selection",
-                            description: "Combine deux objets sélectionnés",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    operation: { type: "string", description: "Opération: join, cut, intersect" }
-                                },
-                                required: ["operation"]
-                            }
-                        },
-                        {
-                            name: "combine_by_name",
-                            description: "Combine deux objets par leur nom",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    target: { type: "string", description: "Nom de l'objet cible" },
-                                    tool: { type: "string", description: "Nom de l'objet outil" },
-                                    operation: { type: "string", description: "Opération: join, cut, intersect" }
-                                },
-                                required: ["target", "tool", "operation"]
-                            }
-                        },
-                        
-                        // === SÉLECTION ===
-                        {
-                            name: "select_body",
-                            description: "Sélectionne un objet par son nom",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    name: { type: "string", description: "Nom de l'objet à sélectionner" }
-                                },
-                                required: ["name"]
-                            }
-                        },
-                        {
-                            name: "select_bodies",
-                            description: "Sélectionne deux objets par leur nom",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    name1: { type: "string", description: "Nom du premier objet" },
-                                    name2: { type: "string", description: "Nom du second objet" }
-                                },
-                                required: ["name1", "name2"]
-                            }
-                        },
-                        {
-                            name: "select_edges",
-                            description: "Sélectionne les arêtes d'un objet",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    bodyName: { type: "string", description: "Nom de l'objet" },
-                                    edgeType: { type: "string", description: "Type d'arêtes: all ou circular" }
-                                },
-                                required: ["bodyName", "edgeType"]
-                            }
-                        },
-                        {
-                            name: "add_fillet",
-                            description: "Ajoute un congé aux arêtes sélectionnées",
-                            inputSchema: {
-                                type: "object",
-                                properties: {
-                                    radius: { type: "number", description: "Rayon du congé en mm" }
-                                },
-                                required: ["radius"]
-                            }
-                        },
-                        
-                        // === UTILITAIRES ===
-                        {
-                            name: "undo",
-                            description: "Annule la dernière opération",
-                            inputSchema: {
-                                type: "object",
-                                properties: {},
-                                required: []
-                            }
-                        },
-                        {
-                            name: "redo",
-                            description: "Refait la dernière opération annulée",
-                            inputSchema: {
-                                type: "object",
-                                properties: {},
-                                required: []
-                            }
-                        }
-                    ]
+                    tools: loadToolSchemas().tools
                 }
             };
             process.stdout.write(JSON.stringify(response) + '\n');
-            log("📋 Liste des outils japonais envoyée");
+            log(`📋 Liste des outils envoyée (${response.result.tools.length})`);
             
+        } else if (request.method === "notifications/cancelled") {
+            const requestId = request.params && request.params.requestId;
+            if (requestId !== undefined) {
+                log(`🚫 Annulation demandée pour la requête ${requestId}`);
+                cancelToolCall(requestId);
+            }
+
         } else if (request.method === "tools/call") {
             const toolName = request.params.name;
             const args = request.params.arguments || {};
             
-            let command = "";
-            
-            // === CRÉATION DE FORMES ===
-            if (toolName === "create_cube") {
-                const size = args.size || 50;
-                const name = args.name || "";
-                const plane = args.plane || "xy";
-                const cx = args.cx || 0;
-                const cy = args.cy || 0;
-                const cz = args.cz || 0;
-                command = `create_cube ${size} ${name} ${plane} ${cx} ${cy} ${cz}`.trim();
-                
-            } else if (toolName === "create_cylinder") {
-                const radius = args.radius || 25;
-                const height = args.height || 50;
-                const name = args.name || "";
-                const plane = args.plane || "xy";
-                const cx = args.cx || 0;
-                const cy = args.cy || 0;
-                const cz = args.cz || 0;
-                command = `create_cylinder ${radius} ${height} ${name} ${plane} ${cx} ${cy} ${cz}`.trim();
-                
-            } else if (toolName === "create_box") {
-                const width = args.width || 50;
-                const depth = args.depth || 50;
-                const height = args.height || 50;
-                const name = args.name || "";
-                const plane = args.plane || "xy";
-                const cx = args.cx || 0;
-                const cy = args.cy || 0;
-                const cz = args.cz || 0;
-                command = `create_box ${width} ${depth} ${height} ${name} ${plane} ${cx} ${cy} ${cz}`.trim();
-                
-            } else if (toolName === "create_sphere") {
-                const radius = args.radius || 25;
-                const name = args.name || "";
-                const plane = args.plane || "xy";
-                const cx = args.cx || 0;
-                const cy = args.cy || 0;
-                const cz = args.cz || 0;
-                command = `create_sphere ${radius} ${name} ${plane} ${cx} ${cy} ${cz}`.trim();
-                
-            } else if (toolName === "create_cone") {
-                const radius = args.radius || 25;
-                const height = args.height || 50;
-                const name = args.name || "";
-                const plane = args.plane || "xy";
-                const cx = args.cx || 0;
-                const cy = args.cy || 0;
-                const cz = args.cz || 0;
-                command = `create_cone ${radius} ${height} ${name} ${plane} ${cx} ${cy} ${cz}`.trim();
-                
-            } else if (toolName === "create_sq_pyramid") {
-                const side = args.side || 50;
-                const height = args.height || 50;
-                const name = args.name || "";
-                const plane = args.plane || "xy";
-                const cx = args.cx || 0;
-                const cy = args.cy || 0;
-                const cz = args.cz || 0;
-                command = `create_sq_pyramid ${side} ${height} ${name} ${plane} ${cx} ${cy} ${cz}`.trim();
-                
-            } else if (toolName === "create_tri_pyramid") {
-                const side = args.side || 50;
-                const height = args.height || 50;
-                const name = args.name || "";
-                const plane = args.plane || "xy";
-                const cx = args.cx || 0;
-                const cy = args.cy || 0;
-                const cz = args.cz || 0;
-                command = `create_tri_pyramid ${side} ${height} ${name} ${plane} ${cx} ${cy} ${cz}`.trim();
-                
-            // === MANIPULATION ===
-            } else if (toolName === "move_selection") {
-                const x = args.x || 0;
-                const y = args.y || 0;
-                const z = args.z || 0;
-                command = `move_selection ${x} ${y} ${z}`;
-                
-            } else if (toolName === "rotate_selection") {
-                const axis = args.axis || "z";
-                const angle = args.angle || 90;
-                const cx = args.cx || 0;
-                const cy = args.cy || 0;
-                const cz = args.cz || 0;
-                command = `rotate_selection ${axis} ${angle} ${cx} ${cy} ${cz}`;
-                
-            } else if (toolName === "combine_selection") {
-                const operation = args.operation || "join";
-                command = `combine_selection ${operation}`;
-                
-            } else if (toolName === "combine_by_name") {
-                const target = args.target || "";
-                const tool = args.tool || "";
-                const operation = args.operation || "join";
-                command = `combine_by_name ${target} ${tool} ${operation}`;
-                
-            // === SÉLECTION ===
-            } else if (toolName === "select_body") {
-                const name = args.name || "";
-                command = `select_body ${name}`;
-                
-            } else if (toolName === "select_bodies") {
-                const name1 = args.name1 || "";
-                const name2 = args.name2 || "";
-                command = `select_bodies ${name1} ${name2}`;
-                
-            } else if (toolName === "select_edges") {
-                const bodyName = args.bodyName || "";
-                const edgeType = args.edgeType || "all";
-                command = `select_edges ${bodyName} ${edgeType}`;
-                
-            } else if (toolName === "add_fillet") {
-                const radius = args.radius || 5;
-                command = `add_fillet ${radius}`;
-                
-            // === UTILITAIRES ===
-            } else if (toolName === "undo") {
-                command = "undo";
-                
-            } else if (toolName === "redo") {
-                command = "redo";
-            }
+            const known = loadToolSchemas().names.has(toolName);
+            const command = known ? { command: toolName, arguments: args } : null;
             
             if (command) {
-                log(`🔧 Commande: ${command}`);
-                fs.writeFileSync(commandFilePath, command, 'utf8');
-                log(`✅ Écrit dans: ${commandFilePath}`);
-                
-                const response = {
-                    jsonrpc: "2.0",
-                    id: request.id,
-                    result: {
-                        content: [
-                            {
-                                type: "text",
-                                text: `✅ Commande '${command}' envoyée à Fusion 360`
-                            }
-                        ]
+                log(`🔧 Commande: ${toolName} ${JSON.stringify(args)}`);
+                const requestId = request.id;
+                // Passé le délai de réponse, plus personne n'attend le résultat : l'add-in l'abandonne s'il est encore en file
+                const scheduling = { request_id: String(requestId), deadline_ms: addinReplyTimeoutMs };
+                toolCallsInFlight.add(requestId);
+                forwardCommand(command, scheduling).finally(() => toolCallsInFlight.delete(requestId)).then((reply) => {
+                    if (cancelledCalls.delete(requestId)) return;
+                    if (!reply.spooled) {
+                        // Aller-retour = transport + attente du thread principal + exécution dans Fusion
+                        log(`${reply.ok ? '✅' : '❌'} Fusion (${reply.roundtrip_ms} ms, dont attente ${reply.queue_ms} ms et exécution ${reply.duration_ms} ms): ${reply.message}`);
                     }
-                };
-                process.stdout.write(JSON.stringify(response) + '\n');
-                log("✔️ Réponse envoyée");
+                    let text = `${reply.ok ? '✅' : '❌'} ${reply.message}`;
+                    if (Array.isArray(reply.results)) {
+                        text += '\n' + reply.results.map((r, i) =>
+                            `${i + 1}. ${r.ok ? '✅' : '❌'} ${r.command} (${r.duration_ms} ms): ${r.message}`
+                        ).join('\n');
+                    }
+                    const response = {
+                        jsonrpc: "2.0",
+                        id: requestId,
+                        result: {
+                            content: [
+                                {
+                                    type: "text",
+                                    text
+                                }
+                            ],
+                            isError: !reply.ok
+                        }
+                    };
+                    process.stdout.write(JSON.stringify(response) + '\n');
+                    log("✔️ Réponse envoyée");
+                }).catch((error) => {
+                    log(`❌ ERREUR: ${error.message}`);
+                    if (cancelledCalls.delete(requestId)) return;
+                    const errorResponse = {
+                        jsonrpc: "2.0",
+                        id: requestId,
+                        error: { code: -1, message: error.message }
+                    };
+                    process.stdout.write(JSON.stringify(errorResponse) + '\n');
+                });
             } else {
                 log(`❌ Commande inconnue: ${toolName}`);
+                const errorResponse = {
+                    jsonrpc: "2.0",
+                    id: request.id,
+                    error: { code: -32602, message: `Outil inconnu: ${toolName}` }
+                };
+                process.stdout.write(JSON.stringify(errorResponse) + '\n');
             }
         }
         
@@ -463,6 +384,26 @@ process.stdin.on('data', (chunk) => {
             process.stdout.write(JSON.stringify(errorResponse) + '\n');
         }
     }
+};
+
+// Découpage NDJSON incrémental : un bloc peut contenir plusieurs requêtes, ou une partie seulement
+let stdinBuffer = '';
+
+process.stdin.on('data', (chunk) => {
+    stdinBuffer += chunk;
+    let start = 0;
+    let newline;
+    while ((newline = stdinBuffer.indexOf('\n', start)) >= 0) {
+        handleLine(stdinBuffer.slice(start, newline));
+        start = newline + 1;
+    }
+    stdinBuffer = stdinBuffer.slice(start);
+});
+
+process.stdin.on('end', () => {
+    // Dernière requête sans retour à la ligne final
+    if (stdinBuffer.trim()) handleLine(stdinBuffer);
+    stdinBuffer = '';
 });
 
 log("👂 En attente de Claude Desktop ...");
\ No newline at end of file